@@ -0,0 +1,299 @@
+"""Automatic zero calibration of all the motors of a config at once, from their position feedback.
+
+Replaces the manual procedure (AmazingHand_Hand_FingerMiddlePos.py one finger
+at a time, then copying the values into the demo scripts and the TOML
+configs). The two motors of a finger set two angles: turning the same way
+moves the finger sideways (abduction, like the "Nonono" demo gesture), turning
+in opposite directions bends it (flexion). Each finger is swept twice:
+
+1. abduction: both motors turn the same way, first to the lower then to the
+   upper mechanical endpoint, then go to the middle. This finds the sideways
+   zero (the mean of the two motor middles) but keeps their difference;
+2. flexion: from there, the motors turn in opposite directions, first to the
+   open endpoint (the finger bent backwards against its stop), then to the
+   closed one.
+
+The middle of each motor combines both: middle1 = abduction + flexion,
+middle2 = abduction - flexion (half sum and half difference of the motor
+angles). The flexion range is not symmetric around the straight finger (the
+demos open to -35 degrees and close to 90), so its middle is not the flexion
+zero. With --open-flexion, the zero is placed at that fixed angle from the
+open endpoint: the flexion of the open stop of a straight-calibrated hand,
+the same for every finger of a build, printed in the `open` column of every
+run. Without it, the flexion difference of the config is kept and the sweep
+only measures the range.
+
+All the fingers move together: every control tick is one sync-write of the
+goals and one sync-read of the present positions and loads of all the motors.
+An endpoint is reached when a motor of the finger lags behind its goal by more
+than --stall-angle for --stall-time (or its load goes over --load-limit): the
+positions of both motors are recorded and the finger turns back.
+
+The middles are written to one calibration file (config/calibration.toml by
+default, merged with the motors already in it), loaded by servo_bridge.py,
+the Rust nodes (main, set_zeros) and the FixedAction demo scripts.
+
+    python AHControl/python/calibrate.py --serialport COM3 --config AHControl/config/r_hand.toml
+    python AHControl/python/calibrate.py --dry-run   # simulated endpoints, no hardware
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from hand_config import CALIBRATION_FILE, HandConfig, load_calibration, save_calibration
+
+SEEK_MIN, SEEK_MAX, CENTER, DONE, FAILED = range(5)
+
+
+class Sweep:
+    """Endpoint search of N motors moving by groups (fingers), advanced one control tick at a time.
+
+    Every motor moves by `direction` (+1/-1) times the step: min and max are the
+    positions at the low and high end of the sweep, min > max for direction -1.
+    Motors outside `active` do not move (FAILED from the start).
+
+    While a motor lags behind its goal, the goals of its whole group stop: the
+    other motor does not twist the finger against the stop while the stall is
+    confirmed, and its endpoint is recorded without the lag of the blocked one.
+    """
+
+    def __init__(self, start, groups, step, stall_angle, stall_ticks, max_range, load_limit=None,
+                 direction=1.0, active=None):
+        self.start = np.asarray(start, dtype=float)
+        self.groups = np.asarray(groups)
+        self.step = step * np.broadcast_to(np.asarray(direction, dtype=float), self.start.shape)
+        self.stall_angle = stall_angle
+        self.stall_ticks = stall_ticks
+        self.max_range = max_range
+        self.load_limit = load_limit
+        n = len(self.start)
+        self.goal = self.start.copy()
+        self.state = np.full(n, SEEK_MIN)
+        if active is not None:
+            self.state[~np.asarray(active, dtype=bool)] = FAILED
+        self.stalled = np.zeros(n, dtype=int)
+        self.min = np.full(n, np.nan)
+        self.max = np.full(n, np.nan)
+        self.middle = np.full(n, np.nan)
+        self.peak_load = np.zeros(n)
+
+    def _by_group(self, mask):
+        """Extend a per-motor mask to every motor of the groups where it is set."""
+        hit = np.zeros(self.groups.max() + 1, dtype=bool)
+        np.logical_or.at(hit, self.groups, mask)
+        return hit[self.groups]
+
+    @property
+    def finished(self):
+        return bool(np.all(self.state >= DONE))
+
+    def update(self, position, load):
+        """Feed the present positions/loads (rad, raw), get the next goals (rad)."""
+        position = np.asarray(position, dtype=float)
+        load = np.abs(np.asarray(load, dtype=float))
+        seeking = self.state < CENTER
+        lag = np.abs(self.goal - position)
+        blocked = seeking & (lag > self.stall_angle)
+        if self.load_limit is not None:
+            blocked |= seeking & (load > self.load_limit)
+        self.stalled = np.where(blocked, self.stalled + 1, 0)
+        self.peak_load = np.where(seeking, np.maximum(self.peak_load, load), self.peak_load)
+
+        hit = self._by_group(self.stalled >= self.stall_ticks)
+        self.stalled[hit] = 0
+        low = hit & (self.state == SEEK_MIN)
+        high = hit & (self.state == SEEK_MAX)
+        # the goals of a group moved together: the motors that are not blocked went as far past the
+        # contact as the most lagging one lags
+        excess = np.zeros(self.groups.max() + 1)
+        np.maximum.at(excess, self.groups, np.where(hit, lag, 0.0))
+        contact = position + np.where(low, 1.0, -1.0) * np.sign(self.step) * (excess[self.groups] - lag)
+        self.min[low] = contact[low]
+        self.goal[low] = contact[low]  # stop pushing, the sweep turns back from here
+        self.state[low] = SEEK_MAX
+        self.max[high] = contact[high]
+        self.middle[high] = 0.5 * (self.min[high] + self.max[high])
+        self.goal[high] = self.middle[high]
+        self.state[high] = CENTER
+
+        done = (self.state == CENTER) & (np.abs(self.middle - position) < self.stall_angle)
+        self.state[done] = DONE
+
+        hold = self._by_group(blocked)
+        seek_min, seek_max = (self.state == SEEK_MIN) & ~hold, (self.state == SEEK_MAX) & ~hold
+        self.goal[seek_min] -= self.step[seek_min]
+        self.goal[seek_max] += self.step[seek_max]
+        lost = self._by_group((self.state < CENTER) & (np.abs(self.goal - self.start) > self.max_range))
+        self.state[lost] = FAILED
+        self.goal[lost] = self.start[lost]
+        return self.goal
+
+
+def run_sweep(controller, ids, sweep, rate, deadline):
+    """Advance the sweep at `rate` ticks per second until it is finished or the deadline passed."""
+    controller.sync_write_goal_position(ids, sweep.goal.tolist())
+    period = 1.0 / rate
+    next_tick = time.perf_counter()
+    while not sweep.finished:
+        if time.perf_counter() > deadline:
+            sweep.state[sweep.state < DONE] = FAILED
+            break
+        position = controller.sync_read_present_position(ids)
+        load = controller.sync_read_present_load(ids)
+        controller.sync_write_goal_position(ids, sweep.update(position, load).tolist())
+        next_tick += period
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+    return sweep
+
+
+def open_endpoint(flexion, m1, m2):
+    """Flexion (half difference of the motor angles) of a finger at the open end of the flexion sweep."""
+    return 0.5 * (flexion.min[m1] - flexion.min[m2])
+
+
+def calibrate(controller, ids, start, groups, speed=0.5, rate=100.0, stall_angle=0.1, stall_time=0.1,
+              max_range=1.5, load_limit=None, timeout=30.0, open_flexion=None):
+    """Abduction then flexion sweep of the motors from `start` (rad); returns (middle, done, sweeps).
+
+    Both motors of a group (finger) turn the same way in the abduction sweep,
+    the first motor backward (opening) then forward (closing) and the second
+    the other way in the flexion sweep. open_flexion (rad, negative): flexion
+    of the open endpoint from the straight finger, None: the flexion zero of
+    `start` is kept. speed: rad/s of the goals, rate: control ticks per second,
+    stall_angle (rad) and stall_time (s): how long a motor must lag behind its
+    goal to be at an endpoint, timeout (s): for both sweeps.
+    """
+    ids = list(ids)
+    groups = np.asarray(groups)
+    options = (speed / rate, stall_angle, max(1, round(stall_time * rate)), max_range, load_limit)
+    deadline = time.perf_counter() + timeout
+    abduction = run_sweep(controller, ids, Sweep(start, groups, *options), rate, deadline)
+
+    # from the sideways middle, the motors of each finger turn in opposite directions
+    first = np.r_[True, groups[1:] != groups[:-1]]
+    done = abduction.state == DONE
+    flexion = Sweep(np.where(done, abduction.middle, start), groups, *options,
+                    direction=np.where(first, 1.0, -1.0), active=done)
+    run_sweep(controller, ids, flexion, rate, deadline)
+
+    # half sum of the motor angles from the abduction sweep, half difference from the open endpoint
+    middle = np.full(len(ids), np.nan)
+    done = flexion.state == DONE
+    for g in np.unique(groups[done]):
+        m1, m2 = np.flatnonzero(groups == g)
+        side = 0.5 * (abduction.middle[m1] + abduction.middle[m2])
+        if open_flexion is None:
+            bend = 0.5 * (start[m1] - start[m2])
+        else:
+            bend = open_endpoint(flexion, m1, m2) - open_flexion
+        middle[[m1, m2]] = side + bend, side - bend
+    return middle, done, (abduction, flexion)
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--serialport", type=str, default="COM3")
+    parser.add_argument("-b", "--baudrate", type=int, default=1_000_000)
+    parser.add_argument("-c", "--config", type=str, default="config/r_hand.toml", help="TOML config file (motor ids)")
+    parser.add_argument("-o", "--output", type=str, default=None,
+                        help=f"calibration file (default: {CALIBRATION_FILE} next to the config)")
+    parser.add_argument("--speed", type=float, default=0.5, help="sweep speed (rad/s)")
+    parser.add_argument("--rate", type=float, default=100.0, help="control ticks per second")
+    parser.add_argument("--stall-angle", type=float, default=0.1, help="lag behind the goal at an endpoint (rad)")
+    parser.add_argument("--stall-time", type=float, default=0.1, help="lag duration at an endpoint (s)")
+    parser.add_argument("--load-limit", type=float, default=None, help="present load at an endpoint (raw, optional)")
+    parser.add_argument("--max-range", type=float, default=1.5, help="sweep at most this far from the zero (rad)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="give up after (s)")
+    parser.add_argument("--open-flexion", type=float, default=None,
+                        help="flexion of the open endpoint from the straight finger (deg, negative, the `open` column "
+                             "of a calibrated hand), default: keep the flexion zero of the config")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="no hardware: simulated motors with random endpoints, saved only with --output")
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(args.config)), CALIBRATION_FILE)
+    config = HandConfig.load(args.config, args.serialport)  # current calibration as starting point
+    ids = config.ids.tolist()
+    groups = np.arange(len(ids)) // 2  # the two motors of each finger
+    start = config.goals(0.0)
+
+    truth = None
+    if args.dry_run:
+        from servo_bridge import DryRunController
+
+        rng = np.random.default_rng()
+        fingers = len(ids) // 2
+        # a wrong sideways zero per finger and a wrong flexion zero (opposite on its two motors)
+        side = rng.uniform(-0.15, 0.15, fingers).repeat(2)
+        bend = np.ravel(np.outer(rng.uniform(-0.1, 0.1, fingers), [1.0, -1.0]))
+        truth = start + side + bend
+        # asymmetric flexion range: the open stop is closer to the straight finger than the closed one,
+        # at --open-flexion give or take a degree of assembly play
+        if args.open_flexion is None:
+            opened = rng.uniform(0.5, 0.7, fingers)
+        else:
+            opened = -np.deg2rad(args.open_flexion) + rng.normal(0.0, np.deg2rad(1.0), fingers)
+        closed = rng.uniform(1.1, 1.3, fingers)
+        # motor 1 closes the finger forward, motor 2 backward
+        low = truth - np.ravel(np.stack([opened, closed], axis=-1))
+        high = truth + np.ravel(np.stack([closed, opened], axis=-1))
+        controller = DryRunController(limits={i: (a, b) for i, a, b in zip(ids, low, high)})
+    else:
+        from rustypot import Scs0009PyController
+
+        controller = Scs0009PyController(serial_port=args.serialport, baudrate=args.baudrate, timeout=0.01)
+
+    controller.sync_write_torque_enable(ids, [1] * len(ids))
+    t0 = time.perf_counter()
+    open_flexion = None if args.open_flexion is None else np.deg2rad(args.open_flexion)
+    middle, done, sweeps = calibrate(controller, ids, start, groups, args.speed, args.rate, args.stall_angle,
+                                     args.stall_time, args.max_range, args.load_limit, args.timeout, open_flexion)
+    elapsed = time.perf_counter() - t0
+    controller.sync_write_goal_position(ids, np.where(done, middle, start).tolist())
+
+    # range of each motor over both sweeps
+    low = np.nanmin([np.minimum(s.min, s.max) for s in sweeps], axis=0)
+    high = np.nanmax([np.maximum(s.min, s.max) for s in sweeps], axis=0)
+    load = np.max([s.peak_load for s in sweeps], axis=0)
+    # flexion of the open endpoint from the new zero, the value of --open-flexion for this build
+    opened = np.full(len(ids), np.nan)
+    for g in np.unique(groups[done]):
+        m1, m2 = np.flatnonzero(groups == g)
+        opened[[m1, m2]] = open_endpoint(sweeps[1], m1, m2) - 0.5 * (middle[m1] - middle[m2])
+    print(f"{'finger':<12} {'id':>3} {'min':>7} {'max':>7} {'middle':>7} {'was':>7} {'open':>7} {'load':>7}  (deg)")
+    calibration = {}
+    for i, motor_id in enumerate(ids):
+        name = config.finger_names[groups[i]]
+        was = np.rad2deg(start[i])
+        if not done[i]:
+            phase = "abduction" if sweeps[0].state[i] != DONE else "flexion"
+            print(f"{name:<12} {motor_id:>3} no {phase} endpoint found, kept {was:.1f}")
+            continue
+        print(f"{name:<12} {motor_id:>3} {np.rad2deg(low[i]):7.1f} {np.rad2deg(high[i]):7.1f} "
+              f"{np.rad2deg(middle[i]):7.1f} {was:7.1f} {np.rad2deg(opened[i]):7.1f} {load[i]:7.0f}")
+        calibration[motor_id] = {"middle": middle[i], "min": low[i], "max": high[i]}
+    print(f"{len(calibration)}/{len(ids)} motors calibrated in {elapsed:.1f}s, flexion zero "
+          + ("kept from the config" if open_flexion is None else f"{args.open_flexion:.1f} deg from the open endpoint"))
+    if truth is not None and done.any():
+        print(f"dry run: max error of the middles {np.rad2deg(np.abs(middle - truth)[done].max()):.2f} deg")
+
+    if not args.dry_run:
+        time.sleep(0.5)
+        controller.sync_write_torque_enable(ids, [0] * len(ids))
+    if calibration and (args.output or not args.dry_run):
+        previous = load_calibration(output) if os.path.exists(output) else {}
+        save_calibration(output, {**previous, **calibration},
+                         header=f"Generated by calibrate.py from {os.path.basename(args.config)} on "
+                                f"{time.strftime('%Y-%m-%d %H:%M')}\nmiddle: zero of the motor (abduction sweep, flexion "
+                                + ("of the config" if open_flexion is None else
+                                   f"{args.open_flexion:.1f} deg from the open endpoint")
+                                + "), min/max: range of the motor over both sweeps (rad)")
+        print(f"Saved {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""AHControl TOML hand configuration (config/r_hand.toml, config/2hands.toml) as NumPy arrays.
+
+Same schema as the Rust node: one [[motors]] table per finger, with
+`finger_name` and, for motor1/motor2, `id`, `offset` (rad), `invert` and
+`model`. Python-only, optional: `port` on a finger, the serial port of its
+motors when the hands are on several buses (default: the --serialport of the
+node).
+
+The goal of a motor is computed like in src/main.rs:
+    goal = (joint + offset) * (-1 if invert else 1)
+
+The offsets can be overridden by a calibration file written by calibrate.py
+(config/calibration.toml by default, used when it exists): one [[motors]]
+table per motor with its `id`, the goal position `middle` (rad) of its zero
+and the mechanical endpoints `min`/`max` (rad) found by the sweep.
+"""
+
+import os
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # python < 3.11
+    import tomli as tomllib
+
+import numpy as np
+
+SUPPORTED_MODELS = ["SCS0009"]
+
+CALIBRATION_FILE = "calibration.toml"
+
+
+def default_calibration(config_path):
+    """calibration.toml next to the config file, if there is one."""
+    path = os.path.join(os.path.dirname(os.path.abspath(config_path)), CALIBRATION_FILE)
+    return path if os.path.exists(path) else None
+
+
+def load_calibration(path):
+    """{motor id: {"middle": rad, "min": rad, "max": rad}} of a calibration file."""
+    with open(path, "rb") as f:
+        return {m["id"]: m for m in tomllib.load(f).get("motors", [])}
+
+
+def save_calibration(path, calibration, header=""):
+    """Write {motor id: {"middle", "min", "max"}} as a calibration file, sorted by id."""
+    lines = [f"# {line}" for line in header.splitlines()]
+    for motor_id in sorted(calibration):
+        m = calibration[motor_id]
+        lines += ["", "[[motors]]", f"id = {motor_id}"]
+        lines += [f"{key} = {float(m[key])!r}" for key in ("middle", "min", "max") if key in m]
+    with open(path, "w") as f:
+        f.write("\n".join(lines).lstrip("\n") + "\n")
+
+
+class HandConfig:
+    """Motors of the fingers, flattened in finger order: [finger1 motor1, finger1 motor2, finger2 motor1, ...]."""
+
+    def __init__(self, fingers, default_port=None):
+        self.finger_names = [f["finger_name"] for f in fingers]
+        motors = [(f, f[m]) for f in fingers for m in ("motor1", "motor2")]
+        for _, m in motors:
+            if m.get("model", "SCS0009") not in SUPPORTED_MODELS:
+                raise ValueError(f"motor {m['id']}: only {', '.join(SUPPORTED_MODELS)} motors are supported for now")
+        self.ids = np.array([m["id"] for _, m in motors], dtype=np.uint8)
+        self.offsets = np.array([m["offset"] for _, m in motors], dtype=float)
+        self.signs = np.array([-1.0 if m.get("invert", False) else 1.0 for _, m in motors])
+        self.ports = [f.get("port", default_port) for f, _ in motors]
+        if len(set(self.ids.tolist())) != len(self.ids):
+            raise ValueError("duplicated motor ids")
+
+    @classmethod
+    def load(cls, path, default_port=None, calibration="auto"):
+        """Load a TOML config; calibration: file overriding the offsets, "auto" for default_calibration()."""
+        with open(path, "rb") as f:
+            config = cls(tomllib.load(f)["motors"], default_port)
+        if calibration == "auto":
+            calibration = default_calibration(path)
+        if calibration:
+            config.calibrate(load_calibration(calibration))
+        return config
+
+    def calibrate(self, calibration):
+        """Use the `middle` of the calibrated motors as their zero; returns the ids without calibration."""
+        missing = []
+        for i, motor_id in enumerate(self.ids.tolist()):
+            if motor_id in calibration:
+                # goal(0) = offset * sign must be the middle
+                self.offsets[i] = calibration[motor_id]["middle"] * self.signs[i]
+            else:
+                missing.append(motor_id)
+        return missing
+
+    def finger_motors(self, name):
+        """Indices of the two motors of a finger in the flattened arrays."""
+        f = self.finger_names.index(name)
+        return [2 * f, 2 * f + 1]
+
+    def goals(self, joints, motors=slice(None)):
+        """Goal positions of `motors` (indices in the flattened arrays) for their joint angles."""
+        return (joints + self.offsets[motors]) * self.signs[motors]
+
+    def joints(self, goals, motors=slice(None)):
+        """Inverse of goals(): joint angles of motors at the given goal/present positions."""
+        return goals * self.signs[motors] - self.offsets[motors]
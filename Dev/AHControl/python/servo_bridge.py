@@ -0,0 +1,237 @@
+"""Python alternative to the AHControl node: joint positions from the simulation -> Feetech servos.
+
+Reads the same TOML configuration as the Rust node (see hand_config.py) and the
+same inputs (`mj_r_joints_pos`, `mj_l_joints_pos`: Float64Array of joint
+angles, with one `<finger_name>: [i, j]` metadata entry per finger giving the
+indices of its two motors in the array).
+
+Unlike src/main.rs, the serial transactions do not run in the event loop:
+every serial port has its own writer thread which always sends the latest
+goal of each of its motors with one sync-write. Goals that were replaced
+before the writer got to them are dropped, so a slow transaction delays the
+motors instead of the event handling. The mapping from the metadata to the
+motors is computed once per layout and the offsets/inversions are applied with
+NumPy on the whole message.
+
+    python AHControl/python/servo_bridge.py --serialport COM3 --config AHControl/config/r_hand.toml
+    python AHControl/python/servo_bridge.py --dry-run --dry-run-latency 2   # no hardware, 2 ms per sync-write
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from hand_config import HandConfig
+
+
+class DryRunController:
+    """Stands for the servo bus when no hardware is connected: every transaction takes `latency` seconds.
+
+    The motors reach their goal at once, within their `limits` ({id: (min, max)}
+    rad, mechanical endpoints), and report a load of 1000 when pushing on one.
+    """
+
+    def __init__(self, latency=0.0, limits=None):
+        self.latency = latency
+        self.limits = limits or {}
+        self.goal_position = {}
+
+    def sync_write_torque_enable(self, ids, values):
+        time.sleep(self.latency)
+
+    def sync_write_goal_position(self, ids, values):
+        time.sleep(self.latency)
+        self.goal_position.update(zip(ids, values))
+
+    def _position(self, motor_id):
+        low, high = self.limits.get(motor_id, (-np.inf, np.inf))
+        return min(max(self.goal_position.get(motor_id, 0.0), low), high)
+
+    def sync_read_present_position(self, ids):
+        time.sleep(self.latency)
+        return [self._position(i) for i in ids]
+
+    def sync_read_present_load(self, ids):
+        time.sleep(self.latency)
+        return [1000.0 if self._position(i) != self.goal_position.get(i, 0.0) else 0.0 for i in ids]
+
+
+def open_controller(port, baudrate, timeout):
+    from rustypot import Scs0009PyController
+
+    return Scs0009PyController(serial_port=port, baudrate=baudrate, timeout=timeout)
+
+
+class LatestWriter(threading.Thread):
+    """Writer thread of one serial port: sends the latest goal of every motor that has a new one."""
+
+    def __init__(self, port, controller, ids):
+        super().__init__(name=f"servo writer {port}", daemon=True)
+        self.port = port
+        self.controller = controller
+        self.ids = np.asarray(ids, dtype=np.uint8)
+        self.goals = np.zeros(len(ids))
+        self.dirty = np.zeros(len(ids), dtype=bool)
+        self.cond = threading.Condition()
+        self.running = True
+        self.submitted = self.dropped = self.writes = self.errors = 0
+        self.write_time = 0.0
+
+    def submit(self, motors, goals):
+        """Set new goals for motors (indices in self.ids); returns immediately."""
+        with self.cond:
+            self.dropped += int(np.count_nonzero(self.dirty[motors]))
+            self.goals[motors] = goals
+            self.dirty[motors] = True
+            self.submitted += len(goals)
+            self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while self.running and not self.dirty.any():
+                    self.cond.wait()
+                if not self.dirty.any():
+                    return
+                motors = np.flatnonzero(self.dirty)
+                ids = self.ids[motors].tolist()
+                goals = self.goals[motors].tolist()
+                self.dirty[:] = False
+            t0 = time.perf_counter()
+            try:
+                self.controller.sync_write_goal_position(ids, goals)
+            except Exception as e:  # keep the other motors and ports going
+                self.errors += 1
+                print(f"{self.port}: sync write failed: {e}")
+            self.write_time += time.perf_counter() - t0
+            self.writes += 1
+
+    def stop(self):
+        """Send the pending goals, then stop the thread."""
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        self.join()
+
+
+class ServoBridge:
+    """Joint angle messages -> goal positions, dispatched to the writer of each serial port."""
+
+    def __init__(self, config, controllers):
+        self.config = config
+        self.controllers = controllers
+        self.writers = []
+        self.motor_writer = np.zeros(len(config.ids), dtype=int)
+        self.motor_local = np.zeros(len(config.ids), dtype=int)
+        for port, controller in controllers.items():
+            motors = [i for i, p in enumerate(config.ports) if p == port]
+            self.motor_writer[motors] = len(self.writers)
+            self.motor_local[motors] = np.arange(len(motors))
+            self.writers.append(LatestWriter(port, controller, config.ids[motors]))
+        self.routes = {}
+        self.messages = 0
+
+    def route(self, metadata):
+        """(joint indices, motor indices, [(writer, positions, writer motors)]) of a message layout, cached."""
+        key = tuple(tuple(metadata[name]) if name in metadata else None for name in self.config.finger_names)
+        route = self.routes.get(key)
+        if route is None:
+            joints, motors = [], []
+            for name, index in zip(self.config.finger_names, key):
+                if index is not None:
+                    joints.extend(index)
+                    motors.extend(self.config.finger_motors(name))
+            motors = np.array(motors, dtype=int)
+            splits = []
+            for w, writer in enumerate(self.writers):
+                positions = np.flatnonzero(self.motor_writer[motors] == w)
+                if len(positions):
+                    splits.append((writer, positions, self.motor_local[motors[positions]]))
+            route = self.routes[key] = (np.array(joints, dtype=int), motors, splits)
+        return route
+
+    def handle(self, joints, metadata):
+        """Dispatch the goals of a joint angle message (array) to the writers."""
+        joint_index, motors, splits = self.route(metadata)
+        goals = self.config.goals(joints[joint_index], motors)
+        for writer, positions, local in splits:
+            writer.submit(local, goals[positions])
+        self.messages += 1
+
+    def start(self, settle=1.0):
+        """Torque on, motors to their zero (offsets), then start the writer threads."""
+        for writer in self.writers:
+            ids = writer.ids.tolist()
+            writer.controller.sync_write_torque_enable(ids, [1] * len(ids))
+        time.sleep(settle)
+        for w, writer in enumerate(self.writers):
+            motors = np.flatnonzero(self.motor_writer == w)
+            writer.controller.sync_write_goal_position(writer.ids.tolist(), self.config.goals(0.0, motors).tolist())
+        time.sleep(settle)
+        for writer in self.writers:
+            writer.start()
+
+    def stop(self, settle=1.0):
+        """Flush the writers, then torque off."""
+        for writer in self.writers:
+            writer.stop()
+        for writer in self.writers:
+            ids = writer.ids.tolist()
+            writer.controller.sync_write_torque_enable(ids, [0] * len(ids))
+        time.sleep(settle)
+
+    def report(self):
+        print(f"{self.messages} messages")
+        for writer in self.writers:
+            mean = writer.write_time / writer.writes * 1e3 if writer.writes else 0.0
+            print(f"{writer.port}: {writer.writes} sync writes ({mean:.2f} ms mean), "
+                  f"{writer.dropped}/{writer.submitted} goals dropped, {writer.errors} errors")
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--serialport", type=str, default="COM3",
+                    help="serial port of the motors that have no `port` in the config")
+    parser.add_argument("-b", "--baudrate", type=int, default=1_000_000)
+    parser.add_argument("-c", "--config", type=str, default="config/r_hand.toml", help="TOML config file")
+    parser.add_argument("--calibration", type=str, default="auto",
+                        help="calibration file overriding the offsets (default: calibration.toml next to the config, if any)")
+    parser.add_argument("--timeout", type=float, default=0.01, help="serial timeout (s)")
+    parser.add_argument("--dry-run", action="store_true", help="no hardware: the sync writes only take --dry-run-latency")
+    parser.add_argument("--dry-run-latency", type=float, default=2.0, help="duration of a transaction in dry run (ms)")
+    args = parser.parse_args()
+
+    print(f"Opening {args.config}")
+    config = HandConfig.load(args.config, args.serialport, args.calibration)
+    controllers = {}
+    for port in dict.fromkeys(config.ports):
+        if args.dry_run:
+            controllers[port] = DryRunController(args.dry_run_latency / 1e3)
+        else:
+            controllers[port] = open_controller(port, args.baudrate, args.timeout)
+    bridge = ServoBridge(config, controllers)
+    bridge.start(settle=0.0 if args.dry_run else 1.0)
+
+    from dora import Node
+
+    node = Node()
+    try:
+        for event in node:
+            if event["type"] == "INPUT":
+                if event["id"] in ("mj_r_joints_pos", "mj_l_joints_pos"):
+                    bridge.handle(event["value"].to_numpy(), event["metadata"])
+                else:
+                    print(f"Received input `{event['id']}`")
+            elif event["type"] == "ERROR":
+                raise RuntimeError(event["error"])
+    finally:
+        print("Quitting")
+        bridge.stop(settle=0.0 if args.dry_run else 1.0)
+        bridge.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ use std::{error::Error, time::Duration};
 use facet::Facet;
 use facet_pretty::FacetPretty;
 
+use std::path::Path;
 use std::{fs, thread};
 
 // use std::io::Read;
@@ -50,6 +51,37 @@ struct Args {
     /// TOML config file
     #[arg(short, long, default_value = "config/r_hand.toml")]
     config: String,
+    /// Calibration file overriding the offsets (default: calibration.toml next to the config, if any)
+    #[arg(long)]
+    calibration: Option<String>,
+}
+
+/// Replace the offsets by the middles of a calibration file written by python/calibrate.py
+fn apply_calibration(motors: &mut [Motors], path: &str) -> Result<(), Box<dyn Error>> {
+    let calibration: toml::Table = fs::read_to_string(path)?.parse()?;
+    let entries = calibration
+        .get("motors")
+        .and_then(|m| m.as_array())
+        .ok_or("calibration file without [[motors]]")?;
+    for entry in entries {
+        let id = entry
+            .get("id")
+            .and_then(|v| v.as_integer())
+            .ok_or("calibration entry without id")?;
+        let middle = entry
+            .get("middle")
+            .and_then(|v| v.as_float())
+            .ok_or("calibration entry without middle")?;
+        for finger in motors.iter_mut() {
+            for motor in [&mut finger.motor1, &mut finger.motor2] {
+                if motor.id as i64 == id {
+                    // the zero goal (offset, inverted) must be the middle
+                    motor.offset = if motor.invert { -middle } else { middle };
+                }
+            }
+        }
+    }
+    Ok(())
 }
 
 fn main() -> Result<(), Box<dyn Error>> {
@@ -58,11 +90,20 @@ fn main() -> Result<(), Box<dyn Error>> {
     let baudrate: u32 = args.baudrate;
     let configfile: String = args.config;
     println!("Opening {:?}", configfile);
-    let toml_str = fs::read_to_string(configfile).expect("Failed to read config file");
+    let toml_str = fs::read_to_string(&configfile).expect("Failed to read config file");
 
-    let motors_conf: Fingers =
+    let mut motors_conf: Fingers =
         facet_toml::from_str(&toml_str).expect("Failed to deserialize config file");
 
+    let calibration = args.calibration.or_else(|| {
+        let path = Path::new(&configfile).with_file_name("calibration.toml");
+        path.exists().then(|| path.to_string_lossy().into_owned())
+    });
+    if let Some(calibration) = calibration {
+        println!("Calibration {:?}", calibration);
+        apply_calibration(&mut motors_conf.motors, &calibration)?;
+    }
+
     println!("{}", motors_conf.pretty());
     let serial_port = serialport::new(serialport, baudrate)
         .timeout(Duration::from_millis(10))
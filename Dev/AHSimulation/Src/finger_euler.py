@@ -0,0 +1,14 @@
+"""Euler conventions of the finger tip orientations.
+
+The quaternion targets of the fingers (examples/finger_trajectory.py) and the
+fitted joint map (joint_map.py) read the flexion and the abduction of a finger
+from the same euler angles of its tip orientation, defined here once.
+"""
+
+# (index, sign) of the flexion and of the abduction in the euler angles of each sequence
+JOINT_AXES = {
+    'XYZ': ((1, 1.0), (0, 1.0)),
+    'xyz': ((1, -1.0), (2, 1.0)),  #the thumb pitch is negated, its abduction shows as yaw
+}
+# euler sequence of the tip orientation of fingers 1-4 (the thumb is the 4th)
+FINGER_SEQUENCES = ['XYZ', 'XYZ', 'XYZ', 'xyz']
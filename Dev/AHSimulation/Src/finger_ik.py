@@ -0,0 +1,158 @@
+"""Per-finger IK for the simulation Client: four small problems instead of one for the whole hand.
+
+The fingers are kinematically independent (see mj_batch_ik.finger_partition):
+each one only moves its own dofs (2 motors + passive linkage, 14 dofs) and only
+its own equality constraints close its linkage. So the IK of the Client
+(equality task + posture task + one frame task per tip, one QP over the 56 dofs
+of the hand) splits exactly into four 14x14 problems with the same costs:
+
+    H_f = sum_tasks (w J_f)^T (w J_f) + (damping + mu_f) I      c_f = -sum_tasks (w J_f)^T (w e_f)
+    dq_f = -H_f^-1 c_f
+
+with mu_f the Levenberg-Marquardt term of the frame task of the finger, as in
+mink. Without inequality constraints the problems are plain linear solves; the
+motor limits are applied like mink's ConfigurationLimit, by bounding the step
+to `limit_gain` times the distance to the limit.
+
+A finger is skipped when its target did not change and its last step was
+negligible (converged), so a still hand costs only the check. The four solves
+can run on a thread pool (`threads`), worth it only when MuJoCo and NumPy get
+enough work per finger to release the GIL for long.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import mujoco
+import numpy as np
+
+from mj_batch_ik import TIP_SITES, finger_partition, quat_error
+
+
+class FingerIK:
+    """IK of the hand of a mink.Configuration, solved finger by finger."""
+
+    def __init__(self, configuration, mode="pos", eq_cost=1000.0, posture_cost=1e-2, lm_damping=0.05,
+                 damping=1e-5, limit_gain=0.95, tolerance=1e-7, threads=0):
+        if mode not in ("pos", "quat"):
+            raise ValueError(f"unknown mode: {mode}")
+        self.configuration = configuration
+        self.model = model = configuration.model
+        self.data = data = configuration.data
+        self.mode = mode
+        self.eq_cost = eq_cost
+        self.posture_cost = posture_cost
+        self.lm_damping = lm_damping
+        self.damping = damping
+        self.limit_gain = limit_gain
+        self.tolerance = tolerance
+
+        self.finger_dofs, eqs = finger_partition(model)
+        configuration.update()
+        # equality rows come first in efc and, all equalities being always active, do not move
+        self.finger_eq_rows = [
+            np.flatnonzero((data.efc_type == mujoco.mjtConstraint.mjCNSTR_EQUALITY) & np.isin(data.efc_id, e))
+            for e in eqs
+        ]
+        self.tip_ids = [mujoco.mj_name2id(model, mujoco.mjtObj.mjOBJ_SITE, s) for s in TIP_SITES]
+        self.mocap_ids = [model.body_mocapid[model.body(f"finger{f + 1}_target").id] for f in range(4)]
+
+        # motor limits, per finger: (positions in the finger dofs, qpos address, range)
+        self.finger_limits = []
+        for dofs in self.finger_dofs:
+            limited = [j for j in range(model.njnt) if model.jnt_limited[j] and model.jnt_dofadr[j] in dofs]
+            self.finger_limits.append((
+                np.array([dofs.index(model.jnt_dofadr[j]) for j in limited], dtype=int),
+                np.array([model.jnt_qposadr[j] for j in limited], dtype=int),
+                np.array([model.jnt_range[j] for j in limited]).reshape(-1, 2),
+            ))
+
+        self.posture = data.qpos.copy()
+        self.last_target = [None] * 4
+        self.last_step = np.full(4, np.inf)
+        self.solved = np.zeros(4, dtype=int)  # solves per finger, for statistics
+        self._dq = np.zeros(model.nv)
+        self._posture_error = np.zeros(model.nv)
+        self._jac = [np.zeros((2, 3, model.nv)) for _ in range(4)]
+        self.pool = ThreadPoolExecutor(threads) if threads > 0 else None
+
+    def set_posture_from_configuration(self):
+        """Regularize toward the current configuration, like PostureTask.set_target_from_configuration."""
+        self.posture = self.data.qpos.copy()
+
+    def targets(self):
+        """Targets of the fingers from the mocap bodies: positions (4, 3) or wxyz quaternions (4, 4)."""
+        if self.mode == "pos":
+            return self.data.mocap_pos[self.mocap_ids]
+        return self.data.mocap_quat[self.mocap_ids]
+
+    def _efc_jacobian(self):
+        data = self.data
+        if mujoco.mj_isSparse(self.model):
+            efc_J = np.empty((data.nefc, self.model.nv))
+            mujoco.mju_sparse2dense(efc_J, data.efc_J, data.efc_J_rownnz, data.efc_J_rowadr, data.efc_J_colind)
+            return efc_J
+        return data.efc_J[: data.nefc * self.model.nv].reshape(data.nefc, self.model.nv)
+
+    def _solve_finger(self, f, target, efc_J):
+        """Step of finger f toward its target, in its own dofs."""
+        model, data = self.model, self.data
+        dofs = self.finger_dofs[f]
+        jac = self._jac[f]
+        mujoco.mj_jacSite(model, data, jac[0], jac[1], self.tip_ids[f])
+        if self.mode == "pos":
+            J_tip = jac[0][:, dofs]
+            e_tip = target - data.site_xpos[self.tip_ids[f]]
+        else:
+            J_tip = jac[1][:, dofs]
+            quat = np.empty(4)
+            mujoco.mju_mat2Quat(quat, data.site_xmat[self.tip_ids[f]])
+            e_tip = quat_error(target, quat)
+
+        rows = self.finger_eq_rows[f]
+        J_eq = self.eq_cost * efc_J[np.ix_(rows, dofs)]
+        e_eq = -self.eq_cost * data.efc_pos[rows]
+        e_posture = -self.posture_cost * self._posture_error[dofs]
+
+        mu = self.lm_damping * float(e_tip @ e_tip)
+        H = J_eq.T @ J_eq + J_tip.T @ J_tip
+        H.flat[:: len(dofs) + 1] += self.posture_cost ** 2 + self.damping + mu
+        g = J_eq.T @ e_eq + J_tip.T @ e_tip + self.posture_cost * e_posture
+        dq = np.linalg.solve(H, g)
+
+        index, qpos, bounds = self.finger_limits[f]
+        if len(index):
+            q = data.qpos[qpos]
+            dq[index] = np.clip(dq[index], self.limit_gain * (bounds[:, 0] - q), self.limit_gain * (bounds[:, 1] - q))
+        return dq
+
+    def step(self):
+        """One IK step of the fingers whose target moved or which did not converge yet.
+
+        Returns the number of fingers solved; the configuration is only updated when it is not zero.
+        """
+        targets = self.targets()
+        fingers = [f for f in range(4)
+                   if self.last_step[f] > self.tolerance or not np.array_equal(targets[f], self.last_target[f])]
+        if not fingers:
+            return 0
+
+        mujoco.mj_differentiatePos(self.model, self._posture_error, 1.0, self.posture, self.data.qpos)
+        efc_J = self._efc_jacobian()
+        if self.pool is not None and len(fingers) > 1:
+            steps = list(self.pool.map(lambda f: self._solve_finger(f, targets[f], efc_J), fingers))
+        else:
+            steps = [self._solve_finger(f, targets[f], efc_J) for f in fingers]
+
+        self._dq[:] = 0.0
+        for f, dq in zip(fingers, steps):
+            self._dq[self.finger_dofs[f]] = dq
+            self.last_target[f] = targets[f].copy()
+            self.last_step[f] = float(dq @ dq)
+            self.solved[f] += 1
+        mujoco.mj_integratePos(self.model, self.data.qpos, self._dq, 1.0)
+        self.configuration.update()
+        return len(fingers)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
@@ -0,0 +1,62 @@
+"""Generate the kinematic-only variant of the hand scenes used by the IK when there is no viewer.
+
+The onshape-to-robot output (robot.xml, joints_properties.xml, included by
+scene.xml) carries ~170 mesh geoms and 20 MB of STL meshes that only matter
+for display. This script loads the scene with MjSpec, removes every geom,
+mesh, material, texture and light, and writes the rest (bodies with their
+explicit inertials, joints, sites, equality constraints, actuators, mocap
+targets, keyframes) to AH_*/mjcf/scene_ik.xml. The kinematics are identical
+(same bodies, joints, sites and equalities); only the mocap target bodies lose
+the mass of their marker spheres.
+
+Regenerate the files after changing the MJCF with:
+    python ik_model.py
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+
+import mujoco
+
+from mj_batch_ik import IK_SCENES, SCENES
+
+ROOT_PATH = Path(os.path.dirname(os.path.abspath(__file__)))
+
+
+def strip_scene(scene_path):
+    """MJCF of the scene without any geometry, as a string."""
+    spec = mujoco.MjSpec.from_file(scene_path)
+    for elements in (spec.geoms, spec.meshes, spec.materials, spec.textures, spec.lights):
+        for element in list(elements):
+            spec.delete(element)
+    xml = spec.to_xml()
+    header = f"<!-- Generated by ik_model.py from {os.path.basename(scene_path)}, do not edit -->\n"
+    return header + xml
+
+
+def main():
+    """Write the IK scene of both hands and compare them with the full scenes."""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--side", type=str, choices=['right', 'left'], nargs="+", default=['right', 'left'])
+    args = parser.parse_args()
+
+    for side in args.side:
+        scene = (ROOT_PATH / SCENES[side]).as_posix()
+        output = (ROOT_PATH / IK_SCENES[side]).as_posix()
+        with open(output, "w") as f:
+            f.write(strip_scene(scene))
+
+        t0 = time.perf_counter()
+        full = mujoco.MjModel.from_xml_path(scene)
+        t1 = time.perf_counter()
+        ik = mujoco.MjModel.from_xml_path(output)
+        t2 = time.perf_counter()
+        print(f"written {output}: compile {t1 - t0:.3f}s -> {t2 - t1:.3f}s, "
+              f"model {full.nbuffer / 1e6:.1f} MB -> {ik.nbuffer / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""Direct joint-space mapping: (flexion, abduction) of each finger -> (motor1, motor2).
+
+The parallel linkage of a finger has no simple closed form, so the mapping is
+fitted once on the MuJoCo model: a grid of motor angles is sampled, the
+linkage is closed by solving the equality constraints with the motors locked,
+and the resulting tip orientations are expressed with the euler conventions
+of the trajectories (finger_euler.py). Two polynomials per finger are stored in
+AH_*/mjcf/joint_map.json:
+
+- (flexion, abduction) -> (motor1, motor2), used by the simulation `angle` mode;
+- (motor1, motor2) -> passive joints (tangent offsets from the "zero" keyframe),
+  so the viewer still shows a closed linkage without running any IK.
+
+The (flexion, abduction) range reached by the samples is stored too: outside of
+it the polynomial extrapolates, the inputs are clipped to it instead. The grid
+spans nearly the whole motor range (+-1.5 of +-pi/2 rad) and sampling all of it
+does not widen the fitted range: the thumb, for instance, does not flex beyond
+about 56 degrees, whatever the trajectories ask for.
+
+Regenerate the files after changing the MJCF with:
+    python joint_map.py --side right
+    python joint_map.py --side left
+"""
+
+import argparse
+import functools
+import json
+import os
+from pathlib import Path
+
+import mujoco
+import numpy as np
+from scipy.spatial.transform import Rotation
+
+from finger_euler import FINGER_SEQUENCES, JOINT_AXES
+from mj_batch_ik import MOTOR_JOINTS, SCENES, TIP_SITES, finger_partition, load_model
+
+ROOT_PATH = Path(os.path.dirname(os.path.abspath(__file__)))
+
+# per finger: euler sequence, then (index, sign) of the flexion and of the abduction angle
+FINGER_EULER = [(seq,) + JOINT_AXES[seq] for seq in FINGER_SEQUENCES]
+
+DEGREE = 5
+
+
+def joint_map_path(side):
+    """Location of the fitted map, next to the scene it was fitted on."""
+    return ROOT_PATH / Path(SCENES[side]).parent / "joint_map.json"
+
+
+@functools.lru_cache(maxsize=None)
+def poly_exponents(degree):
+    """Exponents (i, j) of the monomials x^i y^j, ordered by total degree then by j."""
+    j = np.array([j for d in range(degree + 1) for j in range(d + 1)])
+    i = np.array([d for d in range(degree + 1) for _ in range(d + 1)]) - j
+    return i, j
+
+
+def poly_features(x, y, degree=DEGREE):
+    """All monomials x^i y^j with i + j <= degree, shape (..., n_terms)."""
+    i, j = poly_exponents(degree)
+    powers = np.arange(degree + 1)
+    x = np.asarray(x, dtype=float)[..., None] ** powers
+    y = np.asarray(y, dtype=float)[..., None] ** powers
+    return x[..., i] * y[..., j]
+
+
+def quat_to_joint(quat, finger):
+    """Tip orientations (..., 4) wxyz -> (flexion, abduction) with the finger's euler convention."""
+    seq, (fi, fs), (ai, as_) = FINGER_EULER[finger]
+    euler = Rotation.from_quat(np.reshape(quat, (-1, 4)), scalar_first=True).as_euler(seq)
+    # as_euler keeps the middle angle in [-90, 90] deg but flexion goes beyond,
+    # take the equivalent triplet whose unused angle stays closest to zero
+    alt = np.angle(np.exp(1j * (euler * [1.0, -1.0, 1.0] + [np.pi, np.pi, np.pi])))
+    unused = 3 - fi - ai
+    euler = np.where(np.abs(alt[:, unused:unused + 1]) < np.abs(euler[:, unused:unused + 1]), alt, euler)
+    return np.stack([fs * euler[:, fi], as_ * euler[:, ai]], axis=-1).reshape(np.shape(quat)[:-1] + (2,))
+
+
+class JointMap:
+    """Evaluates the fitted per-finger polynomials on a hand model."""
+
+    def __init__(self, model, path):
+        with open(path) as f:
+            conf = json.load(f)
+        self.model = model
+        self.degree = conf["degree"]
+        self.motor_range = np.array(conf["motor_range"])  # (4, 2, 2)
+        # (4, 2, 2) fitted (flexion, abduction) range, None for files fitted before it was stored
+        self.joint_range = np.array(conf["joint_range"]) if "joint_range" in conf else None
+        self.clipped = 0  # calls with inputs outside of it
+        self.to_motors = np.array(conf["to_motors"])  # (4, n_terms, 2)
+        self.to_passive = np.array(conf["to_passive"])  # (4, n_terms, nv_f)
+        self.finger_dofs = np.array(conf["finger_dofs"])  # (4, nv_f)
+        self.qpos0 = model.key("zero").qpos.copy()
+        self.motor_qpos = [model.jnt_qposadr[model.joint(j).id] for j in MOTOR_JOINTS]
+        self._dq = np.zeros(model.nv)
+
+    def motors(self, fingers, flexion, abduction):
+        """Motor angles (n, 2) of the fingers (n,) from their flexion and abduction (n,), clipped to the joint range.
+
+        All the fingers are evaluated at once: one feature matrix, one batched product.
+        Inputs outside of the fitted range are clipped to it.
+        """
+        if self.joint_range is not None:
+            r = self.joint_range[fingers]
+            inputs = np.stack([flexion, abduction], axis=-1)
+            clipped = np.clip(inputs, r[..., 0], r[..., 1])
+            if not np.array_equal(clipped, inputs):
+                if not self.clipped:
+                    print("Joint map: (flexion, abduction) outside of the fitted range, clipped to it")
+                self.clipped += 1
+                flexion, abduction = clipped[..., 0], clipped[..., 1]
+        feats = poly_features(flexion, abduction, self.degree)  # (n, n_terms)
+        m = (feats[:, None, :] @ self.to_motors[fingers])[:, 0]
+        return np.clip(m, self.motor_range[fingers, :, 0], self.motor_range[fingers, :, 1])
+
+    def qpos(self, motor_pos, out):
+        """Write into `out` the whole configuration with the motors at `motor_pos` (8,)."""
+        feats = poly_features(motor_pos[0::2], motor_pos[1::2], self.degree)  # (4, n_terms)
+        self._dq[self.finger_dofs] = (feats[:, None, :] @ self.to_passive)[:, 0]
+        out[:] = self.qpos0
+        mujoco.mj_integratePos(self.model, out, self._dq, 1.0)
+        out[self.motor_qpos] = motor_pos
+
+
+def close_linkage(model, datas, motors, finger_dofs, eq_rows, motor_dofs, iterations=80, ramp=40, damping=1e-9):
+    """Solve the equality constraints of every data with its motors driven to `motors` (S, 8)."""
+    free = np.ones(model.nv, dtype=bool)
+    free[motor_dofs] = False
+    free = free[finger_dofs]  # (4, nv_f) which finger dofs the solve may move
+    dq = np.zeros(model.nv)
+    motor_qpos = [model.jnt_qposadr[model.joint(j).id] for j in MOTOR_JOINTS]
+    eye = np.eye(finger_dofs.shape[1])
+    for k in range(iterations):
+        alpha = min(1.0, (k + 1) / ramp)
+        J = np.zeros((len(datas), 4, eq_rows.shape[1], finger_dofs.shape[1]))
+        e = np.zeros((len(datas), 4, eq_rows.shape[1]))
+        for i, data in enumerate(datas):
+            data.qpos[motor_qpos] = alpha * motors[i]
+            mujoco.mj_fwdPosition(model, data)
+            efc_J = data.efc_J[: data.nefc * model.nv].reshape(data.nefc, model.nv)
+            J[i] = efc_J[eq_rows[:, :, None], finger_dofs[:, None, :]]
+            e[i] = -data.efc_pos[eq_rows]
+        J = J * free[:, None, :]
+        Jt = np.swapaxes(J, -1, -2)
+        step = np.linalg.solve(Jt @ J + damping * eye, Jt @ e[..., None])[..., 0]
+        for i, data in enumerate(datas):
+            dq[finger_dofs] = step[i]
+            mujoco.mj_integratePos(model, data.qpos, dq, 1.0)
+    residual = np.zeros(len(datas))
+    for i, data in enumerate(datas):
+        mujoco.mj_fwdPosition(model, data)
+        residual[i] = np.abs(data.efc_pos[eq_rows]).max()
+    return residual
+
+
+def fit(side, grid=31, limit=1.5, tolerance=1e-4):
+    """Sample the motors on a grid, close the linkage and fit both polynomials for every finger."""
+    model = load_model(side)
+    key = model.key("zero").id
+    dofs, eqs = finger_partition(model)
+    finger_dofs = np.array(dofs)
+
+    m = np.linspace(-limit, limit, grid)
+    m1, m2 = [a.ravel() for a in np.meshgrid(m, m)]
+    motors = np.repeat(np.stack([m1, m2], axis=-1), 4, axis=0).reshape(-1, 8)  # same pair on every finger
+
+    datas = []
+    for _ in range(len(motors)):
+        data = mujoco.MjData(model)
+        mujoco.mj_resetDataKeyframe(model, data, key)
+        mujoco.mj_fwdPosition(model, data)
+        datas.append(data)
+    eq_idx = np.flatnonzero(datas[0].efc_type == mujoco.mjtConstraint.mjCNSTR_EQUALITY)
+    eq_rows = np.array([[r for r in eq_idx if datas[0].efc_id[r] in e] for e in eqs])
+    motor_dofs = [model.jnt_dofadr[model.joint(j).id] for j in MOTOR_JOINTS]
+
+    residual = close_linkage(model, datas, motors, finger_dofs, eq_rows, motor_dofs)
+    ok = residual < tolerance
+    print(f"{side}: {ok.sum()}/{len(ok)} samples closed (max residual {residual[ok].max():.2e})")
+
+    qpos0 = model.key_qpos[key]
+    tips = [mujoco.mj_name2id(model, mujoco.mjtObj.mjOBJ_SITE, s) for s in TIP_SITES]
+    to_motors, to_passive, motor_range, joint_range = [], [], [], []
+    for f in range(4):
+        quat = np.zeros((ok.sum(), 4))
+        passive = np.zeros((ok.sum(), finger_dofs.shape[1]))
+        dq = np.zeros(model.nv)
+        for n, i in enumerate(np.flatnonzero(ok)):
+            mujoco.mju_mat2Quat(quat[n], datas[i].site_xmat[tips[f]])
+            mujoco.mj_differentiatePos(model, dq, 1.0, qpos0, datas[i].qpos)
+            passive[n] = dq[finger_dofs[f]]
+        joint = quat_to_joint(quat, f)
+        fm = motors[ok][:, 2 * f:2 * f + 2]
+
+        coef_m = np.linalg.lstsq(poly_features(joint[:, 0], joint[:, 1]), fm, rcond=None)[0]
+        coef_p = np.linalg.lstsq(poly_features(fm[:, 0], fm[:, 1]), passive, rcond=None)[0]
+        err_m = np.abs(poly_features(joint[:, 0], joint[:, 1]) @ coef_m - fm).max()
+        err_p = np.abs(poly_features(fm[:, 0], fm[:, 1]) @ coef_p - passive).max()
+        print(f"  finger{f+1}: flexion [{np.degrees(joint[:, 0].min()):.1f}, {np.degrees(joint[:, 0].max()):.1f}] deg, "
+              f"abduction [{np.degrees(joint[:, 1].min()):.1f}, {np.degrees(joint[:, 1].max()):.1f}] deg, "
+              f"max error motors {err_m:.2e} rad, passive {err_p:.2e} rad")
+        to_motors.append(coef_m.tolist())
+        to_passive.append(coef_p.tolist())
+        motor_range.append([model.joint(MOTOR_JOINTS[2 * f + k]).range.tolist() for k in range(2)])
+        joint_range.append([[joint[:, k].min(), joint[:, k].max()] for k in range(2)])
+
+    return {
+        "scene": SCENES[side],
+        "degree": DEGREE,
+        "motor_range": motor_range,
+        "joint_range": joint_range,
+        "finger_dofs": finger_dofs.tolist(),
+        "to_motors": to_motors,
+        "to_passive": to_passive,
+    }
+
+
+def main():
+    """Fit the joint map of one hand and write it next to its scene."""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--side", type=str, choices=['right', 'left'], default='right')
+    parser.add_argument("-g", "--grid", type=int, default=31, help="number of samples per motor")
+    parser.add_argument("-l", "--limit", type=float, default=1.5, help="sampled motor range [-limit, limit] (rad)")
+    args = parser.parse_args()
+
+    conf = fit(args.side, args.grid, args.limit)
+    with open(joint_map_path(args.side), "w") as f:
+        json.dump(conf, f)
+    print(f"written {joint_map_path(args.side)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""Batched IK: solve many simulated AmazingHands in one process.
+
+Every hand gets its own MjData on a shared MjModel. Since the four fingers are
+kinematically independent, each tick stacks the per-finger Jacobians of all
+hands into one (N*4, rows, dofs) array and solves the damped least-squares
+step for all of them with a single batched NumPy call.
+"""
+
+import argparse
+
+import os
+import time
+
+import mujoco
+from pathlib import Path
+import numpy as np
+
+from model_cache import load_scene
+
+ROOT_PATH = Path(os.path.dirname(os.path.abspath(__file__)))
+
+SCENES = {
+    "right": "AH_Right/mjcf/scene.xml",
+    "left": "AH_Left/mjcf/scene.xml",
+}
+
+# same scenes without meshes nor any geom, generated by ik_model.py
+IK_SCENES = {
+    "right": "AH_Right/mjcf/scene_ik.xml",
+    "left": "AH_Left/mjcf/scene_ik.xml",
+}
+
+TIP_SITES = ["tip1", "tip2", "tip3", "tip4"]
+
+# same order as Client.motor_pos: [f1_motor1, f1_motor2, f2_motor1, ...]
+MOTOR_JOINTS = [f"finger{f}_motor{m}" for f in range(1, 5) for m in (1, 2)]
+
+
+def load_model(side="right"):
+    """Load the hand scene with only what the kinematic IK needs enabled."""
+    model = load_scene((ROOT_PATH / IK_SCENES[side]).as_posix(), verbose=False)
+    # we only read the equality rows of efc_J, keep them dense and skip the rest
+    model.opt.jacobian = mujoco.mjtJacobian.mjJAC_DENSE
+    model.opt.disableflags |= (
+        mujoco.mjtDisableBit.mjDSBL_CONTACT
+        | mujoco.mjtDisableBit.mjDSBL_FRICTIONLOSS
+        | mujoco.mjtDisableBit.mjDSBL_LIMIT
+    )
+    return model
+
+
+def finger_partition(model):
+    """Split the hand into its four independent finger chains.
+
+    Every finger hangs from the wrist body through the two bodies carried by
+    its motors. Returns, for each finger, the sorted dof indices and the ids
+    of the equality constraints closing its linkage.
+    """
+    motor_finger = {}
+    for f in range(4):
+        for m in (1, 2):
+            jnt = mujoco.mj_name2id(model, mujoco.mjtObj.mjOBJ_JOINT, f"finger{f+1}_motor{m}")
+            motor_finger[model.jnt_bodyid[jnt]] = f
+
+    def body_finger(body):
+        while body not in motor_finger:
+            body = model.body_parentid[body]
+            if body == 0:
+                return None
+        return motor_finger[body]
+
+    dofs = [[] for _ in range(4)]
+    for jnt in range(model.njnt):
+        f = body_finger(model.jnt_bodyid[jnt])
+        if f is not None:
+            adr = model.jnt_dofadr[jnt]
+            if model.jnt_type[jnt] == mujoco.mjtJoint.mjJNT_FREE:
+                ndof = 6
+            elif model.jnt_type[jnt] == mujoco.mjtJoint.mjJNT_BALL:
+                ndof = 3
+            else:
+                ndof = 1
+            dofs[f].extend(range(adr, adr + ndof))
+
+    eqs = [[] for _ in range(4)]
+    for eq in range(model.neq):
+        obj = model.eq_obj1id[eq]
+        if model.eq_objtype[eq] == mujoco.mjtObj.mjOBJ_SITE:
+            obj = model.site_bodyid[obj]
+        eqs[body_finger(obj)].append(eq)
+
+    return [sorted(d) for d in dofs], eqs
+
+
+def quat_error(target, current):
+    """Rotation vector taking `current` onto `target` (world frame), [..., 4] wxyz quats."""
+    w1, v1 = current[..., :1], -current[..., 1:]  # conjugate of current
+    w2, v2 = target[..., :1], target[..., 1:]
+    w = w2 * w1 - np.sum(v2 * v1, axis=-1, keepdims=True)
+    v = w2 * v1 + w1 * v2 + np.cross(v2, v1)
+    v = np.where(w < 0, -v, v)  # shortest path
+    norm = np.linalg.norm(v, axis=-1, keepdims=True)
+    angle = 2.0 * np.arctan2(norm, np.abs(w))
+    return np.where(norm > 1e-12, v * angle / np.maximum(norm, 1e-12), 0.0)
+
+
+def quat_mul(res, q1, q2):
+    """Batched wxyz quaternion product res = q1 * q2."""
+    w1, v1 = q1[..., :1], q1[..., 1:]
+    w2, v2 = q2[..., :1], q2[..., 1:]
+    res[..., :1] = w1 * w2 - np.sum(v1 * v2, axis=-1, keepdims=True)
+    res[..., 1:] = w1 * v2 + w2 * v1 + np.cross(v1, v2)
+
+
+class BatchIK:
+    """N hands of one side, solved together with per-finger damped least squares."""
+
+    def __init__(self, n_hands, side="right", mode="pos", damping=1e-6, eq_cost=1000.0):
+        """Create `n_hands` copies of the hand, all starting from the "zero" keyframe."""
+        if mode not in ("pos", "quat"):
+            raise ValueError(f"unknown mode: {mode}")
+        self.n_hands = n_hands
+        self.mode = mode
+        self.damping = damping
+
+        self.model = load_model(side)
+        key = self.model.key("zero").id
+        self.datas = []
+        for _ in range(n_hands):
+            data = mujoco.MjData(self.model)
+            mujoco.mj_resetDataKeyframe(self.model, data, key)
+            mujoco.mj_fwdPosition(self.model, data)
+            self.datas.append(data)
+
+        dofs, eqs = finger_partition(self.model)
+        if len({len(d) for d in dofs}) != 1 or len({len(e) for e in eqs}) != 1:
+            raise ValueError("fingers must share the same chain structure to be batched")
+        self.finger_dofs = np.array(dofs)  # (4, nv_f)
+        # equality rows of efc_J, connect constraints contribute 3 rows each
+        data = self.datas[0]
+        eq_rows = np.flatnonzero(data.efc_type == mujoco.mjtConstraint.mjCNSTR_EQUALITY)
+        self.finger_eq_rows = np.array(
+            [[r for r in eq_rows if data.efc_id[r] in e] for e in eqs]
+        )  # (4, neq_f)
+
+        self.tip_ids = [mujoco.mj_name2id(self.model, mujoco.mjtObj.mjOBJ_SITE, s) for s in TIP_SITES]
+        self.motor_qpos = np.array(
+            [self.model.jnt_qposadr[self.model.joint(j).id] for j in MOTOR_JOINTS]
+        )
+        self.motor_range = np.array([self.model.joint(j).range for j in MOTOR_JOINTS])
+
+        nv_f = self.finger_dofs.shape[1]
+        neq_f = self.finger_eq_rows.shape[1]
+        self._rows = neq_f + 3
+        self._J = np.zeros((n_hands, 4, self._rows, nv_f))
+        self._e = np.zeros((n_hands, 4, self._rows))
+        self._weights = np.sqrt(np.r_[np.full(neq_f, eq_cost), np.ones(3)])
+        self._jac = np.zeros((2, 3, self.model.nv))
+        self._dq = np.zeros(self.model.nv)
+        self._eye = np.eye(nv_f)
+
+        # start by holding the initial tips
+        self.tip_pos = self.tip_positions()
+        self.tip_quat = self.tip_orientations()
+
+    def tip_positions(self):
+        """Current tip site positions, (N, 4, 3)."""
+        return np.array([d.site_xpos[self.tip_ids] for d in self.datas])
+
+    def tip_orientations(self):
+        """Current tip site orientations as wxyz quaternions, (N, 4, 4)."""
+        quat = np.zeros((self.n_hands, 4, 4))
+        for i, d in enumerate(self.datas):
+            for f, site in enumerate(self.tip_ids):
+                mujoco.mju_mat2Quat(quat[i, f], d.site_xmat[site])
+        return quat
+
+    def set_targets(self, targets):
+        """Set tip targets for all hands: (N, 4, 3) positions or (N, 4, 4) wxyz quaternions."""
+        targets = np.asarray(targets, dtype=float)
+        if self.mode == "pos":
+            self.tip_pos = targets.reshape(self.n_hands, 4, 3)
+        else:
+            self.tip_quat = targets.reshape(self.n_hands, 4, 4)
+
+    def step(self):
+        """Do one damped least-squares step on every hand."""
+        neq_f = self.finger_eq_rows.shape[1]
+        jac = self._jac[0] if self.mode == "pos" else self._jac[1]
+        for i, data in enumerate(self.datas):
+            efc_J = data.efc_J[: data.nefc * self.model.nv].reshape(data.nefc, self.model.nv)
+            self._J[i, :, :neq_f] = efc_J[self.finger_eq_rows[:, :, None], self.finger_dofs[:, None, :]]
+            self._e[i, :, :neq_f] = -data.efc_pos[self.finger_eq_rows]
+            for f, site in enumerate(self.tip_ids):
+                mujoco.mj_jacSite(self.model, data, self._jac[0], self._jac[1], site)
+                self._J[i, f, neq_f:] = jac[:, self.finger_dofs[f]]
+
+        if self.mode == "pos":
+            self._e[:, :, neq_f:] = self.tip_pos - self.tip_positions()
+        else:
+            self._e[:, :, neq_f:] = quat_error(self.tip_quat, self.tip_orientations())
+
+        # all N*4 finger problems at once: (J^T W J + lambda I) dq = J^T W e
+        J = self._J * self._weights[:, None]
+        e = self._e * self._weights
+        Jt = np.swapaxes(J, -1, -2)
+        dq = np.linalg.solve(Jt @ J + self.damping * self._eye, (Jt @ e[..., None]))[..., 0]
+
+        for i, data in enumerate(self.datas):
+            self._dq[self.finger_dofs] = dq[i]
+            mujoco.mj_integratePos(self.model, data.qpos, self._dq, 1.0)
+            data.qpos[self.motor_qpos] = np.clip(
+                data.qpos[self.motor_qpos], self.motor_range[:, 0], self.motor_range[:, 1]
+            )
+            mujoco.mj_fwdPosition(self.model, data)
+
+    def motor_pos(self):
+        """Motor angles of all hands, (N, 8)."""
+        return np.array([d.qpos[self.motor_qpos] for d in self.datas])
+
+
+def main():
+    """Run N hands on sine tip targets and report throughput."""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--hands", type=int, default=32, help="number of simulated hands")
+    parser.add_argument("-s", "--side", type=str, choices=['right', 'left'], default='right')
+    parser.add_argument("-m", "--mode", type=str, choices=['pos', 'quat'], default='pos',
+                        help="control mode: pos=position of the tips, quat=orientation of the tips")
+    parser.add_argument("-t", "--ticks", type=int, default=500, help="number of IK ticks to run")
+    args = parser.parse_args()
+
+    ik = BatchIK(args.hands, side=args.side, mode=args.mode)
+    rng = np.random.default_rng(0)
+    phase = rng.uniform(0.0, 2.0 * np.pi, size=(args.hands, 4, 1))
+    pos0 = ik.tip_pos.copy()
+    quat0 = ik.tip_quat.copy()
+    dt = 0.002
+
+    t0 = time.perf_counter()
+    for tick in range(args.ticks):
+        s = np.sin(2.0 * np.pi * 1.0 * tick * dt + phase)
+        if args.mode == "pos":
+            ik.set_targets(pos0 + 0.01 * s * np.array([1.0, 0.0, -1.0]))
+        else:
+            # small rotation about the world y axis
+            half = 0.5 * np.radians(20.0) * s
+            rot = np.concatenate([np.cos(half), np.zeros_like(half), np.sin(half), np.zeros_like(half)], axis=-1)
+            target = np.empty_like(quat0)
+            quat_mul(target, rot, quat0)
+            ik.set_targets(target)
+        ik.step()
+    elapsed = time.perf_counter() - t0
+
+    if args.mode == "pos":
+        err = np.linalg.norm(ik.tip_pos - ik.tip_positions(), axis=-1)
+    else:
+        err = np.linalg.norm(quat_error(ik.tip_quat, ik.tip_orientations()), axis=-1)
+    print(f"{args.hands} {args.side} hands x {args.ticks} ticks in {elapsed:.3f}s "
+          f"=> {args.hands * args.ticks / elapsed:.0f} hands*ticks/s "
+          f"({elapsed / args.ticks * 1e3:.3f} ms/tick, mean tip error {err.mean():.2e})")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,32 +2,39 @@
 
 import argparse
 
+import contextlib
 import os
 import time
 
+START_TIME = time.perf_counter()
+
 import mujoco
-import mujoco.viewer
 import pyarrow as pa
-from dora import Node
 
 import mink
 from loop_rate_limiters import RateLimiter
-from mink.contrib import TeleopMocap
 from pathlib import Path
 import numpy as np
 
+from joint_map import JointMap
+from model_cache import load_scene
+
+# mujoco.viewer and dora are only imported by Client.run(), the Client itself
+# (IK, joint map) can be used headless, e.g. by the benchmarks
+
 ROOT_PATH = Path(os.path.dirname(os.path.abspath(__file__)))
 
 
 class Client:
     """TODO: Add docstring."""
 
-    def __init__(self, mode='pos'):
+    def __init__(self, mode='pos', ik='full', ik_threads=0, viewer=True, solver='quadprog', log_pairs=None):
         """TODO: Add docstring."""
 
-
-        self.model = mujoco.MjModel.from_xml_path(
-            (ROOT_PATH / "AH_Right/mjcf/scene.xml").as_posix()
+        # without viewer, the IK only needs the kinematics: load the scene without meshes (see ik_model.py)
+        self.viewer = viewer
+        self.model = load_scene(
+            (ROOT_PATH / ("AH_Right/mjcf/scene.xml" if viewer else "AH_Right/mjcf/scene_ik.xml")).as_posix()
         )
         # self.data=mujoco.MjData(self.model)
 
@@ -106,47 +113,77 @@ class Client:
                 orientation_cost=1.0,
                 lm_damping=1.0,
             )
+        elif mode=='angle':
+            # joint space input (flexion, abduction of each finger): the fitted joint map
+            # gives the motor angles and the passive linkage directly, no IK is solved
+            self.joint_map = JointMap(
+                self.model, (ROOT_PATH / "AH_Right/mjcf/joint_map.json").as_posix()
+            )
+            self.joint_target = np.zeros(8)
         else:
             print(f"Error, unknown mode: {mode}")
             return -1
+        self.mode = mode
         # Regulate all equality constraints with the same cost.
         eq_task = mink.EqualityConstraintTask(self.model, cost=1000.0)
 
-        self.tasks = [
-            eq_task,
-            self.posture_task,
-            self.task1,
-            self.task2,
-            self.task3,
-            self.task4,
-        ]
+        if mode=='angle':
+            self.tasks = []
+        else:
+            self.tasks = [
+                eq_task,
+                self.posture_task,
+                self.task1,
+                self.task2,
+                self.task3,
+                self.task4,
+            ]
 
 
 
         self.model = self.configuration.model
         self.data = self.configuration.data
-        self.solver = "quadprog"
+        self.solver = solver
+
+        # ik='finger': same tasks, solved as 4 independent per-finger problems (see finger_ik.py)
+        self.finger_ik = None
+        if ik=='finger' and mode!='angle':
+            from finger_ik import FingerIK
+            self.finger_ik = FingerIK(self.configuration, mode, lm_damping=self.task1.lm_damping, threads=ik_threads)
+        elif solver=='auto' and mode!='angle':
+            # time every installed QP backend on this hand, keep the fastest that converges
+            from qp_solver import calibrate, choose_solver
+            self.solver = 'quadprog'
+            self.solver = choose_solver(calibrate(self))
+            print(f"QP solver: {self.solver}")
 
         self.motor_pos=[]
         self.metadata=[]
-        self.node = Node()
+        self.node = None
+
+        # (tips, converged motor angles) pairs to train a retargeting model (see retarget.py)
+        self.pair_logger = None
+        if log_pairs:
+            from retarget import PairLogger
+            self.pair_logger = PairLogger(log_pairs, 'r')
 
     def run(self):
         """TODO: Add docstring."""
-        with mujoco.viewer.launch_passive(self.model, self.data) as viewer:
+        from dora import Node
+
+        self.node = Node()
+        if self.viewer:
+            import mujoco.viewer
+            viewer_context = mujoco.viewer.launch_passive(self.model, self.data)
+        else:
+            viewer_context = contextlib.nullcontext()
+        with viewer_context as viewer:
+            print(f"Simulation ready {time.perf_counter() - START_TIME:.2f}s after start")
 
             rate = RateLimiter(frequency=500.0)
             # dt = rate.dt
             # t = 0
-            self.configuration.update_from_keyframe("zero")
-
-            # Initialize mocap bodies at their respective sites.
-            self.posture_task.set_target_from_configuration(self.configuration)
-
-            mink.move_mocap_to_frame(self.model, self.data, "finger1_target", "tip1", "site")
-            mink.move_mocap_to_frame(self.model, self.data, "finger2_target", "tip2", "site")
-            mink.move_mocap_to_frame(self.model, self.data, "finger3_target", "tip3", "site")
-            mink.move_mocap_to_frame(self.model, self.data, "finger4_target", "tip4", "site")
+            self.reset()
 
 
             for event in self.node:
@@ -158,34 +195,15 @@ class Client:
                     if event_id == "tick":
                         # self.node.send_output("tick", pa.array([]), event["metadata"])
 
-                        if not viewer.is_running():
+                        if viewer is not None and not viewer.is_running():
                             break
 
                         step_start = time.time()
 
 
 
-                        self.task1.set_target(
-                            mink.SE3.from_mocap_name(self.model, self.data, "finger1_target")
-                        )
-                        self.task2.set_target(
-                            mink.SE3.from_mocap_name(self.model, self.data, "finger2_target")
-                        )
-                        self.task3.set_target(
-                            mink.SE3.from_mocap_name(self.model, self.data, "finger3_target")
-                        )
-                        self.task4.set_target(
-                            mink.SE3.from_mocap_name(self.model, self.data, "finger4_target")
-                        )
-
-
-
-
-
-                        # vel = mink.solve_ik(self.configuration, self.tasks, self.model.opt.timestep, self.solver, 1e-5)
-                        # self.configuration.integrate_inplace(vel, self.model.opt.timestep)
-                        vel = mink.solve_ik(self.configuration, self.tasks, rate.dt, self.solver, 1e-5)
-                        self.configuration.integrate_inplace(vel, rate.dt)
+                        if self.mode!='angle':
+                            self.ik_step(rate.dt)
 
 
 
@@ -197,30 +215,20 @@ class Client:
 
                         #get the motors position and send for real motor control
 
-                        f1_motor1=mujoco.mj_name2id(self.model,mujoco.mjtObj.mjOBJ_JOINT,"finger1_motor1")
-                        f1_motor2=mujoco.mj_name2id(self.model,mujoco.mjtObj.mjOBJ_JOINT,"finger1_motor2")
-                        f2_motor1=mujoco.mj_name2id(self.model,mujoco.mjtObj.mjOBJ_JOINT,"finger2_motor1")
-                        f2_motor2=mujoco.mj_name2id(self.model,mujoco.mjtObj.mjOBJ_JOINT,"finger2_motor2")
-                        f3_motor1=mujoco.mj_name2id(self.model,mujoco.mjtObj.mjOBJ_JOINT,"finger3_motor1")
-                        f3_motor2=mujoco.mj_name2id(self.model,mujoco.mjtObj.mjOBJ_JOINT,"finger3_motor2")
-                        f4_motor1=mujoco.mj_name2id(self.model,mujoco.mjtObj.mjOBJ_JOINT,"finger4_motor1")
-                        f4_motor2=mujoco.mj_name2id(self.model,mujoco.mjtObj.mjOBJ_JOINT,"finger4_motor2")
-                        # print(f"motor1: {self.data.joint(f1_motor1).qpos} motor2: {self.data.joint(f1_motor2).qpos}")
                         self.metadata=event["metadata"]
                         self.metadata["r_finger1"]=[0,1]
                         self.metadata["r_finger2"]=[2,3]
                         self.metadata["r_finger3"]=[4,5]
                         self.metadata["r_finger4"]=[6,7]
 
-                        self.motor_pos=np.zeros(8);
-                        self.motor_pos[self.metadata["r_finger1"]]=np.array([self.data.joint(f1_motor1).qpos[0],self.data.joint(f1_motor2).qpos[0]])
-                        self.motor_pos[self.metadata["r_finger2"]]=np.array([self.data.joint(f2_motor1).qpos[0],self.data.joint(f2_motor2).qpos[0]])
-                        self.motor_pos[self.metadata["r_finger3"]]=np.array([self.data.joint(f3_motor1).qpos[0],self.data.joint(f3_motor2).qpos[0]])
-                        self.motor_pos[self.metadata["r_finger4"]]=np.array([self.data.joint(f4_motor1).qpos[0],self.data.joint(f4_motor2).qpos[0]])
+                        self.motor_pos=self.read_motors()
+                        if self.pair_logger is not None:
+                            self.pair_logger.update(self.motor_pos)
 
 
 
-                        viewer.sync()
+                        if viewer is not None:
+                            viewer.sync()
 
                         # Rudimentary time keeping, will drift relative to wall clock.
                         # time_until_next_step = self.model.opt.timestep - (
@@ -249,11 +257,15 @@ class Client:
                         # print(f"Received hand pos: {event['value']}")
                         try:
                             self.write_mocap_pos(event["value"])
+                            if self.pair_logger is not None:
+                                self.pair_logger.target(event["value"])
                             # print(f"Updated mocap: {self.data.mocap_pos[0]}")
                         except Exception as e:
                             print(f"Error updating mocap: {e}")
                     elif event_id == "r_hand_quat":
                         self.write_mocap_quat(event["value"])
+                    elif event_id == "r_hand_angle":
+                        self.write_joint_angle(event["value"])
 
                     elif event_id == "end":
                         break
@@ -263,8 +275,57 @@ class Client:
                         "An error occurred in the dataflow: " + event["error"],
                     )
 
+            if self.pair_logger is not None:
+                self.pair_logger.save()
             self.node.send_output("end", pa.array([]))
 
+    def reset(self):
+        """Back to the "zero" keyframe, with the posture and the mocap targets on the current tips."""
+        self.configuration.update_from_keyframe("zero")
+
+        # Initialize mocap bodies at their respective sites.
+        self.posture_task.set_target_from_configuration(self.configuration)
+        if self.finger_ik is not None:
+            self.finger_ik.set_posture_from_configuration()
+
+        mink.move_mocap_to_frame(self.model, self.data, "finger1_target", "tip1", "site")
+        mink.move_mocap_to_frame(self.model, self.data, "finger2_target", "tip2", "site")
+        mink.move_mocap_to_frame(self.model, self.data, "finger3_target", "tip3", "site")
+        mink.move_mocap_to_frame(self.model, self.data, "finger4_target", "tip4", "site")
+
+    def ik_step(self, dt):
+        """Move the fingers one IK step towards the mocap targets."""
+        if self.finger_ik is not None:
+            self.finger_ik.step()
+            return
+
+        self.task1.set_target(
+            mink.SE3.from_mocap_name(self.model, self.data, "finger1_target")
+        )
+        self.task2.set_target(
+            mink.SE3.from_mocap_name(self.model, self.data, "finger2_target")
+        )
+        self.task3.set_target(
+            mink.SE3.from_mocap_name(self.model, self.data, "finger3_target")
+        )
+        self.task4.set_target(
+            mink.SE3.from_mocap_name(self.model, self.data, "finger4_target")
+        )
+
+        # vel = mink.solve_ik(self.configuration, self.tasks, self.model.opt.timestep, self.solver, 1e-5)
+        # self.configuration.integrate_inplace(vel, self.model.opt.timestep)
+        vel = mink.solve_ik(self.configuration, self.tasks, dt, self.solver, 1e-5)
+        self.configuration.integrate_inplace(vel, dt)
+
+    def read_motors(self):
+        """Motor angles [finger1_motor1, finger1_motor2, ..., finger4_motor2] of the simulated hand."""
+        motor_pos=np.zeros(8)
+        for finger in range(4):
+            for motor in range(2):
+                joint=mujoco.mj_name2id(self.model,mujoco.mjtObj.mjOBJ_JOINT,f"finger{finger+1}_motor{motor+1}")
+                motor_pos[2*finger+motor]=self.data.joint(joint).qpos[0]
+        return motor_pos
+
     def pull_position(self, node, metadata):
         """TODO: Add docstring."""
 
@@ -300,6 +361,18 @@ class Client:
             self.data.mocap_pos[3]=[x.as_py()*1.5+0.024,y.as_py()*1.5+0.019,z.as_py()*1.5+0.017]
 
 
+    def write_joint_angle(self, hand):
+        #[flexion, abduction] per finger, straight to the motors through the joint map
+
+        fingers=[finger for finger in range(4) if f"r_tip{finger+1}" in hand[0]]
+        if fingers:
+            joints=np.array([hand[0][f"r_tip{finger+1}"].values.to_numpy() for finger in fingers])
+            motors=2*np.array(fingers)[:,None]+[0,1]
+            self.joint_target[motors]=self.joint_map.motors(fingers,joints[:,0],joints[:,1])
+        self.joint_map.qpos(self.joint_target,self.data.qpos)
+        mujoco.mj_kinematics(self.model,self.data)
+
+
     def write_mocap_quat(self, hand):
         #please, a method to access the mocap objects by name...
 
@@ -321,12 +394,25 @@ class Client:
 
 def main():
     """Handle dynamic nodes, ask for the name of the node in the dataflow."""
+    import qpsolvers
 
     parser = argparse.ArgumentParser()
-    parser.add_argument("-m", "--mode", type=str, choices=['pos','quat'], default='pos',
-                    help="control mode: pos=position (we control the position of the tip) quat=quaternion (we control the orientation of the tip)")
+    parser.add_argument("-m", "--mode", type=str, choices=['pos','quat','angle'], default='pos',
+                    help="control mode: pos=position (we control the position of the tip) quat=quaternion (we control the orientation of the tip) angle=flexion/abduction of each finger, mapped to the motors without IK")
+    parser.add_argument("--ik", type=str, choices=['full','finger'], default='full',
+                    help="full=one QP for the whole hand (mink), finger=4 independent per-finger problems, only re-solved when their target moves")
+    parser.add_argument("--ik-threads", type=int, default=0,
+                    help="solve the fingers on a thread pool of this size (--ik finger)")
+    parser.add_argument("--solver", type=str, choices=['auto']+qpsolvers.available_solvers, default='quadprog',
+                    help="QP backend of the IK (--ik full), auto=the fastest on a short calibration run (see qp_solver.py)")
+    parser.add_argument("--no-viewer", action="store_true",
+                    help="run without the MuJoCo viewer, on the mesh-free IK model")
+    parser.add_argument("--log-pairs", type=str, default=None,
+                    help="save the (tips, converged motor angles) pairs of the session to this .npz file, to train retarget.py")
     args = parser.parse_args()
-    client = Client(args.mode)
+    if args.solver=='auto' and args.ik=='finger':
+        parser.error("--solver auto calibrates the QP backends of --ik full, --ik finger does not use them")
+    client = Client(args.mode, args.ik, args.ik_threads, viewer=not args.no_viewer, solver=args.solver, log_pairs=args.log_pairs)
     client.run()
 
 
@@ -0,0 +1,50 @@
+"""Retargeting node: hand_pos -> mj_*_joints_pos with a model distilled from the IK (see retarget.py).
+
+Drop-in replacement of the simulation node in the teleoperation dataflows when
+no simulation is needed: every hand_pos message gives the motor angles at
+once, with a few NumPy matrix products, without MuJoCo nor IK convergence
+ticks. The side (right/left) is stored in the model file.
+
+    python retarget.py fit pairs.npz -o retarget_right.npz
+    dora run dataflow_tracking_real_retarget.yml
+"""
+
+import argparse
+import time
+
+START_TIME = time.perf_counter()
+
+import pyarrow as pa
+
+from retarget import SIDES, Retargeter, message_tips
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model", type=str, help="model file written by retarget.py fit")
+    args = parser.parse_args()
+
+    model = Retargeter.load(args.model)
+    prefix = SIDES[model.side]
+    output = f"mj_{prefix}_joints_pos"
+    metadata = {f"{prefix}_finger{f + 1}": [2 * f, 2 * f + 1] for f in range(4)}
+
+    from dora import Node
+
+    node = Node()
+    print(f"Retargeting ready {time.perf_counter() - START_TIME:.2f}s after start")
+    for event in node:
+        if event["type"] == "INPUT":
+            if event["id"] in ("hand_pos", f"{prefix}_hand_pos"):
+                tips = message_tips(event["value"], prefix)
+                if tips is not None:
+                    node.send_output(output, pa.array(model.predict(tips)), metadata)
+            elif event["id"] == "end":
+                break
+        elif event["type"] == "ERROR":
+            raise RuntimeError(event["error"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Compiled model cache: load a MuJoCo scene from a binary MJB instead of re-parsing the MJCF.
+
+Parsing the XML scene and its meshes takes a large share of a node's startup.
+The first load compiles the scene as usual and saves the model with
+mj_saveModel; the next ones load the MJB directly. The cache key hashes the
+content of every model file of the scene folder (xml, meshes, textures) and the
+MuJoCo version, so editing the MJCF or upgrading MuJoCo recompiles it. Reading
+the meshes to hash them is not free either (about 20 MB): the content hash is
+stored with the (path, size, mtime) of the files and the MuJoCo version, and
+the files are only read again when one of those changes.
+
+Cached models are stored in a `.mjb_cache` folder next to the scene.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import mujoco
+
+MODEL_FILES = (".xml", ".stl", ".obj", ".msh", ".png")
+CACHE_DIR = ".mjb_cache"
+
+
+def model_files(root):
+    """(relative path, path) of the model files under root, in a stable order."""
+    for folder, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if d != CACHE_DIR)
+        for name in sorted(files):
+            if name.lower().endswith(MODEL_FILES):
+                path = os.path.join(folder, name)
+                yield os.path.relpath(path, root).replace(os.sep, "/"), path
+
+
+def scene_hash(scene_path):
+    """Hash of the model files next to `scene_path` (recursively) and of the MuJoCo version."""
+    root = os.path.dirname(os.path.abspath(scene_path))
+    files = list(model_files(root))
+    stat_key = hashlib.sha1(mujoco.__version__.encode())
+    for rel, path in files:
+        st = os.stat(path)
+        stat_key.update(f"{rel}\0{st.st_size}\0{st.st_mtime_ns}\0".encode())
+    stat_key = stat_key.hexdigest()
+
+    index_path = os.path.join(root, CACHE_DIR, "scene_hash.json")
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+        if index.get("stat") == stat_key:
+            return index["hash"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+
+    h = hashlib.sha1(mujoco.__version__.encode())
+    for rel, path in files:
+        h.update(rel.encode())
+        with open(path, "rb") as f:
+            h.update(f.read())
+    content_hash = h.hexdigest()[:16]
+    try:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"stat": stat_key, "hash": content_hash}, f)
+        os.replace(tmp_path, index_path)
+    except OSError as e:
+        print(f"Could not write model cache {index_path}: {e}")
+    return content_hash
+
+
+def load_scene(scene_path, use_cache=True, verbose=True):
+    """MjModel of an MJCF scene, from the compiled cache when it is up to date."""
+    t0 = time.perf_counter()
+    scene_path = os.path.abspath(scene_path)
+    if not use_cache:
+        return mujoco.MjModel.from_xml_path(scene_path)
+
+    stem = os.path.splitext(os.path.basename(scene_path))[0]
+    cache_path = os.path.join(os.path.dirname(scene_path), CACHE_DIR, f"{stem}-{scene_hash(scene_path)}.mjb")
+    if os.path.exists(cache_path):
+        try:
+            model = mujoco.MjModel.from_binary_path(cache_path)
+            if verbose:
+                print(f"Loaded {stem} from {cache_path} in {time.perf_counter() - t0:.3f}s")
+            return model
+        except Exception as e:  # truncated or incompatible file, recompile it
+            print(f"Ignoring model cache {cache_path}: {e}")
+
+    model = mujoco.MjModel.from_xml_path(scene_path)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        mujoco.mj_saveModel(model, tmp_path, None)
+        os.replace(tmp_path, cache_path)  # atomic, nodes starting together never read a partial file
+        for name in os.listdir(os.path.dirname(cache_path)):  # models of older versions of the scene
+            if name.startswith(f"{stem}-") and name.endswith(".mjb") and name != os.path.basename(cache_path):
+                os.remove(os.path.join(os.path.dirname(cache_path), name))
+    except OSError as e:
+        print(f"Could not write model cache {cache_path}: {e}")
+    if verbose:
+        print(f"Compiled {stem} from xml in {time.perf_counter() - t0:.3f}s")
+    return model
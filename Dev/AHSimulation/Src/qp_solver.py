@@ -0,0 +1,132 @@
+"""QP backend of the simulation IK: what is installed, how fast each one is on our hands, which to use.
+
+mink hands the IK problem of the Client (equality, posture and tip tasks,
+configuration limits) to a qpsolvers backend. `calibrate` drives a Client
+headless through a short open/close motion of the fingers with every backend,
+records the time of each IK step and the final tip error, and
+`choose_solver` picks the fastest backend whose error stays close to the best
+one (`--solver auto` of the simulation nodes).
+
+Per-backend latency distributions for both hands and both control modes:
+    python qp_solver.py
+    python qp_solver.py --side right --mode pos --ticks 2000
+
+More backends: pip install "qpsolvers[daqp,osqp,proxqp,piqp,clarabel]".
+"""
+
+import argparse
+import time
+import warnings
+
+import mujoco
+import numpy as np
+import qpsolvers
+
+from mj_batch_ik import quat_error, quat_mul
+
+DT = 0.002  # the simulation tick is 500 Hz
+
+
+def available_solvers():
+    """qpsolvers backends installed here, dense ones first (mink builds dense problems)."""
+    dense = [s for s in qpsolvers.dense_solvers if s in qpsolvers.available_solvers]
+    return dense + [s for s in qpsolvers.available_solvers if s not in dense]
+
+
+def tip_error(client):
+    """Mean distance (pos) or angle (quat) between the tips and their targets."""
+    tips = [client.model.site(f"tip{f + 1}").id for f in range(4)]
+    if client.mode == "pos":
+        return float(np.linalg.norm(client.data.site_xpos[tips] - client.data.mocap_pos[:4], axis=1).mean())
+    quat = np.empty((4, 4))
+    for f, site in enumerate(tips):
+        mujoco.mju_mat2Quat(quat[f], client.data.site_xmat[site])
+    return float(np.linalg.norm(quat_error(client.data.mocap_quat[:4], quat), axis=1).mean())
+
+
+def run_motion(client, solver, ticks, settle=100):
+    """IK step times (s) along an open/close motion of the fingers, then the tip error once settled.
+
+    The error is inf when the backend failed (no solution, NaN).
+    """
+    client.solver = solver
+    client.reset()
+    start_pos = client.data.mocap_pos.copy()
+    start_quat = client.data.mocap_quat.copy()
+    times = np.empty(ticks)
+    try:
+        for tick in range(ticks + settle):
+            s = np.sin(2.0 * np.pi * min(tick, ticks) * DT)
+            if client.mode == "pos":
+                client.data.mocap_pos[:] = start_pos + 0.01 * s * np.array([1.0, 0.0, -1.0])
+            else:
+                half = 0.5 * np.radians(20.0) * s  # rotation about y
+                quat_mul(client.data.mocap_quat, np.array([np.cos(half), 0.0, np.sin(half), 0.0]), start_quat)
+            t0 = time.perf_counter()
+            client.ik_step(DT)
+            if tick < ticks:
+                times[tick] = time.perf_counter() - t0
+        error = tip_error(client)
+    except Exception as e:
+        print(f"{solver}: {type(e).__name__}: {e}")
+        return times[:tick], np.inf
+    if not np.all(np.isfinite(client.data.qpos)):
+        error = np.inf
+    return times, error
+
+
+def calibrate(client, solvers=None, ticks=200):
+    """{solver: (step times, final tip error)} of each backend on the client; leaves it reset."""
+    solver = client.solver
+    solvers = solvers or available_solvers()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # sparse backends complain about our dense matrices
+        run_motion(client, solvers[0], 20, settle=0)  # warm up numpy, mink and the caches
+        results = {s: run_motion(client, s, ticks) for s in solvers}
+    client.solver = solver
+    client.reset()
+    return results
+
+
+def choose_solver(results, tolerance=1.5, floor=1e-4):
+    """Fastest backend (median step time) among those converging close to the best error."""
+    finite = {s: (times, error) for s, (times, error) in results.items() if np.isfinite(error) and len(times)}
+    if not finite:
+        raise RuntimeError("no QP backend converged")
+    best = min(error for _, error in finite.values())
+    limit = max(tolerance * best, best + floor)
+    converged = {s: np.median(times) for s, (times, error) in finite.items() if error <= limit}
+    return min(converged, key=converged.get)
+
+
+def main():
+    """Latency distribution of every backend, per hand and control mode."""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--side", type=str, choices=['right', 'left'], nargs="+", default=['right', 'left'])
+    parser.add_argument("-m", "--mode", type=str, choices=['pos', 'quat'], nargs="+", default=['pos', 'quat'])
+    parser.add_argument("-t", "--ticks", type=int, default=1000, help="IK steps per backend")
+    parser.add_argument("--solvers", type=str, nargs="+", default=None, help="backends to compare (default: all installed)")
+    args = parser.parse_args()
+
+    for side in args.side:
+        if side == 'right':
+            from mj_mink_right import Client
+        else:
+            from mj_mink_left import Client
+        for mode in args.mode:
+            client = Client(mode, viewer=False)
+            results = calibrate(client, args.solvers, args.ticks)
+            print(f"\n{side} hand, {mode} mode, {args.ticks} steps")
+            print(f"{'solver':<10} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'error':>10}")
+            for solver, (times, error) in results.items():
+                if not len(times):
+                    print(f"{solver:<10} failed")
+                    continue
+                p50, p90, p99 = np.percentile(times, [50, 90, 99]) * 1e3
+                print(f"{solver:<10} {p50:8.3f} {p90:8.3f} {p99:8.3f} {times.max() * 1e3:8.3f} {error:10.2e}")
+            print(f"auto: {choose_solver(results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""Retargeting model: tracked fingertips -> motor angles in one shot, distilled from the IK.
+
+The simulation nodes turn every hand_pos message (4 tip vectors) into mocap
+targets and let the mink IK converge over several ticks before the motor
+angles settle. This module learns that mapping from (tips, converged motor
+angles) pairs and evaluates it with plain NumPy, so mj_retarget.py can send
+mj_*_joints_pos straight from hand_pos without MuJoCo nor IK lag.
+
+Pairs come from running simulation nodes (--log-pairs of mj_mink_right.py /
+mj_mink_left.py), or are computed offline by converging a headless Client on
+recorded hand poses (pose_recorder.py, offline_tracker.py) or on random
+poses of the hand (the tips of random motor angles over the motor ranges):
+
+    python retarget.py collect --recording ../../recordings/poses.arrow -o pairs.npz
+    python retarget.py collect --synthetic 2000 -o pairs.npz
+    python retarget.py fit pairs.npz -o retarget_right.npz --kind mlp
+
+Two model kinds: ridge regression on quadratic features of the tips (no
+training hyperparameters besides alpha), or a small tanh MLP trained with
+Adam. Both are a few matrix products per message. Only the tip positions are
+used: they are all the simulation nodes receive from the tracker.
+
+A model only knows the tips it was trained on: their range is saved with it,
+and predict() clips the tips of a message to that range (with a warning)
+instead of extrapolating the features.
+"""
+
+import argparse
+import time
+
+import mujoco
+import numpy as np
+import pyarrow as pa
+
+SIDES = {"right": "r", "left": "l"}
+
+
+def message_tips(hand, prefix):
+    """Tips (12,) of a hand_pos message, None unless the 4 tips are in it."""
+    fields = hand[0]
+    names = [f"{prefix}_tip{f + 1}" for f in range(4)]
+    if not all(name in fields for name in names):
+        return None
+    return np.array([fields[name].values.to_numpy() for name in names], dtype=float).ravel()
+
+
+def tips_message(tips, prefix):
+    """Tips (4, 3) -> hand_pos message, as sent by the tracker."""
+    return pa.array([{f"{prefix}_tip{f + 1}": list(map(float, tip)) for f, tip in enumerate(np.reshape(tips, (4, 3)))}])
+
+
+class PairLogger:
+    """Logs (tips, converged motor angles) pairs from a running simulation node.
+
+    target() is called with every hand_pos message, update() with the motor
+    angles after every IK tick: the pair is kept once the motors stopped moving
+    (change below `tol` rad in one tick), with the last target tips.
+    """
+
+    def __init__(self, path, prefix, tol=1e-4):
+        self.path = path
+        self.prefix = prefix
+        self.tol = tol
+        self.pending = None
+        self.previous = None
+        self.tips = []
+        self.motors = []
+
+    def target(self, hand):
+        tips = message_tips(hand, self.prefix)
+        if tips is not None:
+            self.pending = tips
+
+    def update(self, motor_pos):
+        motor_pos = np.asarray(motor_pos, dtype=float)
+        if (self.pending is not None and self.previous is not None
+                and np.max(np.abs(motor_pos - self.previous)) < self.tol):
+            self.tips.append(self.pending)
+            self.motors.append(motor_pos)
+            self.pending = None
+        self.previous = motor_pos
+
+    def save(self):
+        save_pairs(self.path, np.array(self.tips).reshape(-1, 12), np.array(self.motors).reshape(-1, 8))
+        print(f"{len(self.tips)} (tips, motors) pairs saved to {self.path}")
+
+
+def save_pairs(path, tips, motors):
+    np.savez(path, tips=tips, motors=motors)
+
+
+def load_pairs(*paths):
+    tips, motors = [], []
+    for path in paths:
+        with np.load(path) as f:
+            tips.append(f["tips"])
+            motors.append(f["motors"])
+    return np.concatenate(tips), np.concatenate(motors)
+
+
+class Retargeter:
+    """Tips (4, 3) or (n, 12) -> motor angles (8,) or (n, 8), NumPy only."""
+
+    def __init__(self, kind, side, x_mean, x_std, y_mean, y_std, weights, low, high, x_low=None, x_high=None):
+        self.kind = kind
+        self.side = side
+        self.x_mean, self.x_std = x_mean, x_std
+        self.y_mean, self.y_std = y_mean, y_std
+        self.weights = weights  # [W, b] (ridge) or [W1, b1, W2, b2, W3, b3] (mlp)
+        self.low, self.high = low, high
+        self.x_low, self.x_high = x_low, x_high  # range of the training tips (12,), None: not clipped
+        self.outside = 0  # messages with tips outside of it
+
+    @staticmethod
+    def quadratic(x):
+        """[x, x_i * x_j for i <= j] of standardized tips (n, 12) -> (n, 90)."""
+        i, j = np.triu_indices(x.shape[1])
+        return np.concatenate([x, x[:, i] * x[:, j]], axis=1)
+
+    def predict(self, tips):
+        x = np.reshape(tips, (-1, 12))
+        if self.x_low is not None:
+            clipped = np.clip(x, self.x_low, self.x_high)
+            if not np.array_equal(clipped, x):
+                if not self.outside:
+                    print("Retargeting: tips outside of the range of the training pairs, clipped to it "
+                          "(train on recordings or --log-pairs pairs of such poses)")
+                self.outside += 1
+                x = clipped
+        x = (x - self.x_mean) / self.x_std
+        if self.kind == "ridge":
+            w, b = self.weights
+            y = self.quadratic(x) @ w + b
+        else:
+            w1, b1, w2, b2, w3, b3 = self.weights
+            y = np.tanh(np.tanh(x @ w1 + b1) @ w2 + b2) @ w3 + b3
+        y = np.clip(y * self.y_std + self.y_mean, self.low, self.high)
+        return y[0] if np.size(tips) == 12 else y
+
+    @classmethod
+    def fit(cls, tips, motors, side, low, high, kind="ridge", alpha=1e-3, hidden=32, epochs=3000, lr=1e-2, seed=0):
+        """Fit a model on pairs (n, 12) -> (n, 8); low/high: motor ranges the predictions are clipped to."""
+        x_mean, x_std = tips.mean(0), tips.std(0) + 1e-9
+        y_mean, y_std = motors.mean(0), motors.std(0) + 1e-9
+        x = (tips - x_mean) / x_std
+        y = (motors - y_mean) / y_std
+        if kind == "ridge":
+            f = cls.quadratic(x)
+            f_mean = f.mean(0)
+            w = np.linalg.solve((f - f_mean).T @ (f - f_mean) + alpha * len(f) * np.eye(f.shape[1]),
+                                (f - f_mean).T @ y)
+            weights = [w, -f_mean @ w]
+        elif kind == "mlp":
+            weights = train_mlp(x, y, hidden, epochs, lr, seed)
+        else:
+            raise ValueError(f"unknown model kind: {kind}")
+        return cls(kind, side, x_mean, x_std, y_mean, y_std, weights, np.asarray(low), np.asarray(high),
+                   tips.min(0), tips.max(0))
+
+    def save(self, path):
+        np.savez(path, kind=self.kind, side=self.side, x_mean=self.x_mean, x_std=self.x_std,
+                 y_mean=self.y_mean, y_std=self.y_std, low=self.low, high=self.high,
+                 x_low=self.x_low, x_high=self.x_high, **{f"w{i}": w for i, w in enumerate(self.weights)})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            weights = [f[f"w{i}"] for i in range(sum(k.startswith("w") for k in f.files))]
+            x_range = (f["x_low"], f["x_high"]) if "x_low" in f.files else (None, None)  # older model files
+            return cls(str(f["kind"]), str(f["side"]), f["x_mean"], f["x_std"], f["y_mean"], f["y_std"],
+                       weights, f["low"], f["high"], *x_range)
+
+
+def train_mlp(x, y, hidden, epochs, lr, seed):
+    """12 -> hidden -> hidden -> 8 tanh MLP, full-batch Adam on the mean squared error."""
+    rng = np.random.default_rng(seed)
+    sizes = [x.shape[1], hidden, hidden, y.shape[1]]
+    params = []
+    for a, b in zip(sizes[:-1], sizes[1:]):
+        params += [rng.normal(0.0, 1.0 / np.sqrt(a), (a, b)), np.zeros(b)]
+    m = [np.zeros_like(p) for p in params]
+    v = [np.zeros_like(p) for p in params]
+    for t in range(1, epochs + 1):
+        w1, b1, w2, b2, w3, b3 = params
+        h1 = np.tanh(x @ w1 + b1)
+        h2 = np.tanh(h1 @ w2 + b2)
+        d3 = 2.0 * (h2 @ w3 + b3 - y) / len(x)
+        d2 = (d3 @ w3.T) * (1.0 - h2 ** 2)
+        d1 = (d2 @ w2.T) * (1.0 - h1 ** 2)
+        grads = [x.T @ d1, d1.sum(0), h1.T @ d2, d2.sum(0), h2.T @ d3, d3.sum(0)]
+        for p, g, mp, vp in zip(params, grads, m, v):
+            mp *= 0.9
+            mp += 0.1 * g
+            vp *= 0.999
+            vp += 0.001 * g * g
+            p -= lr * (mp / (1 - 0.9 ** t)) / (np.sqrt(vp / (1 - 0.999 ** t)) + 1e-8)
+    return params
+
+
+def make_client(side, ik="finger"):
+    """Headless simulation client of a hand, for collecting pairs."""
+    if side == "right":
+        from mj_mink_right import Client
+    else:
+        from mj_mink_left import Client
+    return Client("pos", ik=ik, viewer=False)
+
+
+def motor_ranges(client):
+    """(low, high) of the 8 motor joints of a client."""
+    ranges = np.array([client.model.joint(f"finger{f}_motor{m}").range for f in range(1, 5) for m in (1, 2)])
+    return ranges[:, 0], ranges[:, 1]
+
+
+def converge(client, max_ticks=500, tol=1e-5, dt=0.002):
+    """Run the IK until the motors stop moving, returns the motor angles."""
+    motors = client.read_motors()
+    for _ in range(max_ticks):
+        client.ik_step(dt)
+        previous, motors = motors, client.read_motors()
+        if np.max(np.abs(motors - previous)) < tol:
+            break
+    return motors
+
+
+def collect_pairs(client, prefix, tips, **options):
+    """Converge the client on each tips sample (n, 4, 3) in turn, returns (tips (n, 12), motors (n, 8))."""
+    client.reset()
+    motors = np.empty((len(tips), 8))
+    for i, sample in enumerate(tips):
+        client.write_mocap_pos(tips_message(sample, prefix))
+        motors[i] = converge(client, **options)
+    return np.reshape(tips, (-1, 12)), motors
+
+
+def synthetic_tips(client, prefix, side, n, coverage=0.95, seed=0):
+    """n random tip messages (n, 4, 3): tips of random motor angles over `coverage` of the motor ranges.
+
+    The motors follow a random walk, so that consecutive samples start the IK
+    from a nearby pose like in a live session. The tips of each motor pose come
+    from the joint map (joint_map.py) that closes the linkage, so every target
+    is reachable.
+    """
+    from joint_map import JointMap, joint_map_path
+
+    # the node maps the message tips to mocap affinely, get its offset and scale back
+    client.write_mocap_pos(tips_message(np.zeros((4, 3)), prefix))
+    offset = client.data.mocap_pos[:4].copy()
+    client.write_mocap_pos(tips_message(np.ones((4, 3)), prefix))
+    scale = client.data.mocap_pos[:4] - offset
+    client.reset()
+
+    joint_map = JointMap(client.model, joint_map_path(side))
+    low, high = motor_ranges(client)
+    middle, half = (low + high) / 2, coverage * (high - low) / 2
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0.0, half / 8, (n, 8))
+    data = mujoco.MjData(client.model)
+    sites = [client.model.site(f"tip{f + 1}").id for f in range(4)]
+    targets = np.empty((n, 4, 3))
+    motors = middle.copy()
+    for i in range(n):
+        motors = np.clip(motors + steps[i], middle - half, middle + half)
+        joint_map.qpos(motors, data.qpos)
+        mujoco.mj_kinematics(client.model, data)
+        targets[i] = data.site_xpos[sites]
+    return (targets - offset) / scale
+
+
+def read_recording(path, prefix):
+    """Tips (n, 4, 3) of the {prefix}_hand_pos messages of a pose_recorder/offline_tracker file."""
+    with pa.OSFile(path, "rb") as source:
+        table = pa.ipc.open_stream(source).read_all()
+    names = [f"{prefix}_tip{f + 1}" for f in range(4)]
+    tips = []
+    for row_names, values in zip(table["names"].to_pylist(), table["values"].to_pylist()):
+        if all(name in row_names for name in names):
+            tips.append([values[row_names.index(name)] for name in names])
+    return np.array(tips, dtype=float).reshape(-1, 4, 3)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Distill the simulation IK into a one-shot retargeting model")
+    commands = parser.add_subparsers(dest="command", required=True)
+    collect = commands.add_parser("collect", help="converge a headless client on hand poses, save the pairs")
+    collect.add_argument("-s", "--side", choices=list(SIDES), default="right")
+    collect.add_argument("--recording", type=str, nargs="+", default=[], help="pose_recorder/offline_tracker files")
+    collect.add_argument("--synthetic", type=int, default=0, help="number of random hand poses")
+    collect.add_argument("--coverage", type=float, default=0.95, help="fraction of the motor ranges covered by the random poses")
+    collect.add_argument("--ik", choices=["full", "finger"], default="finger", help="IK of the client (same solution, finger is faster)")
+    collect.add_argument("-o", "--output", type=str, default="pairs.npz")
+    fit = commands.add_parser("fit", help="fit a model on pairs, report its error on held-out pairs")
+    fit.add_argument("pairs", type=str, nargs="+")
+    fit.add_argument("-s", "--side", choices=list(SIDES), default="right")
+    fit.add_argument("-k", "--kind", choices=["ridge", "mlp"], default="ridge")
+    fit.add_argument("--alpha", type=float, default=1e-3, help="ridge regularization")
+    fit.add_argument("--hidden", type=int, default=32, help="MLP hidden layer size")
+    fit.add_argument("--epochs", type=int, default=3000, help="MLP training steps")
+    fit.add_argument("--holdout", type=float, default=0.2, help="fraction of the pairs kept to measure the error")
+    fit.add_argument("-o", "--output", type=str, default=None, help="model file (default: retarget_<side>.npz)")
+    args = parser.parse_args()
+
+    prefix = SIDES[args.side]
+    client = make_client(args.side, getattr(args, "ik", "finger"))
+    if args.command == "collect":
+        tips = [read_recording(path, prefix) for path in args.recording]
+        if args.synthetic:
+            tips.append(synthetic_tips(client, prefix, args.side, args.synthetic, args.coverage))
+        tips = np.concatenate(tips) if tips else np.empty((0, 4, 3))
+        t0 = time.perf_counter()
+        x, y = collect_pairs(client, prefix, tips)
+        save_pairs(args.output, x, y)
+        print(f"{len(x)} pairs in {time.perf_counter() - t0:.1f}s saved to {args.output}")
+        return
+
+    x, y = load_pairs(*args.pairs)
+    order = np.random.default_rng(0).permutation(len(x))
+    n_test = int(len(x) * args.holdout)
+    test, train = order[:n_test], order[n_test:]
+    model = Retargeter.fit(x[train], y[train], args.side, *motor_ranges(client), kind=args.kind,
+                           alpha=args.alpha, hidden=args.hidden, epochs=args.epochs)
+    if n_test:
+        error = np.degrees(np.abs(model.predict(x[test]) - y[test]))
+        print(f"held-out error over {n_test} pairs: mean {error.mean():.2f} deg, p99 {np.percentile(error, 99):.2f} deg, "
+              f"max {error.max():.2f} deg")
+    t0 = time.perf_counter()
+    for sample in x[:1000]:
+        model.predict(sample)
+    print(f"{(time.perf_counter() - t0) / min(len(x), 1000) * 1e6:.1f} us per message")
+    output = args.output or f"retarget_{args.side}.npz"
+    model.save(output)
+    print(f"{args.kind} model trained on {len(train)} pairs saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
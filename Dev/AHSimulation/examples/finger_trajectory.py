@@ -0,0 +1,179 @@
+"""Vectorized finger trajectories: tip orientations for all fingers of both hands.
+
+A trajectory is a set of fingers, each described by an euler sequence and one
+waveform per angle. Waveforms are evaluated on whole time arrays, and all the
+fingers sharing an euler sequence go through a single batched
+`Rotation.from_euler` call. For periodic stimuli the quaternions can also be
+precomputed once into a table indexed by phase, so the per-tick cost is a
+single row lookup.
+
+Besides quaternions, a trajectory also gives the (flexion, abduction) pair of
+every finger, read from its euler angles, for the simulation `angle` mode that
+maps joint angles straight to motor angles without running the IK.
+"""
+
+import os
+import sys
+
+import numpy as np
+from scipy.spatial.transform import Rotation
+
+# the euler conventions are shared with the joint map of the simulation (Src/finger_euler.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Src"))
+from finger_euler import FINGER_SEQUENCES, JOINT_AXES
+
+
+class Constant:
+    """Constant angle (rad)."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self, t):
+        return np.full(np.shape(t), self.value, dtype=float)
+
+
+class Sine:
+    """offset + amplitude * sin(2*pi*frequency*t + phase), angles in rad."""
+
+    def __init__(self, amplitude, frequency=1.0, offset=0.0, phase=0.0):
+        self.amplitude = amplitude
+        self.frequency = frequency
+        self.offset = offset
+        self.phase = phase
+
+    def __call__(self, t):
+        return self.offset + self.amplitude * np.sin(2.0 * np.pi * self.frequency * np.asarray(t) + self.phase)
+
+
+class Keyframes:
+    """Piecewise linear interpolation between (time, angle) keyframes, looped if `period` is given."""
+
+    def __init__(self, times, values, period=None):
+        self.times = np.asarray(times, dtype=float)
+        self.values = np.asarray(values, dtype=float)
+        self.period = period
+
+    def __call__(self, t):
+        t = np.asarray(t, dtype=float)
+        if self.period is not None:
+            t = np.mod(t, self.period)
+        return np.interp(t, self.times, self.values)
+
+
+class Recorded:
+    """Angles sampled at a fixed `rate` (Hz), played back with sample-and-hold and looped."""
+
+    def __init__(self, samples, rate):
+        self.samples = np.asarray(samples, dtype=float)
+        self.rate = rate
+
+    def __call__(self, t):
+        idx = (np.asarray(t) * self.rate).astype(int) % len(self.samples)
+        return self.samples[idx]
+
+
+class FingerTrajectory:
+    """Tip orientations of several fingers, evaluated for arrays of time stamps."""
+
+    def __init__(self, fingers):
+        """`fingers` maps a tip name ('r_tip1', ...) to (euler_seq, [wave_x, wave_y, wave_z])."""
+        self.names = list(fingers)
+        self.fingers = fingers
+        # group fingers sharing an euler sequence, one from_euler call per group
+        self.groups = {}
+        for i, name in enumerate(self.names):
+            seq, _ = fingers[name]
+            self.groups.setdefault(seq, []).append(i)
+
+    def angles(self, t):
+        """Euler angles, shape (len(t), n_fingers, 3)."""
+        t = np.atleast_1d(np.asarray(t, dtype=float))
+        angles = np.empty((len(t), len(self.names), 3))
+        for i, name in enumerate(self.names):
+            _, waves = self.fingers[name]
+            for k, wave in enumerate(waves):
+                angles[:, i, k] = wave(t)
+        return angles
+
+    def joint_angles(self, t):
+        """(flexion, abduction) of every finger, shape (len(t), n_fingers, 2)."""
+        angles = self.angles(t)
+        joints = np.empty(angles.shape[:2] + (2,))
+        for i, name in enumerate(self.names):
+            seq, _ = self.fingers[name]
+            for k, (idx, sign) in enumerate(JOINT_AXES[seq]):
+                joints[:, i, k] = sign * angles[:, i, idx]
+        return joints
+
+    def quats(self, t):
+        """Scalar-first quaternions, shape (len(t), n_fingers, 4)."""
+        angles = self.angles(t)
+        quats = np.empty(angles.shape[:2] + (4,))
+        for seq, idx in self.groups.items():
+            rot = Rotation.from_euler(seq, angles[:, idx].reshape(-1, 3))
+            quats[:, idx] = rot.as_quat(scalar_first=True).reshape(len(angles), len(idx), 4)
+        return quats
+
+    def stream(self, times, chunk=1024):
+        """Yield (t, quats) for every time stamp of an iterable, evaluated `chunk` at a time."""
+        buf = []
+        for t in times:
+            buf.append(t)
+            if len(buf) == chunk:
+                yield from zip(buf, self.quats(buf))
+                buf = []
+        if buf:
+            yield from zip(buf, self.quats(buf))
+
+    def table(self, period, samples=1000):
+        """Precompute one period of the trajectory, see QuatTable."""
+        t = np.arange(samples) * period / samples
+        return QuatTable(self.names, self.quats(t), self.joint_angles(t), period)
+
+
+class QuatTable:
+    """Periodic quaternion table, lookups are indexed by phase and do not allocate."""
+
+    def __init__(self, names, quats, joints, period):
+        self.names = names
+        self.quats = quats
+        self.joints = joints
+        self.period = period
+        self.samples = len(quats)
+
+    def index(self, t):
+        """Row of the table for time t."""
+        return int((t % self.period) / self.period * self.samples) % self.samples
+
+    def at(self, t):
+        """Quaternions (n_fingers, 4) at time t, a view into the table."""
+        return self.quats[self.index(t)]
+
+    def joints_at(self, t):
+        """(flexion, abduction) (n_fingers, 2) at time t, a view into the table."""
+        return self.joints[self.index(t)]
+
+
+#motors 0° => ~121.9° pitch of the distal phalange in the finger base referential
+#flexion range (distal phalange) [0°, 140°]
+#abduction range [-20°, 20°]
+def default_trajectory(frequency=1.0):
+    """The open/close sine motion of finger_angle_control, both hands."""
+    s1_pitch = Sine(np.radians(10.0), frequency, offset=np.radians(10.0))
+    rs1_roll = Sine(np.radians(10.0), frequency, phase=np.pi / 2.0)
+    ls1_roll = Sine(np.radians(-10.0), frequency, phase=np.pi / 2.0)
+    s2_pitch = Sine(np.radians(140.0 / 2.0), frequency, offset=np.radians(140.0 / 2.0))
+    s4_pitch = Sine(-np.radians((90.0 + 53.0) / 2.0), frequency, offset=-np.radians((90.0 - 53.0) / 2.0))
+    zero = Constant(0.0)
+
+    return FingerTrajectory({
+        'r_tip1': (FINGER_SEQUENCES[0], [rs1_roll, s1_pitch, zero]),
+        'r_tip2': (FINGER_SEQUENCES[1], [Constant(np.radians(10.0)), s2_pitch, zero]),  #finger2 has a 10° roll offset
+        'r_tip3': (FINGER_SEQUENCES[2], [Constant(np.radians(20.0)), s2_pitch, zero]),  #finger3 has a 20° roll offset
+        'r_tip4': (FINGER_SEQUENCES[3], [zero, s4_pitch, Constant(np.radians(20.0))]),  #finger4 has a 20° yaw offset
+        'l_tip1': (FINGER_SEQUENCES[0], [ls1_roll, s1_pitch, zero]),
+        'l_tip2': (FINGER_SEQUENCES[1], [Constant(np.radians(-10.0)), s2_pitch, zero]),
+        'l_tip3': (FINGER_SEQUENCES[2], [Constant(np.radians(-20.0)), s2_pitch, zero]),
+        'l_tip4': (FINGER_SEQUENCES[3], [zero, s4_pitch, Constant(np.radians(-20.0))]),
+    })
@@ -17,11 +17,20 @@ except ImportError as e:
     print(f"Error importing AmazingHand_Demo_Optimized: {e}")
     ah_module = None
 
+from hand_stream import ANGLE_LIMIT, FINGERS, CoalescingSender, finger_angles, finger_pose
+
+# Live control: goals sent at this rate by the coalescing sender (one sync-write per tick)
+SEND_RATE = 100.0
+FLEXION_RANGE = (-40.0, 90.0)    # open .. closed
+ABDUCTION_RANGE = (-50.0, 50.0)
+PAD_SIZE = 120
+
 class HandControlApp:
     def __init__(self, root):
         self.root = root
         self.root.title("AmazingHand Control Panel")
         self.hand = None
+        self.sender = None
         self.ah_module = ah_module
         
         self.setup_ui()
@@ -53,9 +62,13 @@ class HandControlApp:
         self.reload_btn = ttk.Button(config_frame, text="Reload Code", command=self.reload_code)
         self.reload_btn.grid(row=0, column=8, padx=5)
         
+        # Tabs: fixed gestures, live control per servo and per finger
+        notebook = ttk.Notebook(self.root)
+        notebook.pack(fill="both", expand=True, padx=10, pady=5)
+
         # Gestures Frame
-        self.gesture_frame = ttk.LabelFrame(self.root, text="Gestures", padding=10)
-        self.gesture_frame.pack(fill="both", expand=True, padx=10, pady=5)
+        self.gesture_frame = ttk.Frame(notebook, padding=10)
+        notebook.add(self.gesture_frame, text="Gestures")
         
         gestures = [
             ("Open Hand", "OpenHand"),
@@ -85,14 +98,124 @@ class HandControlApp:
                 col = 0
                 row += 1
                 
+        servo_frame = ttk.Frame(notebook, padding=10)
+        notebook.add(servo_frame, text="Servos")
+        finger_frame = ttk.Frame(notebook, padding=10)
+        notebook.add(finger_frame, text="Fingers")
+        self.setup_servo_sliders(servo_frame)
+        self.setup_finger_pads(finger_frame)
+
         # Status Bar
         self.status_var = tk.StringVar(value="Disconnected")
         status_bar = ttk.Label(self.root, textvariable=self.status_var, relief="sunken", anchor="w")
         status_bar.pack(fill="x", side="bottom")
 
+    def setup_servo_sliders(self, frame):
+        # One slider per servo, degrees from its middle position (like the Move_* arguments)
+        self.servo_vars = []
+        self.servo_labels = []
+        for i in range(2 * len(FINGERS)):
+            var = tk.DoubleVar(value=0.0)
+            ttk.Label(frame, text=f"{FINGERS[i // 2]} {i % 2 + 1} (id {i + 1})").grid(row=i, column=0, sticky="w", padx=5)
+            ttk.Scale(frame, from_=-ANGLE_LIMIT, to=ANGLE_LIMIT, variable=var, length=300,
+                      command=lambda _, i=i: self.on_servo(i)).grid(row=i, column=1, padx=5, pady=2)
+            label = ttk.Label(frame, text="0", width=5)
+            label.grid(row=i, column=2)
+            self.servo_vars.append(var)
+            self.servo_labels.append(label)
+
+    def setup_finger_pads(self, frame):
+        # Per finger: flexion and abduction sliders, and a 2D pad (x: abduction, y: flexion, down = closed)
+        self.flexion_vars = []
+        self.abduction_vars = []
+        self.pads = []
+        for f, name in enumerate(FINGERS):
+            box = ttk.LabelFrame(frame, text=name, padding=5)
+            box.grid(row=0, column=f, padx=5, sticky="n")
+            pad = tk.Canvas(box, width=PAD_SIZE, height=PAD_SIZE, background="white", highlightthickness=1)
+            pad.grid(row=0, column=0, columnspan=2)
+            pad.create_line(PAD_SIZE / 2, 0, PAD_SIZE / 2, PAD_SIZE, fill="lightgray")
+            pad.create_oval(0, 0, 0, 0, fill="red", tags="marker")
+            pad.bind("<Button-1>", lambda e, f=f: self.on_pad(f, e))
+            pad.bind("<B1-Motion>", lambda e, f=f: self.on_pad(f, e))
+            flexion = tk.DoubleVar(value=0.0)
+            abduction = tk.DoubleVar(value=0.0)
+            ttk.Label(box, text="Flex").grid(row=1, column=0)
+            ttk.Scale(box, from_=FLEXION_RANGE[0], to=FLEXION_RANGE[1], variable=flexion, length=PAD_SIZE,
+                      command=lambda _, f=f: self.on_finger(f)).grid(row=1, column=1)
+            ttk.Label(box, text="Abd").grid(row=2, column=0)
+            ttk.Scale(box, from_=ABDUCTION_RANGE[0], to=ABDUCTION_RANGE[1], variable=abduction, length=PAD_SIZE,
+                      command=lambda _, f=f: self.on_finger(f)).grid(row=2, column=1)
+            self.flexion_vars.append(flexion)
+            self.abduction_vars.append(abduction)
+            self.pads.append(pad)
+            self.update_pad(f)
+
+    def abduction_sign(self):
+        # the pad is seen from the back of the hand: mirrored for the left hand
+        return 1.0 if self.side_var.get() == 1 else -1.0
+
+    def update_pad(self, f):
+        (f0, f1), (a0, a1) = FLEXION_RANGE, ABDUCTION_RANGE
+        x = (self.abduction_sign() * self.abduction_vars[f].get() - a0) / (a1 - a0) * PAD_SIZE
+        y = (self.flexion_vars[f].get() - f0) / (f1 - f0) * PAD_SIZE
+        self.pads[f].coords("marker", x - 5, y - 5, x + 5, y + 5)
+
+    def on_pad(self, f, event):
+        (f0, f1), (a0, a1) = FLEXION_RANGE, ABDUCTION_RANGE
+        x = min(max(event.x / PAD_SIZE, 0.0), 1.0)
+        y = min(max(event.y / PAD_SIZE, 0.0), 1.0)
+        self.abduction_vars[f].set(self.abduction_sign() * (a0 + x * (a1 - a0)))
+        self.flexion_vars[f].set(f0 + y * (f1 - f0))
+        self.on_finger(f)
+
+    def on_finger(self, f):
+        angles = finger_angles(self.flexion_vars[f].get(), self.abduction_vars[f].get())
+        motors = [2 * f, 2 * f + 1]
+        for i, angle in zip(motors, angles):
+            self.servo_vars[i].set(min(max(angle, -ANGLE_LIMIT), ANGLE_LIMIT))
+            self.servo_labels[i].config(text=f"{self.servo_vars[i].get():.0f}")
+        self.update_pad(f)
+        self.send(motors, [self.servo_vars[i].get() for i in motors])
+
+    def on_servo(self, i):
+        f = i // 2
+        self.servo_labels[i].config(text=f"{self.servo_vars[i].get():.0f}")
+        flexion, abduction = finger_pose(self.servo_vars[2 * f].get(), self.servo_vars[2 * f + 1].get())
+        self.flexion_vars[f].set(flexion)
+        self.abduction_vars[f].set(abduction)
+        self.update_pad(f)
+        self.send([i], [self.servo_vars[i].get()])
+
+    def send(self, motors, angles):
+        # only stores the goals, the sender thread writes the latest ones at SEND_RATE
+        if self.sender is None:
+            self.status_var.set("Not connected: live control disabled")
+            return
+        self.sender.set(motors, angles)
+
+    def start_sender(self):
+        self.sender = CoalescingSender.for_hand(self.hand, SEND_RATE)
+        self.sender.start()
+        self.refresh_status()
+
+    def stop_sender(self):
+        if self.sender is not None:
+            self.sender.stop()
+            self.sender = None
+
+    def refresh_status(self):
+        if self.sender is None:
+            return
+        if self.sender.updates:
+            self.status_var.set(f"Live: {self.sender.updates} slider updates, {self.sender.writes} sync writes"
+                                f" ({SEND_RATE:.0f} Hz max)")
+        self.root.after(500, self.refresh_status)
+
     def toggle_connection(self):
         if self.hand:
             # Disconnect
+            self.stop_sender()
             self.hand = None
             self.connect_btn.config(text="Connect")
             self.status_var.set("Disconnected")
@@ -113,12 +236,14 @@ class HandControlApp:
                 self.ah_module = importlib.reload(self.ah_module)
                 # Instantiate the controller
                 self.hand = self.ah_module.AmazingHand(port=port, baudrate=baud, side=side)
+                self.start_sender()
                 
                 self.connect_btn.config(text="Disconnect")
                 self.status_var.set(f"Connected to {port} (Side: {'Right' if side==1 else 'Left'})")
             except Exception as e:
                 messagebox.showerror("Connection Error", f"Could not connect:\n{str(e)}")
                 self.status_var.set("Connection Failed")
+                self.stop_sender()
                 self.hand = None
     
     def reload_code(self):
@@ -130,9 +255,11 @@ class HandControlApp:
             baud = self.baud_var.get()
             side = self.side_var.get()
             self.ah_module = importlib.reload(self.ah_module)
+            self.stop_sender()
             if self.hand:
                 self.hand = None
             self.hand = self.ah_module.AmazingHand(port=port, baudrate=baud, side=side)
+            self.start_sender()
             self.status_var.set(f"Reloaded code and reconnected (Side: {'Right' if side==1 else 'Left'})")
         except Exception as e:
             messagebox.showerror("Reload Error", f"Could not reload:\n{str(e)}")
@@ -148,8 +275,9 @@ class HandControlApp:
             self.status_var.set(f"Performing: {method_name}...")
             self.root.update()
             
-            # Execute the gesture
-            method()
+            # Execute the gesture, the live control sender waits for the bus
+            with self.sender.bus_lock:
+                method()
             
             self.status_var.set(f"Done: {method_name}")
         except Exception as e:
@@ -159,6 +287,6 @@ class HandControlApp:
 if __name__ == "__main__":
     root = tk.Tk()
     # Set window size and position
-    root.geometry("500x400")
+    root.geometry("640x480")
     app = HandControlApp(root)
     root.mainloop()
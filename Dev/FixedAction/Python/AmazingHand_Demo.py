@@ -3,6 +3,8 @@ import numpy as np
 
 from rustypot import Scs0009PyController
 
+from hand_calibration import middle_pos
+
 #Side
 Side = 1 # 1=> Right Hand // 2=> Left Hand
 
@@ -11,7 +13,7 @@ MaxSpeed = 7
 CloseSpeed = 3
 
 #Fingers middle poses
-MiddlePos = [3, 0, -5, -8, -2, 5, -12, 0] # replace values by your calibration results
+MiddlePos = middle_pos(range(1, 9), [3, 0, -5, -8, -2, 5, -12, 0]) # from AHControl/config/calibration.toml, else replace values by your calibration results
 
 c = Scs0009PyController(
         serial_port="COM3",
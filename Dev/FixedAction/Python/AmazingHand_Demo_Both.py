@@ -3,6 +3,8 @@ import numpy as np
 
 from rustypot import Scs0009PyController
 
+from hand_calibration import middle_pos
+
 #Side
 # 1=>1ight Hand // 2=>2eft Hand
 
@@ -12,8 +14,8 @@ MaxSpeed = 7
 CloseSpeed = 3
 
 #Fingers middle poses
-MiddlePos_1 = [3, 0, -8, -13, 2, -5, -12, -5] #1eplace values by your calibration1esults
-MiddlePos_2 = [3, -3, -1, -10, 5, 2, -7, 3] #1eplace values by your calibration1esults
+MiddlePos_1 = middle_pos(range(1, 9), [3, 0, -8, -13, 2, -5, -12, -5]) # from AHControl/config/calibration.toml, else replace values by your calibration results
+MiddlePos_2 = middle_pos(range(11, 19), [3, -3, -1, -10, 5, 2, -7, 3]) # from AHControl/config/calibration.toml, else replace values by your calibration results
 
 
 c = Scs0009PyController(
@@ -1,10 +1,10 @@
 import time
 import numpy as np
 
-from rustypot import Scs0009PyController
+from hand_calibration import middle_pos
 
 class AmazingHand:
-    def __init__(self, port="COM3", baudrate=1000000, side=1):
+    def __init__(self, port="COM3", baudrate=1000000, side=1, controller=None):
         # Side
         self.Side = side # 1=> Right Hand // 2=> Left Hand
 
@@ -13,14 +13,18 @@ class AmazingHand:
         self.CloseSpeed = 3
 
         # Fingers middle poses
-        # replace values by your calibration results
-        self.MiddlePos = [3, 0, -5, -8, -2, 5, -12, 0] 
+        # from AHControl/config/calibration.toml, else replace values by your calibration results
+        self.MiddlePos = middle_pos(range(1, 9), [3, 0, -5, -8, -2, 5, -12, 0])
 
-        self.c = Scs0009PyController(
+        # controller: an already opened servo bus (e.g. hand_server.FakeBus), else the serial port is opened
+        if controller is None:
+            from rustypot import Scs0009PyController
+            controller = Scs0009PyController(
                 serial_port=port,
                 baudrate=baudrate,
                 timeout=0.5,
             )
+        self.c = controller
         
         # Initialize
         # 1 = On / 2 = Off / 3 = Free
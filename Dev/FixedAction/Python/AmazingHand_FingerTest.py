@@ -3,10 +3,11 @@ import numpy as np
 
 from rustypot import Scs0009PyController
 
+from hand_calibration import middle_pos
+
 ID_1 = 1 #Change to servo ID you want to calibrate 
 ID_2 = 2 #Change to servo ID you want to calibrate 
-MiddlePos_1 = 0 #Middle position for servo ID_1 
-MiddlePos_2 = 0 #Middle position for servo ID_2
+MiddlePos_1, MiddlePos_2 = middle_pos([ID_1, ID_2], [0, 0]) #Middle positions from AHControl/config/calibration.toml, else change the defaults
 
 c = Scs0009PyController(
         serial_port="COM3",
@@ -0,0 +1,45 @@
+"""Dora node playing on the hand the gestures recognized by the hand tracker.
+
+Receives the gesture id (int32, -1: none) and its name in the metadata, sent by
+HandTracking/Src/main.py --gestures on r_gesture/l_gesture when the recognized
+gesture changes, and calls the method of the same name of AmazingHand.
+
+    dora run dataflow_gestures_real.yml
+"""
+
+import argparse
+
+from AmazingHand_Demo_Optimized import AmazingHand
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--serialport", type=str, default="COM3")
+    parser.add_argument("-b", "--baudrate", type=int, default=1_000_000)
+    parser.add_argument("--side", type=int, choices=[1, 2], default=1, help="1: right hand, 2: left hand")
+    parser.add_argument("--idle", type=str, default="OpenHand", help="gesture played when no gesture is recognized ('' for none)")
+    args = parser.parse_args()
+
+    hand = AmazingHand(port=args.serialport, baudrate=args.baudrate, side=args.side)
+
+    from dora import Node
+
+    node = Node()
+    for event in node:
+        if event["type"] == "INPUT":
+            if event["id"] == "gesture":
+                name = event["metadata"].get("name", "none")
+                if name == "none":
+                    name = args.idle
+                if name:
+                    print(f"Gesture {name}")
+                    getattr(hand, name)()
+            else:
+                print(f"Received input `{event['id']}`")
+        elif event["type"] == "ERROR":
+            raise RuntimeError(event["error"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""Middle positions of the motors, read from the calibration file of the automatic calibration.
+
+AHControl/python/calibrate.py sweeps every motor of the hand to its endpoints
+and writes its middle to AHControl/config/calibration.toml (radians). The demo
+scripts take their MiddlePos (degrees) from there, and use their own values for
+the motors that are not calibrated yet.
+"""
+
+import os
+
+import numpy as np
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # python < 3.11
+    import tomli as tomllib
+
+CALIBRATION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "AHControl", "config", "calibration.toml")
+
+
+def middle_pos(ids, default):
+    """MiddlePos (degrees) of the motors `ids`, from the calibration file or `default`."""
+    middles = {}
+    if os.path.exists(CALIBRATION):
+        with open(CALIBRATION, "rb") as f:
+            middles = {m["id"]: np.rad2deg(m["middle"]) for m in tomllib.load(f).get("motors", [])}
+    return [round(float(middles.get(i, d)), 1) for i, d in zip(ids, default)]
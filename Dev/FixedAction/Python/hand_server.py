@@ -0,0 +1,328 @@
+"""Local network control server of one AmazingHand: several tools share the hand and its serial port.
+
+Clients connect on localhost over TCP (one JSON object per line) or, with
+--ws-port, WebSocket (JSON text messages) and send:
+
+    {"type": "pose", "angles": [a1, ..., a8]}                 degrees from the middle positions, null: unchanged
+    {"type": "pose", "fingers": {"Index": [flexion, abduction]}}
+    {"type": "gesture", "name": "Victory"}                   a gesture of AmazingHand, answered once played
+    {"type": "subscribe", "rate": 20}                        telemetry pushed 20 times per second (0: stop)
+
+A binary WebSocket message is a compact pose: 8 little-endian float32 angles
+(NaN: unchanged). Poses are not answered; gestures, subscriptions and invalid
+requests are, with the "id" of the request if it has one.
+
+Poses only update the goals of a CoalescingSender (hand_stream.py): whatever
+the number of clients and the rate of their commands, every control tick sends
+the latest goal of each motor that changed with one sync-write. Gestures run in
+a worker thread holding the bus lock. Telemetry is one sync-read of the present
+positions per period of the fastest subscriber, shared by all the subscribers;
+a client that does not read its socket drops telemetry instead of queueing it.
+
+    python FixedAction/Python/hand_server.py --serialport COM3 --side 1
+    python FixedAction/Python/hand_server.py --dry-run --ws-port 8766   # fake serial port, no hardware
+    echo '{"type": "gesture", "name": "Victory"}' | nc localhost 8765
+"""
+
+import argparse
+import asyncio
+import json
+import struct
+import time
+
+import numpy as np
+
+from hand_stream import FINGERS, CoalescingSender
+
+GESTURES = ["OpenHand", "CloseHand", "OpenHand_Progressive", "SpreadHand", "ClenchHand", "Index_Pointing",
+            "Nonono", "Perfect", "Victory", "Scissors", "Pinched", "Fuck"]
+POSE_FRAME = struct.Struct("<8f")
+MAX_BUFFER = 64 * 1024  # bytes waiting in a client socket before its telemetry is dropped
+
+
+class FakeBus:
+    """Stands for the serial port of the servos: every transaction takes `latency` seconds.
+
+    The motors are at their goal at once; the number of transactions is counted.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.position = {}
+        self.writes = self.reads = 0
+
+    def write_torque_enable(self, motor_id, value):
+        time.sleep(self.latency)
+
+    def write_goal_speed(self, motor_id, speed):
+        time.sleep(self.latency)
+
+    def write_goal_position(self, motor_id, position):
+        time.sleep(self.latency)
+        self.position[motor_id] = position
+        self.writes += 1
+
+    def sync_write_goal_position(self, ids, positions):
+        time.sleep(self.latency)
+        self.position.update(zip(ids, positions))
+        self.writes += 1
+
+    def sync_read_present_position(self, ids):
+        time.sleep(self.latency)
+        self.reads += 1
+        return [self.position.get(i, 0.0) for i in ids]
+
+
+class TcpClient:
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.name = "tcp %s:%s" % writer.get_extra_info("peername")[:2]
+
+    def busy(self):
+        return self.writer.transport.get_write_buffer_size() > MAX_BUFFER
+
+    async def send(self, message):
+        self.writer.write(json.dumps(message).encode() + b"\n")
+
+
+class WsClient:
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.name = "ws %s:%s" % websocket.remote_address[:2]
+
+    def busy(self):
+        return self.websocket.transport.get_write_buffer_size() > MAX_BUFFER
+
+    async def send(self, message):
+        await self.websocket.send(json.dumps(message))
+
+
+class HandServer:
+    """Requests of all the clients -> one AmazingHand, through one CoalescingSender."""
+
+    def __init__(self, hand, rate=100.0):
+        self.hand = hand
+        self.sender = CoalescingSender.for_hand(hand, rate)
+        self.subscribers = {}  # client: [period, next push (loop time)]
+        self.changed = asyncio.Event()
+        self.tasks = set()  # running gestures
+        self.clients = self.poses = self.telemetry = self.dropped = 0
+
+    # requests
+
+    def pose(self, message):
+        if "angles" in message:
+            angles = np.array([np.nan if a is None else a for a in message["angles"]], dtype=float)
+            if angles.shape != (len(self.sender.ids),):
+                raise ValueError(f"a pose has {len(self.sender.ids)} angles")
+            self.set_angles(angles)
+        for name, (flexion, abduction) in message.get("fingers", {}).items():
+            if name not in FINGERS:
+                raise ValueError(f"unknown finger {name}, one of {FINGERS}")
+            self.sender.set_finger(FINGERS.index(name), flexion, abduction)
+        self.poses += 1
+
+    def set_angles(self, angles):
+        motors = np.flatnonzero(~np.isnan(angles))
+        self.sender.set(motors, angles[motors])
+
+    def play(self, name):
+        with self.sender.bus_lock:
+            getattr(self.hand, name)()
+
+    async def gesture(self, client, message):
+        reply = {"type": "gesture", "name": message.get("name")}
+        if "id" in message:
+            reply["id"] = message["id"]
+        if message.get("name") not in GESTURES:
+            reply.update(type="error", message=f"unknown gesture, one of {GESTURES}")
+        else:
+            try:
+                # the serial transactions and sleeps of the gesture block, the other requests keep going
+                await asyncio.get_running_loop().run_in_executor(None, self.play, message["name"])
+                reply["status"] = "done"
+            except Exception as e:
+                reply.update(type="error", message=f"gesture failed: {e}")
+        try:
+            await client.send(reply)
+        except ConnectionError:
+            pass
+
+    def subscribe(self, client, rate):
+        if rate > 0:
+            self.subscribers[client] = [1.0 / rate, asyncio.get_running_loop().time()]
+        else:
+            self.subscribers.pop(client, None)
+        self.changed.set()
+
+    async def handle(self, client, data, frame=True):
+        """One request of a client: JSON text, or bytes (a binary pose frame, UTF-8 JSON if not frame)."""
+        message = {}
+        try:
+            if isinstance(data, bytes) and frame:  # binary WebSocket message
+                self.set_angles(np.array(POSE_FRAME.unpack(data), dtype=float))
+                self.poses += 1
+                return
+            if isinstance(data, bytes):
+                data = data.decode()  # UnicodeDecodeError is a ValueError
+            message = json.loads(data)
+            kind = message.get("type")
+            if kind == "pose":
+                self.pose(message)
+            elif kind == "gesture":
+                task = asyncio.create_task(self.gesture(client, message))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+            elif kind == "subscribe":
+                rate = float(message.get("rate", 0.0))
+                self.subscribe(client, rate)
+                reply = {"type": "subscribe", "rate": rate}
+                if "id" in message:
+                    reply["id"] = message["id"]
+                await client.send(reply)
+            else:
+                raise ValueError(f"unknown request type {kind}")
+        except (ValueError, TypeError, AttributeError, KeyError, struct.error) as e:
+            reply = {"type": "error", "message": str(e)}
+            if isinstance(message, dict) and "id" in message:
+                reply["id"] = message["id"]
+            await client.send(reply)
+
+    # telemetry
+
+    def read_angles(self, timeout):
+        """Present angles (degrees from the middle positions), None when a gesture holds the bus."""
+        if not self.sender.bus_lock.acquire(timeout=timeout):
+            return None
+        try:
+            positions = self.hand.c.sync_read_present_position(self.sender.ids)
+        finally:
+            self.sender.bus_lock.release()
+        return np.round(np.rad2deg(positions) - self.sender.middle, 2).tolist()
+
+    async def telemetry_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self.changed.clear()
+            if not self.subscribers:
+                await self.changed.wait()
+                continue
+            delay = min(next_push for _, next_push in self.subscribers.values()) - loop.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.changed.wait(), delay)
+                    continue  # new subscription, maybe due sooner
+                except asyncio.TimeoutError:
+                    pass
+            period = min(period for period, _ in self.subscribers.values())
+            angles = await loop.run_in_executor(None, self.read_angles, period)
+            if angles is None:
+                continue
+            now = loop.time()
+            message = {"type": "telemetry", "t": time.time(), "angles": angles}
+            for client, subscription in list(self.subscribers.items()):
+                period, next_push = subscription
+                if next_push > now:
+                    continue
+                subscription[1] = max(next_push + period, now)
+                if client.busy():
+                    self.dropped += 1
+                    continue
+                try:
+                    await client.send(message)
+                    self.telemetry += 1
+                except ConnectionError:
+                    self.subscribers.pop(client, None)
+
+    # connections
+
+    async def serve_tcp(self, reader, writer):
+        client = TcpClient(writer)
+        self.clients += 1
+        print(f"Client {client.name} connected")
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # line longer than the limit of the reader (64 KiB), dropped
+                    await client.send({"type": "error", "message": "request line too long"})
+                    continue
+                if not line:
+                    break
+                if line.strip():
+                    await self.handle(client, line, frame=False)
+        except ConnectionError:
+            pass
+        finally:
+            self.subscribers.pop(client, None)
+            writer.close()
+
+    async def serve_ws(self, websocket):
+        from websockets.exceptions import ConnectionClosed
+
+        client = WsClient(websocket)
+        self.clients += 1
+        print(f"Client {client.name} connected")
+        try:
+            async for message in websocket:
+                await self.handle(client, message)
+        except ConnectionClosed:
+            pass
+        finally:
+            self.subscribers.pop(client, None)
+
+    async def serve(self, host="127.0.0.1", port=8765, ws_port=None):
+        self.sender.start()
+        servers = [await asyncio.start_server(self.serve_tcp, host, port)]
+        print(f"Listening on tcp://{host}:{port}")
+        if ws_port:
+            from websockets.asyncio.server import serve
+
+            servers.append(await serve(self.serve_ws, host, ws_port))
+            print(f"Listening on ws://{host}:{ws_port}")
+        telemetry = asyncio.create_task(self.telemetry_loop())
+        try:
+            await asyncio.gather(*(server.serve_forever() for server in servers))
+        finally:
+            telemetry.cancel()
+            for server in servers:
+                server.close()
+
+    def stop(self):
+        self.sender.stop()
+        print(f"{self.clients} clients, {self.poses} pose commands -> {self.sender.writes} sync writes, "
+              f"{self.telemetry} telemetry messages ({self.dropped} dropped)")
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Network control server of one AmazingHand")
+    parser.add_argument("-s", "--serialport", type=str, default="COM3")
+    parser.add_argument("-b", "--baudrate", type=int, default=1_000_000)
+    parser.add_argument("--side", type=int, choices=[1, 2], default=1, help="1: right hand, 2: left hand")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="listen address (localhost only by default)")
+    parser.add_argument("-p", "--port", type=int, default=8765, help="TCP port (JSON lines)")
+    parser.add_argument("--ws-port", type=int, default=None, help="also serve WebSocket clients on this port (needs `websockets`)")
+    parser.add_argument("--rate", type=float, default=100.0, help="control ticks per second (one sync-write each)")
+    parser.add_argument("--dry-run", action="store_true", help="no hardware: fake serial port, transactions take --dry-run-latency")
+    parser.add_argument("--dry-run-latency", type=float, default=1.0, help="duration of a transaction in dry run (ms)")
+    args = parser.parse_args()
+
+    from AmazingHand_Demo_Optimized import AmazingHand
+
+    controller = FakeBus(args.dry_run_latency / 1e3) if args.dry_run else None
+    hand = AmazingHand(port=args.serialport, baudrate=args.baudrate, side=args.side, controller=controller)
+    server = HandServer(hand, args.rate)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.ws_port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Quitting")
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
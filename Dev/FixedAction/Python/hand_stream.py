@@ -0,0 +1,123 @@
+"""Live control of the hand: the latest goal of every servo, sent at a fixed rate as one sync-write.
+
+The Move_* methods of AmazingHand write the speed and position of each motor
+one by one and sleep in between, a few milliseconds per finger: called for
+every slider event they queue behind each other and the hand lags behind the
+GUI. CoalescingSender only stores the new goals (no serial transaction in the
+caller), and its thread sends the goals that changed since the last tick with
+a single sync_write_goal_position, `rate` times per second. Intermediate
+values of a fast drag are dropped, the bus load is bounded by the rate.
+
+    hand = AmazingHand(port="COM3")
+    sender = CoalescingSender.for_hand(hand, rate=100)
+    sender.start()
+    sender.set_finger(0, flexion=45, abduction=10)   # index finger, degrees
+    sender.stop()
+
+Angles are in degrees relative to the middle position of each motor, like the
+arguments of Move_*. A finger is driven by two motors: flexion turns them in
+opposite directions (OpenHand: -35, CloseHand: 90), abduction in the same
+direction (the "Nonono" gesture).
+"""
+
+import threading
+import time
+
+import numpy as np
+
+FINGERS = ["Index", "Middle", "Ring", "Thumb"]  # motors 2f, 2f+1 of the AmazingHand ids 1-8
+ANGLE_LIMIT = 90.0
+
+
+def finger_angles(flexion, abduction):
+    """(motor 1, motor 2) angles of a finger from its flexion and abduction (degrees)."""
+    return flexion + abduction, -flexion + abduction
+
+
+def finger_pose(angle_1, angle_2):
+    """(flexion, abduction) of a finger from its motor angles, inverse of finger_angles."""
+    return 0.5 * (angle_1 - angle_2), 0.5 * (angle_1 + angle_2)
+
+
+class CoalescingSender(threading.Thread):
+    """Sends the latest goal of the motors `ids` every 1/rate seconds, only those that changed."""
+
+    def __init__(self, controller, ids, middle, rate=100.0, bus_lock=None):
+        super().__init__(name="hand sender", daemon=True)
+        self.controller = controller
+        self.ids = list(ids)
+        self.middle = np.asarray(middle, dtype=float)
+        self.period = 1.0 / rate
+        self.angles = np.zeros(len(self.ids))
+        self.dirty = np.zeros(len(self.ids), dtype=bool)
+        self.lock = threading.Lock()
+        # held during every transaction: take it to use the controller from another thread
+        self.bus_lock = bus_lock or threading.Lock()
+        self.running = threading.Event()
+        self.updates = self.writes = self.errors = 0
+
+    @classmethod
+    def for_hand(cls, hand, rate=100.0):
+        """Sender of the 8 motors of an AmazingHand (AmazingHand_Demo_Optimized), at full speed."""
+        ids = list(range(1, 9))
+        for motor_id in ids:
+            hand.c.write_goal_speed(motor_id, hand.MaxSpeed)
+        return cls(hand.c, ids, hand.MiddlePos, rate)
+
+    def set(self, motors, angles):
+        """New goals (degrees from the middle positions) of motors (indices in ids); returns immediately."""
+        with self.lock:
+            self.angles[motors] = np.clip(angles, -ANGLE_LIMIT, ANGLE_LIMIT)
+            self.dirty[motors] = True
+            self.updates += 1
+
+    def set_finger(self, finger, flexion, abduction):
+        self.set([2 * finger, 2 * finger + 1], finger_angles(flexion, abduction))
+
+    def get_finger(self, finger):
+        """(flexion, abduction) of the last goals of a finger."""
+        with self.lock:
+            return finger_pose(*self.angles[2 * finger:2 * finger + 2])
+
+    def flush(self):
+        """Send the goals that changed, if any (one sync-write); returns the number of motors sent."""
+        with self.lock:
+            motors = np.flatnonzero(self.dirty)
+            if not len(motors):
+                return 0
+            ids = [self.ids[m] for m in motors]
+            goals = np.deg2rad(self.middle[motors] + self.angles[motors]).tolist()
+            self.dirty[:] = False
+        try:
+            with self.bus_lock:
+                self.controller.sync_write_goal_position(ids, goals)
+        except Exception as e:
+            self.errors += 1
+            print(f"sync write failed: {e}")
+            # send them again next tick; the goals set since then are dirty anyway and newer
+            with self.lock:
+                self.dirty[motors] = True
+        self.writes += 1
+        return len(ids)
+
+    def start(self):
+        self.running.set()
+        super().start()
+
+    def run(self):
+        next_tick = time.perf_counter()
+        while self.running.is_set():
+            self.flush()
+            next_tick += self.period
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.perf_counter()  # late (slow bus), do not try to catch up
+
+    def stop(self):
+        """Stop the thread after sending the pending goals."""
+        self.running.clear()
+        if self.is_alive():
+            self.join()
+        self.flush()
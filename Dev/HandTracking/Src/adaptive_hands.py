@@ -0,0 +1,198 @@
+"""Adaptive front-end for MediaPipe Hands: region of interest cropping and resolution scaling.
+
+`AdaptiveHands` is used in place of `mp_hands.Hands` (same `process(rgb)` call,
+same results): instead of the full camera frame, MediaPipe gets a padded crop
+around the hands of the previous frames, downscaled so that its longer side is
+at most the current inference size. The normalized landmarks of the results are
+mapped back to the full frame, so the fingertip computation and the drawing are
+unchanged (world landmarks are metric and do not depend on the crop).
+
+- The crop only moves when a hand gets close to its border, MediaPipe's own
+  tracking between frames keeps working on a stable image.
+- When no hand is found in the crop (tracking lost), the same frame is processed
+  again in full, and every `full_every` frames the full frame is used to find
+  hands that entered outside the crop. The full-frame passes go through a
+  second, static-image mode Hands: in video mode MediaPipe tracks the hands
+  from its previous image, and alternating crop and full frame on one instance
+  would hand it landmarks in the wrong image every time.
+- `FrameBudget` adjusts the inference size, then `model_complexity`, to keep the
+  processing time close to a target.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+
+def hand_bbox(landmarks, width, height):
+    """Pixel bounding box (x0, y0, x1, y1) of a normalized landmark list."""
+    xy = np.array([(l.x, l.y) for l in landmarks.landmark]) * (width, height)
+    x0, y0 = xy.min(axis=0)
+    x1, y1 = xy.max(axis=0)
+    return x0, y0, x1, y1
+
+
+class RoiTracker:
+    """Square crop around the hand bounding boxes, padded by `pad` times the hand size on every side."""
+
+    def __init__(self, pad=0.5, min_size=96, margin=0.1):
+        self.pad = pad
+        self.min_size = min_size
+        self.margin = margin  # the crop is moved when a hand is closer than margin * crop size to its border
+        self.roi = None
+
+    def reset(self):
+        self.roi = None
+
+    def update(self, bboxes, width, height):
+        """Fit the crop to the hands bounding boxes, keep it when they are still well inside."""
+        if not bboxes:
+            self.roi = None
+            return
+        boxes = np.array(bboxes)
+        x0, y0 = boxes[:, :2].min(axis=0)
+        x1, y1 = boxes[:, 2:].max(axis=0)
+        if self.roi is not None:
+            rx0, ry0, rx1, ry1 = self.roi
+            m = self.margin * (rx1 - rx0)
+            size = max(x1 - x0, y1 - y0) * (1 + 2 * self.pad)
+            inside = x0 - rx0 >= m and y0 - ry0 >= m and rx1 - x1 >= m and ry1 - y1 >= m
+            if inside and size > 0.5 * (rx1 - rx0):  # still fits and not much too large
+                return
+        size = max(x1 - x0, y1 - y0, 1.0) * (1 + 2 * self.pad)
+        size = int(min(max(size, self.min_size), width, height))
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        rx0 = int(np.clip(cx - size / 2, 0, width - size))
+        ry0 = int(np.clip(cy - size / 2, 0, height - size))
+        self.roi = (rx0, ry0, rx0 + size, ry0 + size)
+
+
+class FrameBudget:
+    """Choose the inference size and model complexity that keep the processing time under `target` seconds.
+
+    The processing time is smoothed; above the target the size is reduced by
+    `step`, then the complexity lowered, below `low` * target they are raised
+    again (complexity first). After a change, `cooldown` frames are measured
+    before the next one.
+    """
+
+    def __init__(self, target, min_size=160, max_size=640, max_complexity=1, step=0.8, low=0.6, cooldown=15, alpha=0.2):
+        self.target = target
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_complexity = max_complexity
+        self.step = step
+        self.low = low
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.size = max_size
+        self.complexity = max_complexity
+        self.elapsed = None
+        self.wait = cooldown
+
+    def update(self, elapsed):
+        """Record a processing time, return True when the size or the complexity changed."""
+        self.elapsed = elapsed if self.elapsed is None else (1 - self.alpha) * self.elapsed + self.alpha * elapsed
+        self.wait -= 1
+        if self.wait > 0:
+            return False
+        size, complexity = self.size, self.complexity
+        if self.elapsed > self.target:
+            if self.size > self.min_size:
+                self.size = max(self.min_size, int(self.size * self.step))
+            elif self.complexity > 0:
+                self.complexity -= 1
+                self.size = self.max_size
+        elif self.elapsed < self.low * self.target:
+            if self.size < self.max_size:
+                self.size = min(self.max_size, int(self.size / self.step))
+            elif self.complexity < self.max_complexity:
+                self.complexity += 1
+                self.size = self.min_size
+        if (size, complexity) == (self.size, self.complexity):
+            return False
+        self.elapsed = None
+        self.wait = self.cooldown
+        return True
+
+
+class AdaptiveHands:
+    """Drop-in for mp_hands.Hands that crops, downscales and adapts to a frame time budget.
+
+    make_hands(complexity, static) returns a new MediaPipe Hands instance
+    (static: static_image_mode, for the full-frame passes); it is called again
+    when the budget changes the model complexity.
+    """
+
+    def __init__(self, make_hands, target=None, min_size=160, max_size=640, max_complexity=1, pad=0.5, full_every=30, verbose=True):
+        self.make_hands = make_hands
+        self.budget = None
+        complexity = max_complexity
+        size = max_size
+        if target:
+            self.budget = FrameBudget(target, min_size, max_size, max_complexity)
+            complexity, size = self.budget.complexity, self.budget.size
+        self.size = size
+        self.complexity = complexity
+        self.hands = make_hands(complexity, False)  # crops, tracking between frames
+        self.full_hands = make_hands(complexity, True)  # full frames, detection only
+        self.roi = RoiTracker(pad)
+        self.full_every = full_every
+        self.verbose = verbose
+        self.frame = 0
+
+    def _infer(self, image, roi):
+        """Run MediaPipe on the roi of the image (None: full frame), landmarks mapped back to the full frame."""
+        height, width = image.shape[:2]
+        x0, y0, x1, y1 = roi if roi is not None else (0, 0, width, height)
+        crop = image[y0:y1, x0:x1]
+        scale = self.size / max(crop.shape[:2])
+        if scale < 1.0:
+            crop = cv2.resize(crop, (round(crop.shape[1] * scale), round(crop.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+        else:
+            crop = np.ascontiguousarray(crop)
+        crop.flags.writeable = False
+        results = (self.hands if roi is not None else self.full_hands).process(crop)
+        if roi is not None and results.multi_hand_landmarks:
+            sx, sy = (x1 - x0) / width, (y1 - y0) / height
+            for landmarks in results.multi_hand_landmarks:
+                for l in landmarks.landmark:
+                    l.x = x0 / width + l.x * sx
+                    l.y = y0 / height + l.y * sy
+                    l.z = l.z * sx  # z has the scale of x
+        return results
+
+    def process(self, image):
+        """Same as mp_hands.Hands.process on the full RGB image."""
+        t0 = time.perf_counter()
+        height, width = image.shape[:2]
+        self.frame += 1
+        roi = self.roi.roi
+        if self.full_every and self.frame % self.full_every == 0:
+            roi = None
+        results = self._infer(image, roi)
+        if roi is not None and not results.multi_hand_landmarks:
+            results = self._infer(image, None)  # lost in the crop, detect on the full frame
+        self.roi.update([hand_bbox(l, width, height) for l in results.multi_hand_landmarks or []], width, height)
+
+        if self.budget is not None and self.budget.update(time.perf_counter() - t0):
+            if self.budget.complexity != self.complexity:
+                self.close()
+                self.complexity = self.budget.complexity
+                self.hands = self.make_hands(self.complexity, False)
+                self.full_hands = self.make_hands(self.complexity, True)
+            self.size = self.budget.size
+            if self.verbose:
+                print(f"Hand tracking: inference size {self.size}px, model_complexity {self.complexity}")
+        return results
+
+    def close(self):
+        self.hands.close()
+        self.full_hands.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,74 @@
+"""Preallocated images of the per-frame path of the tracker (capture, flip, RGB conversion).
+
+Every tick of the tracker used to allocate about 1 MB per image step: the frame
+of cap.read(), the flipped copy, the RGB copy for MediaPipe and the BGR copy to
+draw on. Freed right away, these large arrays go back to the system and the
+next ones page-fault their memory in again. FrameBuffers keeps one array per
+step and lets OpenCV write into it (`cap.read(image=...)`, `dst=`):
+
+    buffers = FrameBuffers()
+    ret, frame = buffers.read(cap)          # next buffer set
+    frame = buffers.flip(frame)
+    frame, r_res, l_res = process_img(hands, frame, buffers=buffers)   # drawn in place
+
+The captured and flipped images are double buffered (n=2 sets used in turn):
+the image of the previous frame is not overwritten while the next one is
+produced, for a stage that still holds it (display, frame ring writer). The RGB
+image is only read by MediaPipe during process() and is a single buffer. The
+buffers follow the frame shape, a camera changing its resolution only costs a
+new allocation.
+"""
+
+import cv2
+import numpy as np
+
+
+class FrameBuffers:
+    """Named image buffers reused from frame to frame, `n` sets of the double buffered ones."""
+
+    def __init__(self, n=2):
+        self.n = n
+        self.index = 0
+        self._buffers = {}
+
+    def get(self, name, shape, dtype=np.uint8, rotate=True):
+        """Buffer `name` of the current set (rotate=False: one buffer shared by all sets)."""
+        buffers = self._buffers.setdefault(name, [None] * (self.n if rotate else 1))
+        i = self.index if rotate else 0
+        buf = buffers[i]
+        if buf is None or buf.shape != tuple(shape) or buf.dtype != dtype:
+            buf = buffers[i] = np.empty(shape, dtype)
+        buf.flags.writeable = True  # MediaPipe inputs are marked read-only
+        return buf
+
+    def next(self):
+        """Move to the next buffer set (read() does it for each captured frame)."""
+        self.index = (self.index + 1) % self.n
+
+    def read(self, cap):
+        """cap.read() into the capture buffer of the next set."""
+        self.next()
+        buffers = self._buffers.setdefault("capture", [None] * self.n)
+        # the first frame (or a new resolution) is allocated by OpenCV, then kept
+        ret, frame = cap.read(buffers[self.index])
+        if ret:
+            buffers[self.index] = frame
+        return ret, frame
+
+    def flip(self, image):
+        """Horizontal flip (selfie view) into the flip buffer of the current set."""
+        return cv2.flip(image, 1, dst=self.get("flip", image.shape, image.dtype))
+
+    def rgb(self, bgr):
+        """BGR -> RGB into the shared RGB buffer."""
+        return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=self.get("rgb", bgr.shape, bgr.dtype, rotate=False))
+
+    def copy(self, image):
+        """Copy into the copy buffer of the current set (to draw on an image that is not ours)."""
+        buf = self.get("copy", image.shape, image.dtype)
+        np.copyto(buf, image)
+        return buf
+
+    @property
+    def nbytes(self):
+        return sum(buf.nbytes for buffers in self._buffers.values() for buf in buffers if buf is not None)
@@ -0,0 +1,178 @@
+"""Shared-memory ring of image frames, to pass camera or debug images between nodes without copies.
+
+One process creates the ring and writes frames into it, any number of processes
+attach to it by name and read the frames as numpy views on the shared buffer.
+Only the sequence number of a new frame travels through dora (see
+`main.py --frame-ring`), e.g. as `pa.array([seq], type=pa.uint64())`.
+
+Layout of the shared block:
+
+    ring header  | slot headers (n_slots)           | slot data (n_slots * slot_bytes)
+    magic, slots,  seq, timestamp, shape, dtype
+    slot_bytes,
+    latest seq
+
+The writer invalidates the header of a slot (seq = 0) before overwriting it and
+publishes the new sequence number once the data is written. A reader gets a
+view on the slot of a sequence number and, when it must be sure the frame was
+not overwritten while it was using it (the writer went around the ring),
+checks `valid(seq)` afterwards. With a few slots and readers faster than
+n_slots frames this does not happen.
+
+    ring = FrameRing.create("hand_tracker_frames", shape=(480, 640, 3))
+    seq = ring.write(frame)                 # or: view = ring.acquire(shape); ...; seq = ring.commit()
+
+    ring = FrameRing.attach("hand_tracker_frames")
+    frame = ring.get(seq)                   # read-only view, None when already overwritten
+"""
+
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+MAGIC = 0x46524E47  # "FRNG"
+RING_HEADER = np.dtype({
+    "names": ["magic", "n_slots", "slot_bytes", "latest"],
+    "formats": ["<u4", "<u4", "<u8", "<u8"],
+    "offsets": [0, 4, 8, 16],
+    "itemsize": 64,
+})
+SLOT_HEADER = np.dtype({
+    "names": ["seq", "timestamp", "shape", "dtype"],
+    "formats": ["<u8", "<f8", ("<u4", (3,)), "S8"],
+    "offsets": [0, 8, 16, 28],
+    "itemsize": 64,
+})
+
+
+class FrameRing:
+    """Ring of `n_slots` frames of at most `slot_bytes` bytes in a named shared memory block."""
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((), RING_HEADER, shm.buf, 0)
+        if self.header["magic"] != MAGIC:
+            raise ValueError(f"shared memory {shm.name} is not a frame ring")
+        self.n_slots = int(self.header["n_slots"])
+        self.slot_bytes = int(self.header["slot_bytes"])
+        self.slots = np.ndarray((self.n_slots,), SLOT_HEADER, shm.buf, RING_HEADER.itemsize)
+        self.data_offset = RING_HEADER.itemsize + self.n_slots * SLOT_HEADER.itemsize
+        self._pending = None
+
+    @classmethod
+    def create(cls, name, shape, dtype=np.uint8, n_slots=4):
+        """Create the ring, sized for frames of at most `shape`; replaces a stale ring of the same name."""
+        slot_bytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        size = RING_HEADER.itemsize + n_slots * (SLOT_HEADER.itemsize + slot_bytes)
+        try:
+            shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:  # left over by a writer that crashed
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name, create=True, size=size)
+        header = np.ndarray((), RING_HEADER, shm.buf, 0)
+        header["n_slots"] = n_slots
+        header["slot_bytes"] = slot_bytes
+        header["latest"] = 0
+        np.ndarray((n_slots,), SLOT_HEADER, shm.buf, RING_HEADER.itemsize)["seq"] = 0
+        header["magic"] = MAGIC
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name, timeout=0.0):
+        """Attach to an existing ring, waiting up to `timeout` seconds for the writer to create it."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                shm = shared_memory.SharedMemory(name)
+                break
+            except FileNotFoundError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
+        # readers must not unlink the block when they exit, only the writer does
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, owner=False)
+
+    # writer
+
+    def acquire(self, shape, dtype=np.uint8):
+        """Writable view on the next slot, to produce a frame in place (e.g. cap.read(view)); publish it with commit()."""
+        dtype = np.dtype(dtype)
+        if len(shape) > 3 or int(np.prod(shape)) * dtype.itemsize > self.slot_bytes:
+            raise ValueError(f"frame {tuple(shape)} {dtype} does not fit in a slot of {self.slot_bytes} bytes")
+        seq = int(self.header["latest"]) + 1
+        slot = seq % self.n_slots
+        self.slots[slot]["seq"] = 0  # readers of the previous frame of this slot see it is gone
+        self._pending = (seq, slot, tuple(shape), dtype)
+        return self._view(slot, shape, dtype)
+
+    def commit(self, timestamp=None):
+        """Publish the frame written in the view of acquire(), return its sequence number."""
+        seq, slot, shape, dtype = self._pending
+        self._pending = None
+        header = self.slots[slot]
+        header["timestamp"] = time.time() if timestamp is None else timestamp
+        header["shape"] = tuple(shape) + (0,) * (3 - len(shape))
+        header["dtype"] = dtype.str.encode()
+        header["seq"] = seq
+        self.header["latest"] = seq
+        return seq
+
+    def write(self, image, timestamp=None):
+        """Copy `image` into the next slot, return its sequence number."""
+        np.copyto(self.acquire(image.shape, image.dtype), image)
+        return self.commit(timestamp)
+
+    # reader
+
+    @property
+    def latest(self):
+        """Sequence number of the last published frame, 0 before the first one."""
+        return int(self.header["latest"])
+
+    def get(self, seq=None):
+        """Read-only view on the frame `seq` (default the latest), None when it was overwritten."""
+        seq = self.latest if seq is None else seq
+        header = self.slots[seq % self.n_slots]
+        if seq == 0 or header["seq"] != seq:
+            return None
+        shape = tuple(int(s) for s in header["shape"] if s)
+        view = self._view(seq % self.n_slots, shape, np.dtype(header["dtype"].decode()))
+        view.flags.writeable = False
+        return view if self.slots[seq % self.n_slots]["seq"] == seq else None
+
+    def timestamp(self, seq):
+        """Time (time.time()) at which the frame `seq` was published, None when it was overwritten."""
+        header = self.slots[seq % self.n_slots]
+        return float(header["timestamp"]) if header["seq"] == seq else None
+
+    def valid(self, seq):
+        """Whether the frame `seq` is still in the ring, i.e. a view from get(seq) was not overwritten."""
+        return seq != 0 and self.slots[seq % self.n_slots]["seq"] == seq
+
+    def _view(self, slot, shape, dtype):
+        offset = self.data_offset + slot * self.slot_bytes
+        return np.ndarray(shape, dtype, self.shm.buf, offset)
+
+    def close(self):
+        """Release the mapping; the writer also removes the shared block.
+
+        Views returned by get() or acquire() must not be used after this.
+        """
+        self.header = self.slots = None
+        try:
+            self.shm.close()
+        except BufferError:  # views still alive, the mapping goes with the process
+            pass
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
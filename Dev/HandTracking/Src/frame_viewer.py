@@ -0,0 +1,74 @@
+"""Show or record the frames a node publishes in a shared memory frame ring (see frame_ring.py).
+
+The `frame` input only carries the sequence number of the new frame; the image
+itself is read in place from the ring. Frames that were overwritten before this
+node got to them (it is slower than the writer by more than the ring size) are
+counted as dropped. At the end, the number of frames shown and the mean delay
+between publication and display are printed.
+"""
+
+import argparse
+import os
+import time
+
+import cv2
+from dora import Node
+
+from frame_ring import FrameRing
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ring", type=str, default=None,
+                    help="name of the frame ring (default: given by the writer in the message metadata)")
+    parser.add_argument("-r", "--record", type=str, default=None,
+                    help="also write the frames to this video file (.mp4 or .avi)")
+    parser.add_argument("--fps", type=float, default=50.0, help="frame rate of the recorded video")
+    parser.add_argument("--no-window", action="store_true", help="do not show the frames (record only)")
+    args = parser.parse_args()
+
+    node = Node()
+    ring = None
+    writer = None
+    shown = dropped = 0
+    delay = 0.0
+
+    for event in node:
+        if event["type"] == "INPUT":
+            if ring is None:
+                ring = FrameRing.attach(args.ring or event["metadata"]["ring"], timeout=5.0)
+            seq = event["value"][-1].as_py()  # only the latest frame matters
+            frame = ring.get(seq)
+            if frame is None:
+                dropped += 1
+                continue
+            delay += time.time() - ring.timestamp(seq)
+
+            if args.record:
+                if writer is None:
+                    if os.path.dirname(args.record):
+                        os.makedirs(os.path.dirname(args.record), exist_ok=True)
+                    fourcc = "XVID" if args.record.endswith(".avi") else "mp4v"
+                    writer = cv2.VideoWriter(args.record, cv2.VideoWriter_fourcc(*fourcc), args.fps,
+                                             (frame.shape[1], frame.shape[0]))
+                writer.write(frame)
+            if not args.no_window:
+                cv2.imshow(f"Frames {ring.shm.name}", frame)
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    break
+            shown += 1
+
+        elif event["type"] == "ERROR":
+            raise RuntimeError(event["error"])
+
+    if writer is not None:
+        writer.release()
+    if ring is not None:
+        ring.close()
+    if shown:
+        print(f"{shown} frames, {dropped} dropped, mean delay {delay / shown * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
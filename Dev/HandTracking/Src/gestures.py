@@ -0,0 +1,224 @@
+"""Gesture recognition: tracked hand landmarks -> named gestures of the FixedAction AmazingHand class.
+
+Every detected hand is turned into a pose embedding: its 20 metric landmarks
+relative to the wrist, in a frame attached to the palm and scaled by the palm
+length, so the embedding does not depend on where the hand is, how it is
+turned or how big it is. Left hands are mirrored, one library serves both
+hands. The embedding is looked up among the recorded poses of a PoseLibrary
+(k nearest neighbours in a KD-tree, a few tens of microseconds for thousands
+of poses), and GestureRecognizer adds hysteresis on top: a gesture is entered
+below the `enter` distance, held until its poses are further than `exit`, and
+a change must be seen on `hold` consecutive frames before it is reported.
+
+Build a library from short clips (or image folders) of each gesture, then
+track with it:
+
+    python gestures.py add Victory victory.mp4 --flip
+    python gestures.py add OpenHand open_hand/
+    python gestures.py list
+    python main.py --gestures gestures.npz
+
+Like hand_frame.py, this module does not import MediaPipe (only `add` does).
+"""
+
+import argparse
+import os
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from hand_frame import MIDDLE_FINGER_MCP, PINKY_MCP, WRIST
+
+# the gestures of FixedAction/Python/AmazingHand_Demo_Optimized.AmazingHand, the gesture id is the index
+GESTURES = ["OpenHand", "CloseHand", "SpreadHand", "ClenchHand", "Index_Pointing",
+            "Perfect", "Victory", "Pinched", "Fuck"]
+NO_GESTURE = -1
+
+DEFAULT_LIBRARY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gestures.npz")
+
+
+def pose_embedding(world, label):
+    """Embedding (60,) of a hand pose from its metric landmarks (21, 3), label: 'Right' or 'Left'."""
+    points = world - world[WRIST]
+    z = points[MIDDLE_FINGER_MCP]
+    palm = np.linalg.norm(z)
+    z = z / palm
+    y = points[PINKY_MCP] - (points[PINKY_MCP] @ z) * z
+    y = y / np.linalg.norm(y)
+    x = np.cross(y, z)
+    if label == 'Left':
+        x = -x  # a left hand is a mirrored right hand
+    return (points[1:] @ np.array([x, y, z]).T).ravel() / palm
+
+
+class PoseLibrary:
+    """Recorded pose embeddings with their gesture id, indexed in a KD-tree."""
+
+    def __init__(self, embeddings=None, labels=None):
+        self.embeddings = np.empty((0, 60)) if embeddings is None else np.asarray(embeddings, dtype=float)
+        self.labels = np.empty(0, dtype=int) if labels is None else np.asarray(labels, dtype=int)
+        self._tree = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            # gesture ids are stored by name so that the library survives a change of GESTURES
+            names = list(f["names"])
+            return cls(f["embeddings"], [GESTURES.index(names[i]) for i in f["labels"]])
+
+    def save(self, path):
+        np.savez(path, embeddings=self.embeddings, labels=self.labels, names=np.array(GESTURES))
+
+    def add(self, gesture, embeddings):
+        """Add poses (n, 60) of a gesture (name or id)."""
+        gesture = GESTURES.index(gesture) if isinstance(gesture, str) else gesture
+        embeddings = np.asarray(embeddings, dtype=float).reshape(-1, self.embeddings.shape[1])
+        self.embeddings = np.concatenate([self.embeddings, embeddings])
+        self.labels = np.concatenate([self.labels, np.full(len(embeddings), gesture)])
+        self._tree = None
+
+    def remove(self, gesture):
+        keep = self.labels != (GESTURES.index(gesture) if isinstance(gesture, str) else gesture)
+        self.embeddings, self.labels = self.embeddings[keep], self.labels[keep]
+        self._tree = None
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = cKDTree(self.embeddings)
+        return self._tree
+
+    def query(self, embedding, k=5, max_distance=np.inf):
+        """(distances, gesture ids) of the k nearest poses within max_distance, nearest first."""
+        k = min(k, len(self))
+        if k == 0:
+            return np.empty(0), np.empty(0, dtype=int)
+        distances, index = self.tree.query(embedding, k=k, distance_upper_bound=max_distance)
+        distances, index = np.atleast_1d(distances), np.atleast_1d(index)
+        found = index < len(self)
+        return distances[found], self.labels[index[found]]
+
+
+class GestureRecognizer:
+    """Gesture of one hand, from one pose embedding per frame, with hysteresis."""
+
+    def __init__(self, library, k=5, enter=0.6, exit=0.9, hold=3):
+        self.library = library
+        self.k = k
+        self.enter = enter
+        self.exit = exit
+        self.hold = hold
+        self.gesture = NO_GESTURE
+        self._pending = NO_GESTURE
+        self._count = 0
+
+    def candidate(self, distances, labels):
+        """Majority gesture among the neighbours closer than `enter`, the nearest one on ties."""
+        labels = labels[distances < self.enter]
+        if not len(labels):
+            return NO_GESTURE
+        votes = np.bincount(labels)
+        best = np.flatnonzero(votes == votes.max())
+        return next(int(g) for g in labels if g in best)
+
+    def update(self, embedding):
+        """Feed the embedding of this frame (None: no hand), returns the current gesture id."""
+        if embedding is None:
+            distances, labels = np.empty(0), np.empty(0, dtype=int)
+        else:
+            distances, labels = self.library.query(embedding, self.k, self.exit)
+        candidate = self.candidate(distances, labels)
+        if candidate == self.gesture or (candidate == NO_GESTURE and self.gesture in labels):
+            # still the same gesture, or no clear one but the current is within the exit distance
+            self._pending, self._count = self.gesture, 0
+            return self.gesture
+        if candidate == self._pending:
+            self._count += 1
+        else:
+            self._pending, self._count = candidate, 1
+        if self._count >= self.hold:
+            self.gesture, self._count = candidate, 0
+        return self.gesture
+
+
+class HandGestures:
+    """One GestureRecognizer per hand label; collects the gesture changes of each frame."""
+
+    def __init__(self, library, **options):
+        self.recognizers = {label: GestureRecognizer(library, **options) for label in ('Right', 'Left')}
+        self.changes = []
+
+    def update(self, hands):
+        """Feed {label: metric landmarks (21, 3)} of the hands detected in a frame; returns [(label, gesture id)] of the changes."""
+        self.changes = []
+        for label, recognizer in self.recognizers.items():
+            previous = recognizer.gesture
+            embedding = pose_embedding(hands[label], label) if label in hands else None
+            if recognizer.update(embedding) != previous:
+                self.changes.append((label, recognizer.gesture))
+        return self.changes
+
+
+def gesture_name(gesture):
+    return GESTURES[gesture] if gesture != NO_GESTURE else "none"
+
+
+def record_poses(source, flip=False, complexity=1):
+    """Pose embeddings of every hand detected in a video file or an image directory."""
+    import mediapipe.python.solutions.hands as mp_hands
+    import cv2
+    from hand_frame import MIN_HAND_SCORE, landmarks_to_array
+    from offline_tracker import iter_frames
+
+    embeddings = []
+    with mp_hands.Hands(static_image_mode=os.path.isdir(source), model_complexity=complexity,
+                        min_detection_confidence=0.5, min_tracking_confidence=0.5) as hands:
+        for _, frame in iter_frames(source):
+            if flip:
+                frame = cv2.flip(frame, 1)
+            results = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            for index, handedness in enumerate(results.multi_handedness or []):
+                classif = handedness.classification[0]
+                if classif.score > MIN_HAND_SCORE:
+                    world = landmarks_to_array(results.multi_hand_world_landmarks[index])
+                    embeddings.append(pose_embedding(world, classif.label))
+    return np.array(embeddings).reshape(-1, 60)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Manage the pose library of the gesture recognition")
+    parser.add_argument("-l", "--library", type=str, default=DEFAULT_LIBRARY, help="library file (.npz)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="record the poses of a gesture from a video file or an image directory")
+    add.add_argument("gesture", choices=GESTURES)
+    add.add_argument("source", type=str)
+    add.add_argument("--flip", action="store_true", help="mirror the frames like the live tracker does for webcam footage")
+    add.add_argument("--replace", action="store_true", help="drop the poses already recorded for this gesture")
+    remove = commands.add_parser("remove", help="drop the poses of a gesture")
+    remove.add_argument("gesture", choices=GESTURES)
+    commands.add_parser("list", help="number of poses per gesture")
+    args = parser.parse_args()
+
+    library = PoseLibrary.load(args.library) if os.path.exists(args.library) else PoseLibrary()
+    if args.command == "add":
+        poses = record_poses(args.source, args.flip)
+        if args.replace:
+            library.remove(args.gesture)
+        library.add(args.gesture, poses)
+        library.save(args.library)
+        print(f"{len(poses)} poses of {args.gesture} added to {args.library}")
+    elif args.command == "remove":
+        library.remove(args.gesture)
+        library.save(args.library)
+
+    counts = np.bincount(library.labels, minlength=len(GESTURES))
+    for gesture, name in enumerate(GESTURES):
+        print(f"{gesture:>3} {name:<15} {counts[gesture]:>6} poses")
+
+
+if __name__ == "__main__":
+    main()
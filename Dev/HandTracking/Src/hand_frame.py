@@ -0,0 +1,74 @@
+"""Fingertip positions in the hand referential, from MediaPipe hand landmarks.
+
+Kept free of MediaPipe imports so the post-processing of main.process_img can
+be reused (offline tracking, benchmarks) on plain (21, 3) landmark arrays.
+"""
+
+import numpy as np
+
+# MediaPipe HandLandmark indices
+WRIST = 0
+THUMB_MCP = 2
+THUMB_TIP = 4
+INDEX_FINGER_MCP = 5
+INDEX_FINGER_TIP = 8
+MIDDLE_FINGER_MCP = 9
+MIDDLE_FINGER_TIP = 12
+RING_FINGER_MCP = 13
+RING_FINGER_TIP = 16
+PINKY_MCP = 17
+
+# (tip, base) of the robot fingers 1 to 4: index, middle, ring, thumb
+FINGER_TIPS = [INDEX_FINGER_TIP, MIDDLE_FINGER_TIP, RING_FINGER_TIP, THUMB_TIP]
+FINGER_BASES = [INDEX_FINGER_MCP, MIDDLE_FINGER_MCP, RING_FINGER_MCP, THUMB_MCP]
+
+# hands with a lower handedness score are ignored
+MIN_HAND_SCORE = 0.8
+
+
+def landmarks_to_array(landmarks):
+    """MediaPipe NormalizedLandmarkList/LandmarkList -> (21, 3) array."""
+    return np.array([(l.x, l.y, l.z) for l in landmarks.landmark])
+
+
+def hand_rotation(norm, label):
+    """Rotation from the image frame to the hand frame, built from the normalized landmarks (21, 3).
+
+    The hand frame is centered at the wrist, z goes toward the base of the middle
+    finger and x is normal to the palm plane (wrist, middle base, pinky or index base).
+    """
+    origin = norm[WRIST]  #wrist base as the origin
+    unit_z = norm[MIDDLE_FINGER_MCP] - origin  #z is unit vector from base of wrist toward base of middle finger
+    unit_z = unit_z / np.linalg.norm(unit_z)
+
+    if label == 'Right':
+        vec_towards_y = norm[PINKY_MCP] - origin  #vector from wrist base towards pinky base
+    else:
+        vec_towards_y = norm[INDEX_FINGER_MCP] - origin  #vector from wrist base towards index base
+
+    unit_x = np.cross(vec_towards_y, unit_z)
+    unit_x = unit_x / np.linalg.norm(unit_x)
+    unit_y = np.cross(unit_z, unit_x)
+
+    return np.array([unit_x, -unit_y, unit_z])  #-y because of mirror?
+
+
+def tip_positions(world, norm, label):
+    """Tips of the 4 robot fingers relative to their base, in the hand frame, shape (4, 3).
+
+    world: metric landmarks (21, 3), norm: normalized landmarks (21, 3), label: 'Right' or 'Left'.
+    """
+    tips = world[FINGER_TIPS] - world[FINGER_BASES]
+    return tips @ hand_rotation(norm, label).T
+
+
+def detected_hands(results, min_score=MIN_HAND_SCORE):
+    """(label, score, tips (4, 3)) of every hand of MediaPipe Hands results classified with at least min_score."""
+    hands = []
+    for index, handedness in enumerate(results.multi_handedness or []):
+        classif = handedness.classification[0]
+        if classif.score > min_score:
+            world = landmarks_to_array(results.multi_hand_world_landmarks[index])
+            norm = landmarks_to_array(results.multi_hand_landmarks[index])
+            hands.append((classif.label, classif.score, tip_positions(world, norm, classif.label)))
+    return hands
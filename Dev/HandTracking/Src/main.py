@@ -1,40 +1,67 @@
 import argparse
+import functools
 import os
 import time
 
+START_TIME = time.perf_counter()
+
 import cv2
 import numpy as np
 import pyarrow as pa
-from dora import Node
-import mediapipe as mp
-import mediapipe as mp
-import mediapipe.python.solutions.drawing_utils as mp_drawing
-import mediapipe.python.solutions.drawing_styles as mp_drawing_styles
 import mediapipe.python.solutions.hands as mp_hands
 
+from frame_buffers import FrameBuffers
+from hand_frame import MIN_HAND_SCORE, landmarks_to_array, tip_positions
+
+
+@functools.lru_cache(maxsize=None)
+def drawing():
+    """Drawing utils and default hand styles, only loaded once an image is annotated."""
+    import mediapipe.python.solutions.drawing_utils as mp_drawing
+    import mediapipe.python.solutions.drawing_styles as mp_drawing_styles
+
+    return (mp_drawing,
+            mp_drawing_styles.get_default_hand_landmarks_style(),
+            mp_drawing_styles.get_default_hand_connections_style())
+
 # mp_drawing = mp.solutions.drawing_utils
 # mp_drawing_styles = mp.solutions.drawing_styles
 # mp_hands = mp.solutions.hands
 
 # https://mediapipe.readthedocs.io/en/latest/solutions/hands.html
 
-def process_img(hand_proc, image):
+def process_img(hand_proc, image, draw=True, gestures=None, buffers=None, landmarks=None):
+    """Track the hands of a BGR image, return (image, r_res, l_res).
+
+    With draw=False the landmarks are not drawn and the input image is returned
+    as is (offline tracking, benchmarks). With a gestures.HandGestures, the poses
+    of the hands are also recognized, its `changes` are those of this image.
+    With a frame_buffers.FrameBuffers, the RGB image goes into its buffer and the
+    landmarks are drawn on the input image itself, which must be the caller's.
+    A dict `landmarks` receives label: (world (21, 3), image (21, 3), handedness
+    score) of each hand kept (offline datasets).
+    """
+    bgr = image
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB) if buffers is None else buffers.rgb(image)
     image.flags.writeable = False
-    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
     results = hand_proc.process(image)
     # img_width,img_height,_ =image.shape
     # Draw the hand annotations on the image.
-    image.flags.writeable = True
-    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    if draw and buffers is None:
+        image.flags.writeable = True
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    else:
+        image = bgr
     r_res=None
     l_res=None
+    hands={}
     if results.multi_hand_landmarks:
 
       # print('Handedness:', results.multi_handedness)
       # print(results.multi_hand_world_landmarks)
 
       for index,handedness_classif in enumerate(results.multi_handedness):
-          if handedness_classif.classification[0].score>0.8: #let's considere only one right hand
+          if handedness_classif.classification[0].score>MIN_HAND_SCORE: #let's considere only one right hand
 
 
       # for hand_landmarks in results.multi_hand_landmarks:
@@ -51,141 +78,119 @@ def process_img(hand_proc, image):
 
 
               hand_landmarks=results.multi_hand_world_landmarks[index] #metric
-              # hand_landmarks=results.multi_hand_landmarks[index] #normalized
               hand_landmarks_norm=results.multi_hand_landmarks[index] #normalized
-
-
-
-
-
-              tip1_x=hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP].x-hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_MCP].x
-              tip1_y=hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP].y-hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_MCP].y
-              tip1_z=hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP].z-hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_MCP].z
-
-              tip2_x=hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_TIP].x-hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP].x
-              tip2_y=hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_TIP].y-hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP].y
-              tip2_z=hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_TIP].z-hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP].z
-
-              tip3_x=hand_landmarks.landmark[mp_hands.HandLandmark.RING_FINGER_TIP].x-hand_landmarks.landmark[mp_hands.HandLandmark.RING_FINGER_MCP].x
-              tip3_y=hand_landmarks.landmark[mp_hands.HandLandmark.RING_FINGER_TIP].y-hand_landmarks.landmark[mp_hands.HandLandmark.RING_FINGER_MCP].y
-              tip3_z=hand_landmarks.landmark[mp_hands.HandLandmark.RING_FINGER_TIP].z-hand_landmarks.landmark[mp_hands.HandLandmark.RING_FINGER_MCP].z
-
-              tip4_x=hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_TIP].x-hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_MCP].x
-              tip4_y=hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_TIP].y-hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_MCP].y
-              tip4_z=hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_TIP].z-hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_MCP].z
-
-
-              # tip1_x=hand_landmarks_norm.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP].x-hand_landmarks_norm.landmark[mp_hands.HandLandmark.INDEX_FINGER_MCP].x
-              # tip1_y=hand_landmarks_norm.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP].y-hand_landmarks_norm.landmark[mp_hands.HandLandmark.INDEX_FINGER_MCP].y
-              # tip1_z=hand_landmarks_norm.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP].z-hand_landmarks_norm.landmark[mp_hands.HandLandmark.INDEX_FINGER_MCP].z
-
-              # tip2_x=hand_landmarks_norm.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_TIP].x-hand_landmarks_norm.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP].x
-              # tip2_y=hand_landmarks_norm.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_TIP].y-hand_landmarks_norm.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP].y
-              # tip2_z=hand_landmarks_norm.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_TIP].z-hand_landmarks_norm.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP].z
-
-              # tip3_x=hand_landmarks_norm.landmark[mp_hands.HandLandmark.RING_FINGER_TIP].x-hand_landmarks_norm.landmark[mp_hands.HandLandmark.RING_FINGER_MCP].x
-              # tip3_y=hand_landmarks_norm.landmark[mp_hands.HandLandmark.RING_FINGER_TIP].y-hand_landmarks_norm.landmark[mp_hands.HandLandmark.RING_FINGER_MCP].y
-              # tip3_z=hand_landmarks_norm.landmark[mp_hands.HandLandmark.RING_FINGER_TIP].z-hand_landmarks_norm.landmark[mp_hands.HandLandmark.RING_FINGER_MCP].z
-
-              # tip4_x=hand_landmarks_norm.landmark[mp_hands.HandLandmark.THUMB_TIP].x-hand_landmarks_norm.landmark[mp_hands.HandLandmark.THUMB_MCP].x
-              # tip4_y=hand_landmarks_norm.landmark[mp_hands.HandLandmark.THUMB_TIP].y-hand_landmarks_norm.landmark[mp_hands.HandLandmark.THUMB_MCP].y
-              # tip4_z=hand_landmarks_norm.landmark[mp_hands.HandLandmark.THUMB_TIP].z-hand_landmarks_norm.landmark[mp_hands.HandLandmark.THUMB_MCP].z
-
-
-
-
-
-              # tip1_x=hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP].x
-              # tip1_y=hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP].y
-              # tip1_z=hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP].z
-
-
-              # print(f'TIP: {tip_x} {tip_y} {tip_z} ({hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP].x} {hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP].y} {hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP].z})')
-              mp_drawing.draw_landmarks(
-                  image,
-                  hand_landmarks_norm,
-                  mp_hands.HAND_CONNECTIONS,
-                  mp_drawing_styles.get_default_hand_landmarks_style(),
-                  mp_drawing_styles.get_default_hand_connections_style())
-
-
-              #define a new hand frame centered at marker WRIST (n°0) with z along the vector (WRIST,MIDDLE_FINGER_MCP) (0,9) and x is the "third dimension" normal to the plan of the palm (WRIST,MIDDLE_FINGER_MCP)x(WRIST,PINKY_MCP)
-              # origin=np.array([hand_landmarks.landmark[mp_hands.HandLandmark.WRIST].x,hand_landmarks.landmark[mp_hands.HandLandmark.WRIST].y,hand_landmarks.landmark[mp_hands.HandLandmark.WRIST].z])
-              # mid_mcp=np.array([hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP].x,hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP].y,hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP].z])
-              # unit_z=mid_mcp-origin
-              # unit_z=unit_z/np.linalg.norm(unit_z)
-              # pinky_mcp=np.array([hand_landmarks.landmark[mp_hands.HandLandmark.PINKY_MCP].x,hand_landmarks.landmark[mp_hands.HandLandmark.PINKY_MCP].y,hand_landmarks.landmark[mp_hands.HandLandmark.PINKY_MCP].z])
-
-              #rotate everything in a hand referential
-              origin=np.array([hand_landmarks_norm.landmark[mp_hands.HandLandmark.WRIST].x,hand_landmarks_norm.landmark[mp_hands.HandLandmark.WRIST].y,hand_landmarks_norm.landmark[mp_hands.HandLandmark.WRIST].z]) #wrist base as the origin
-              mid_mcp=np.array([hand_landmarks_norm.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP].x,hand_landmarks_norm.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP].y,hand_landmarks_norm.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP].z]) #base of the middle finger
-              unit_z=mid_mcp-origin #z is unit vector from base of wrist toward base of middle finger
-              unit_z=unit_z/np.linalg.norm(unit_z)
-              pinky_mcp=np.array([hand_landmarks_norm.landmark[mp_hands.HandLandmark.PINKY_MCP].x,hand_landmarks_norm.landmark[mp_hands.HandLandmark.PINKY_MCP].y,hand_landmarks_norm.landmark[mp_hands.HandLandmark.PINKY_MCP].z]) #base of the pinky finger
-
-              index_mcp=np.array([hand_landmarks_norm.landmark[mp_hands.HandLandmark.INDEX_FINGER_MCP].x,hand_landmarks_norm.landmark[mp_hands.HandLandmark.INDEX_FINGER_MCP].y,hand_landmarks_norm.landmark[mp_hands.HandLandmark.INDEX_FINGER_MCP].z]) #base of the index finger
-
-
-              # print(f"ORIGIN: {origin} MID: {mid_mcp}")
-
-              if handedness_classif.classification[0].label=='Right':
-                  vec_towards_y=pinky_mcp-origin #vector from wrist base towards pinky base
-              if handedness_classif.classification[0].label=='Left':
-                  vec_towards_y=index_mcp-origin #vector from wrist base towards pinky base
-              # unit_x=np.cross(unit_z,vec_towards_y)
-              # vec_towards_y=pinky_mcp-origin #vector from wrist base towards pinky base
-
-              unit_x=np.cross(vec_towards_y,unit_z) #we say unit x is the cross product of z and the vector towards pinky
-
-              unit_x=unit_x/np.linalg.norm(unit_x)
-
-              unit_y=np.cross(unit_z,unit_x)
-              # unit_y=np.cross(unit_x,unit_z)
-
-
-
-
-
-              if handedness_classif.classification[0].label=='Right':
-              # A=np.array([unit_x,unit_y,unit_z]).reshape((3,3))
-                  R=np.array([unit_x,-unit_y,unit_z]).reshape((3,3)) #-y because of mirror?
-              if handedness_classif.classification[0].label=='Left':
-                  R=np.array([unit_x,-unit_y,unit_z]).reshape((3,3)) #-y because of mirror?
-              tip1=R@np.array([tip1_x,tip1_y,tip1_z])
-              tip2=R@np.array([tip2_x,tip2_y,tip2_z])
-              tip3=R@np.array([tip3_x,tip3_y,tip3_z])
-              tip4=R@np.array([tip4_x,tip4_y,tip4_z])
-
-              # scale=0.01
-              # image = cv2.drawFrameAxes(image, K, disto, rotV, origin, scale)
-
-              # res=[{'r_tip1': [tip1_x,tip1_y,tip1_z],'r_tip2': [tip2_x,tip2_y,tip2_z],'r_tip3': [tip3_x,tip3_y,tip3_z],'r_tip4': [tip4_x,tip4_y,tip4_z]}]
-              if handedness_classif.classification[0].label=='Right':
+              label=handedness_classif.classification[0].label
+
+              if draw:
+                  mp_drawing, landmarks_style, connections_style = drawing()
+                  mp_drawing.draw_landmarks(
+                      image,
+                      hand_landmarks_norm,
+                      mp_hands.HAND_CONNECTIONS,
+                      landmarks_style,
+                      connections_style)
+
+              #tips relative to their MCP (metric), rotated in a hand referential centered at the wrist
+              world=landmarks_to_array(hand_landmarks)
+              norm=landmarks_to_array(hand_landmarks_norm)
+              tip1,tip2,tip3,tip4=tip_positions(world,norm,label)
+              if gestures is not None:
+                  hands[label]=world
+              if landmarks is not None:
+                  landmarks[label]=(world,norm,handedness_classif.classification[0].score)
+
+              if label=='Right':
                   r_res=[{'r_tip1': tip1,'r_tip2': tip2,'r_tip3': tip3,'r_tip4': tip4}]
-                  # print(f"RIGHT: {tip1_x:.3f} {tip1_y:.3f} {tip1_z:.3f} => {tip1}. {unit_x} {unit_y} {unit_z}")
-              elif handedness_classif.classification[0].label=='Left':
+              elif label=='Left':
                   l_res=[{'l_tip1': tip1,'l_tip2': tip2,'l_tip3': tip3,'l_tip4': tip4}]
-                  # print(f"LEFT: {tip1_x:.3f} {tip1_y:.3f} {tip1_z:.3f} => {tip1}. {unit_x} {unit_y} {unit_z}")
+    if gestures is not None:
+        gestures.update(hands)
     # Flip the image horizontally for a selfie-view display.
     return image,r_res,l_res
 # cv2.imshow('MediaPipe Hands', cv2.flip(image, 1))
 
 
+def send_gestures(node, gestures):
+    """Send the gesture changes of the last image on r_gesture/l_gesture (gesture id, -1: none)."""
+    from gestures import gesture_name
+    for label, gesture in gestures.changes:
+        output = 'r_gesture' if label == 'Right' else 'l_gesture'
+        node.send_output(output, pa.array([gesture], type=pa.int32()), {"name": gesture_name(gesture)})
+
+
+def send_frame(node, ring, seq):
+    """Notify the readers of the frame ring: only the sequence number goes through dora."""
+    node.send_output('frame', pa.array([seq], type=pa.uint64()), {"ring": ring.shm.name})
+
+
 def main():
+    parser = argparse.ArgumentParser(description="MediaPipe hand tracking node")
+    parser.add_argument("--frame-ring", default=None,
+                        help="publish the frames in the shared memory ring of this name and their sequence number on the 'frame' output")
+    parser.add_argument("--ring-image", choices=["raw", "annotated"], default="annotated",
+                        help="frames written in the ring: camera images, or images with the landmarks drawn")
+    parser.add_argument("--no-window", action="store_true", help="do not show the OpenCV window")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="crop around the hands and adapt the inference size and model complexity to --target-ms")
+    parser.add_argument("--target-ms", type=float, default=15.0, help="processing time per frame to hold in adaptive mode (0: no adaptation)")
+    parser.add_argument("--min-size", type=int, default=160, help="smallest inference size (longer side, pixels) in adaptive mode")
+    parser.add_argument("--max-size", type=int, default=640, help="largest inference size (longer side, pixels) in adaptive mode")
+    parser.add_argument("--max-complexity", type=int, choices=[0, 1], default=1, help="highest model_complexity used in adaptive mode")
+    parser.add_argument("--cameras", type=int, nargs="+", default=None,
+                        help="track with several cameras (indices), one process per camera, fused hand positions (no window)")
+    parser.add_argument("--fusion-window", type=float, default=0.05,
+                        help="detections of the cameras captured within this many seconds are fused together")
+    parser.add_argument("--gestures", default=None,
+                        help="pose library (gestures.py) to recognize the gestures, sent on r_gesture/l_gesture when they change")
+    parser.add_argument("--gesture-enter", type=float, default=0.6, help="pose distance to enter a gesture")
+    parser.add_argument("--gesture-exit", type=float, default=0.9, help="pose distance to leave the current gesture")
+    parser.add_argument("--gesture-hold", type=int, default=3, help="frames a new gesture must be seen before it is sent")
+    args = parser.parse_args()
+    if args.cameras and args.gestures:
+        parser.error("--gestures is not available with --cameras")
+
+    from dora import Node
 
     node = Node()
 
+    if args.cameras:
+        from multi_camera import run_multi_camera
+        options = {"adaptive": args.adaptive, "target": args.target_ms / 1e3, "min_size": args.min_size,
+                   "max_size": args.max_size, "max_complexity": args.max_complexity}
+        run_multi_camera(node, args.cameras, args.fusion_window, options)
+        return
+    ring = None
+
 
     pa.array([])  # initialize pyarrow array
     cap = cv2.VideoCapture(0)
     # 强制 OpenCV 只保留最新的帧，避免因处理速度低于帧率而导致的图像积压和延迟。
     cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
 
-    with mp_hands.Hands(
-            model_complexity=0,
+    def make_hands(complexity, static=False):
+        return mp_hands.Hands(
+            static_image_mode=static,
+            model_complexity=complexity,
             min_detection_confidence=0.5,
-            min_tracking_confidence=0.5) as hands:
+            min_tracking_confidence=0.5)
+
+    if args.adaptive:
+        from adaptive_hands import AdaptiveHands
+        hand_proc = AdaptiveHands(make_hands, args.target_ms / 1e3, args.min_size, args.max_size, args.max_complexity)
+    else:
+        hand_proc = make_hands(0)
+
+    # capture, flip and RGB conversion write into the same arrays every frame
+    buffers = FrameBuffers()
 
+    gestures = None
+    if args.gestures:
+        from gestures import HandGestures, PoseLibrary
+        gestures = HandGestures(PoseLibrary.load(args.gestures), enter=args.gesture_enter,
+                                exit=args.gesture_exit, hold=args.gesture_hold)
+
+    with hand_proc as hands:
+        print(f"Hand tracking ready {time.perf_counter() - START_TIME:.2f}s after start")
 
 
         for event in node:
@@ -196,19 +201,39 @@ def main():
                 event_id = event["id"]
 
                 if event_id == "tick":
-                    ret, frame = cap.read()
+                    ret, frame = buffers.read(cap)
 
                     if not ret:
                         continue
 
-                    frame = cv2.flip(frame, 1)
+                    if args.frame_ring and ring is None:
+                        # sized on the first frame, readers attach when they get its sequence number
+                        from frame_ring import FrameRing
+                        ring = FrameRing.create(args.frame_ring, frame.shape)
+
+                    # the landmarks are drawn for the window and the annotated ring only
+                    draw = not args.no_window or (ring is not None and args.ring_image == "annotated")
+                    if ring is not None and args.ring_image == "raw":
+                        # flip straight into the shared slot, readers get the frame before the inference
+                        frame = cv2.flip(frame, 1, dst=ring.acquire(frame.shape))
+                        send_frame(node, ring, ring.commit())
+                        if draw:
+                            frame = buffers.copy(frame)  # the landmarks are not for the readers of the slot
+                    else:
+                        frame = buffers.flip(frame)
                     #process
-                    frame,r_res,l_res=process_img(hands,frame)
+                    frame,r_res,l_res=process_img(hands,frame,draw=draw,gestures=gestures,buffers=buffers)
 
                     if r_res is not None:
                         node.send_output('r_hand_pos',pa.array(r_res))
                     if l_res is not None:
                         node.send_output('l_hand_pos',pa.array(l_res))
+                    if gestures is not None:
+                        send_gestures(node,gestures)
+                    if ring is not None and args.ring_image == "annotated":
+                        send_frame(node, ring, ring.write(frame))
+                    if args.no_window:
+                        continue
                     # cv2.imshow('MediaPipe Hands', cv2.flip(frame, 1))
                     cv2.imshow('MediaPipe Hands', frame)
                     if cv2.waitKey(1) & 0xFF == ord("q"):
@@ -218,6 +243,9 @@ def main():
             elif event_type == "ERROR":
                 raise RuntimeError(event["error"])
 
+    if ring is not None:
+        ring.close()
+
 
 if __name__ == "__main__":
     main()
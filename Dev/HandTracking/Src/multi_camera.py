@@ -0,0 +1,141 @@
+"""Multi-camera hand tracking: one capture + MediaPipe process per camera, fused fingertip positions.
+
+Every camera runs in its own process (`camera_worker`), so N cameras use N
+cores instead of being processed one after the other in the node loop. The
+workers send their detections (capture time, hand label, handedness score,
+fingertips) to the node through a queue.
+
+The fingertips are expressed in the hand referential (hand_frame.tip_positions),
+independent of the point of view, so the cameras need no extrinsic calibration:
+`HandFusion` keeps the last detection of each hand by each camera, aligns them
+on the most recent capture time (detections older than `window` are left out)
+and averages them weighted by their handedness score. A camera that does not
+see a hand, or sees it badly, simply does not contribute.
+"""
+
+import queue
+import time
+
+import numpy as np
+import pyarrow as pa
+
+PREFIX = {"Right": "r", "Left": "l"}
+READ_RETRY = 0.01  # s between reads of a camera that delivers no frame
+MAX_READ_FAILURES = 200
+
+
+def camera_worker(index, camera, detections, stop, options):
+    """Capture and track the hands of one camera until `stop` is set; put (index, t, hands) in `detections`."""
+    import cv2
+    import mediapipe.python.solutions.hands as mp_hands
+
+    from frame_buffers import FrameBuffers
+    from hand_frame import detected_hands
+
+    cv2.setNumThreads(1)  # one core per camera
+    cap = cv2.VideoCapture(camera)
+    if not cap.isOpened():
+        print(f"camera {camera}: cannot open")
+        return
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    def make_hands(complexity, static=False):
+        return mp_hands.Hands(
+            static_image_mode=static,
+            model_complexity=complexity,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5)
+
+    if options.get("adaptive"):
+        from adaptive_hands import AdaptiveHands
+        hands = AdaptiveHands(make_hands, options["target"], options["min_size"], options["max_size"],
+                              options["max_complexity"], verbose=False)
+    else:
+        hands = make_hands(0)
+
+    buffers = FrameBuffers()
+    frames = failures = 0
+    t_start = time.perf_counter()
+    with hands:
+        while not stop.is_set():
+            ret, frame = buffers.read(cap)
+            if not ret:
+                # unplugged or driver hiccup: wait instead of spinning on this process's core
+                failures += 1
+                if failures >= MAX_READ_FAILURES:
+                    print(f"camera {camera}: no frame for {failures * READ_RETRY:.0f}s, giving up")
+                    break
+                stop.wait(READ_RETRY)
+                continue
+            failures = 0
+            t = time.time()
+            rgb = buffers.rgb(buffers.flip(frame))
+            rgb.flags.writeable = False
+            hands_found = detected_hands(hands.process(rgb))
+            detections.put((index, t, [(label, score, tips.tolist()) for label, score, tips in hands_found]))
+            frames += 1
+    cap.release()
+    print(f"camera {camera}: {frames / (time.perf_counter() - t_start):.1f} frames/s")
+
+
+class HandFusion:
+    """Time-aligned, score-weighted average of the fingertips of each hand over the cameras."""
+
+    def __init__(self, n_cameras, window=0.05):
+        self.window = window
+        self.latest = [{} for _ in range(n_cameras)]  # per camera: label -> (t, score, tips)
+        self.fused_t = {}
+
+    def add(self, index, t, hands):
+        """Record the detections of camera `index` captured at `t`."""
+        for label, score, tips in hands:
+            self.latest[index][label] = (t, score, np.asarray(tips))
+
+    def fuse(self, label):
+        """Fused (4, 3) fingertips of a hand, None when no camera saw it since the last call."""
+        seen = [camera[label] for camera in self.latest if label in camera]
+        if not seen:
+            return None
+        newest = max(t for t, _, _ in seen)
+        if newest <= self.fused_t.get(label, -np.inf):
+            return None
+        self.fused_t[label] = newest
+        seen = [(score, tips) for t, score, tips in seen if t >= newest - self.window]
+        weights = np.array([score for score, _ in seen])
+        return np.tensordot(weights / weights.sum(), np.stack([tips for _, tips in seen]), axes=1)
+
+
+def run_multi_camera(node, cameras, window=0.05, options=None):
+    """Node loop of main.py --cameras: start the workers, send the fused hands on every tick."""
+    import multiprocessing
+
+    ctx = multiprocessing.get_context("spawn")  # MediaPipe and OpenCV threads do not survive a fork
+    detections = ctx.Queue()
+    stop = ctx.Event()
+    workers = [ctx.Process(target=camera_worker, args=(i, camera, detections, stop, options or {}), daemon=True)
+               for i, camera in enumerate(cameras)]
+    for worker in workers:
+        worker.start()
+    fusion = HandFusion(len(cameras), window)
+
+    try:
+        for event in node:
+            if event["type"] == "INPUT" and event["id"] == "tick":
+                while True:
+                    try:
+                        fusion.add(*detections.get_nowait())
+                    except queue.Empty:
+                        break
+                for label, prefix in PREFIX.items():
+                    tips = fusion.fuse(label)
+                    if tips is not None:
+                        node.send_output(f'{prefix}_hand_pos', pa.array([{f'{prefix}_tip{i + 1}': tip for i, tip in enumerate(tips)}]))
+
+            elif event["type"] == "ERROR":
+                raise RuntimeError(event["error"])
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join(timeout=2.0)
+            if worker.is_alive():
+                worker.terminate()
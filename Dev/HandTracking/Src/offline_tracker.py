@@ -0,0 +1,182 @@
+"""Run the hand tracker offline on a video file or an image directory.
+
+Frames are decoded sequentially on a reader thread while MediaPipe runs as
+fast as it can, in video (tracking) mode or in static-image mode. With
+--workers N the frame range is split in N contiguous chunks, each processed
+by its own process with its own decoder and MediaPipe instance.
+
+The tip positions are written as a landmark dataset in the Arrow IPC format
+of pose_recorder.py, with the time stamps of the footage and extra columns,
+so it can be read with pyarrow or played into a dataflow with pose_replay.py.
+Each row is one hand; besides its tips, the row keeps what MediaPipe returned
+for it, to train or check models on the dataset without tracking it again:
+
+    frame             index of the frame in the source
+    world_landmarks   (21, 3) metric landmarks, meters, origin at the hand center
+    image_landmarks   (21, 3) normalized image landmarks (x, y in [0, 1] of the frame, relative depth z)
+    score             handedness score of the hand
+
+    python offline_tracker.py demo.mp4 -o recordings/demo.arrow --workers 4
+"""
+
+import argparse
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import pyarrow as pa
+
+from pose_recorder import SCHEMA, to_row
+
+IMAGE_EXT = (".png", ".jpg", ".jpeg", ".bmp")
+
+LANDMARKS = pa.list_(pa.list_(pa.float64(), 3), 21)  # (21, 3)
+DATASET_SCHEMA = pa.schema(list(SCHEMA) + [
+    pa.field("frame", pa.int64()),
+    pa.field("world_landmarks", LANDMARKS),
+    pa.field("image_landmarks", LANDMARKS),
+    pa.field("score", pa.float64()),
+])
+
+
+def list_images(folder):
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXT))
+
+
+def frame_count(source):
+    """Number of frames and frame rate (None for image directories) of a source."""
+    if os.path.isdir(source):
+        return len(list_images(source)), None
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise IOError(f"cannot open {source}")
+    count, fps = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return count, fps
+
+
+def iter_frames(source, start=0, stop=None):
+    """Yield (index, frame) for frames [start, stop) of a video file or an image directory, decoded in order."""
+    if os.path.isdir(source):
+        for i, path in enumerate(list_images(source)[start:stop], start):
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield i, frame
+        return
+
+    cap = cv2.VideoCapture(source)
+    if start > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)  # a single seek per chunk, then sequential decode
+    i = start
+    while stop is None or i < stop:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield i, frame
+        i += 1
+    cap.release()
+
+
+class FrameReader(threading.Thread):
+    """Decode frames ahead on a thread, into a bounded queue."""
+
+    def __init__(self, source, start=0, stop=None, size=32):
+        super().__init__(daemon=True)
+        self.frames = iter_frames(source, start, stop)
+        self.queue = queue.Queue(maxsize=size)
+
+    def run(self):
+        for item in self.frames:
+            self.queue.put(item)
+        self.queue.put(None)
+
+    def __iter__(self):
+        self.start()
+        while (item := self.queue.get()) is not None:
+            yield item
+
+
+def track_range(source, start, stop, fps, static, complexity, flip):
+    """Track frames [start, stop) of `source`, returns the dataset columns."""
+    # imported here so the pool workers load MediaPipe themselves
+    import mediapipe.python.solutions.hands as mp_hands
+    from main import process_img
+
+    columns = {name: [] for name in DATASET_SCHEMA.names}
+    with mp_hands.Hands(
+            static_image_mode=static,
+            model_complexity=complexity,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5) as hands:
+
+        for i, frame in FrameReader(source, start, stop):
+            if flip:
+                frame = cv2.flip(frame, 1)
+            landmarks = {}
+            _, r_res, l_res = process_img(hands, frame, draw=False, landmarks=landmarks)
+            for output, res, label in (("r_hand_pos", r_res, "Right"), ("l_hand_pos", l_res, "Left")):
+                if res is not None:
+                    world, norm, score = landmarks[label]
+                    names, values = to_row(pa.array(res))
+                    columns["t"].append(i / fps)
+                    columns["input"].append(output)
+                    columns["names"].append(names)
+                    columns["values"].append(values)
+                    columns["frame"].append(i)
+                    columns["world_landmarks"].append(world.tolist())
+                    columns["image_landmarks"].append(norm.tolist())
+                    columns["score"].append(score)
+    return columns
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", type=str, help="video file or directory of images")
+    parser.add_argument("-o", "--output", type=str, default=None, help="dataset file (default: <source>.arrow)")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="number of processes, each tracks a contiguous range of frames")
+    parser.add_argument("-m", "--mode", type=str, choices=["auto", "video", "static"], default="auto",
+                    help="MediaPipe video (tracking) or static-image mode, auto: static for image directories")
+    parser.add_argument("--complexity", type=int, choices=[0, 1], default=0, help="MediaPipe model_complexity")
+    parser.add_argument("--fps", type=float, default=30.0, help="frame rate of an image directory, used for the time stamps")
+    parser.add_argument("--flip", action="store_true", help="mirror the frames like the live tracker does for webcam footage")
+    parser.add_argument("--start", type=int, default=0)
+    parser.add_argument("--stop", type=int, default=None)
+    args = parser.parse_args()
+
+    count, fps = frame_count(args.source)
+    fps = fps or args.fps
+    static = args.mode == "static" or (args.mode == "auto" and os.path.isdir(args.source))
+    stop = count if args.stop is None else min(args.stop, count)
+    output = args.output or os.path.splitext(args.source.rstrip("/\\"))[0] + ".arrow"
+
+    n = max(1, min(args.workers, stop - args.start))
+    bounds = [args.start + (stop - args.start) * k // n for k in range(n + 1)]
+    jobs = [(args.source, a, b, fps, static, args.complexity, args.flip) for a, b in zip(bounds[:-1], bounds[1:])]
+    print(f"Tracking frames [{args.start}, {stop}) of {args.source} on {n} worker(s), {'static' if static else 'video'} mode")
+
+    t0 = time.perf_counter()
+    if n == 1:
+        results = [track_range(*jobs[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=n) as pool:
+            results = list(pool.map(track_range, *zip(*jobs)))
+    elapsed = time.perf_counter() - t0
+
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with pa.OSFile(output, "wb") as sink:
+        with pa.ipc.new_stream(sink, DATASET_SCHEMA) as writer:
+            for columns in results:  # chunks are contiguous and in order
+                if columns["t"]:
+                    writer.write_batch(pa.record_batch([columns[c] for c in DATASET_SCHEMA.names], schema=DATASET_SCHEMA))
+
+    rows = sum(len(c["t"]) for c in results)
+    print(f"{stop - args.start} frames in {elapsed:.1f}s ({(stop - args.start) / max(elapsed, 1e-9):.1f} fps), {rows} hand poses written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Record hand-pose streams (r_hand_pos, l_hand_pos, *_hand_quat, ...) to an Arrow IPC file.
+
+Every input of the node is recorded, whatever its name. Messages are buffered
+and appended as record batches to an Arrow IPC stream file, one row per message:
+
+    t      float64              seconds since the first recorded message
+    input  string               input id, replayed as the output of the same name
+    names  list<string>         field names of the struct ('r_tip1', ...), empty for plain arrays
+    values list<list<float64>>  one vector per field (or the plain array itself)
+
+The file can be read back with pose_replay.py or with pyarrow/pandas directly.
+"""
+
+import argparse
+import os
+import time
+
+import pyarrow as pa
+from dora import Node
+
+SCHEMA = pa.schema([
+    ("t", pa.float64()),
+    ("input", pa.string()),
+    ("names", pa.list_(pa.string())),
+    ("values", pa.list_(pa.list_(pa.float64()))),
+])
+
+
+def to_row(value):
+    """Arrow message -> (names, values). Structs of vectors are flattened field by field."""
+    if pa.types.is_struct(value.type):
+        fields = value.to_pylist()[0]
+        return list(fields), [list(v) for v in fields.values()]
+    return [], [value.to_pylist()]
+
+
+def to_message(names, values):
+    """(names, values) -> the Arrow message as it was sent."""
+    if names:
+        return pa.array([dict(zip(names, values))])
+    return pa.array(values[0])
+
+
+def read_recording(path):
+    """Load a whole recording as a pyarrow Table."""
+    with pa.OSFile(path, "rb") as f:
+        return pa.ipc.open_stream(f).read_all()
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-o", "--output", type=str, default=None,
+                    help="Arrow IPC file to write (default: recordings/poses_<date>.arrow)")
+    parser.add_argument("-b", "--batch-size", type=int, default=256,
+                    help="number of messages buffered before a record batch is appended")
+    args = parser.parse_args()
+
+    output = args.output
+    if output is None:
+        output = os.path.join("recordings", time.strftime("poses_%Y%m%d_%H%M%S.arrow"))
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+
+    node = Node()
+
+    columns = {name: [] for name in SCHEMA.names}
+    t0 = None
+    count = 0
+
+    sink = pa.OSFile(output, "wb")
+    writer = pa.ipc.new_stream(sink, SCHEMA)
+
+    def flush():
+        if columns["t"]:
+            writer.write_batch(pa.record_batch([columns[n] for n in SCHEMA.names], schema=SCHEMA))
+            sink.flush()
+            for col in columns.values():
+                col.clear()
+
+    try:
+        for event in node:
+
+            event_type = event["type"]
+
+            if event_type == "INPUT":
+                now = time.perf_counter()
+                if t0 is None:
+                    t0 = now
+                names, values = to_row(event["value"])
+                columns["t"].append(now - t0)
+                columns["input"].append(event["id"])
+                columns["names"].append(names)
+                columns["values"].append(values)
+                count += 1
+                if len(columns["t"]) >= args.batch_size:
+                    flush()
+
+            elif event_type == "ERROR":
+                raise RuntimeError(event["error"])
+    finally:
+        flush()
+        writer.close()
+        sink.close()
+        print(f"Recorded {count} messages to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Replay a recording of pose_recorder.py, deterministically and without a camera.
+
+Each recorded message is sent again on the output named after its input id
+(declare those outputs in the dataflow), at the original pace, N times faster
+(--speed N) or as fast as possible (--speed 0). The achieved message rate is
+printed at the end so the pipeline downstream can be benchmarked repeatably.
+"""
+
+import argparse
+import time
+
+from dora import Node
+
+from pose_recorder import read_recording, to_message
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--input", type=str, required=True, help="recording written by pose_recorder.py")
+    parser.add_argument("-s", "--speed", type=float, default=1.0,
+                    help="replay speed factor, 1=original timing, 0=as fast as possible")
+    parser.add_argument("-l", "--loop", type=int, default=1, help="number of times the recording is played")
+    parser.add_argument("--only", type=str, nargs="*", default=None, help="replay only these input ids")
+    args = parser.parse_args()
+
+    table = read_recording(args.input)
+    if args.only:
+        keep = [i for i, name in enumerate(table.column("input").to_pylist()) if name in args.only]
+        table = table.take(keep)
+    # messages are rebuilt once, the loop below only waits and sends
+    times = table.column("t").to_pylist()
+    outputs = table.column("input").to_pylist()
+    messages = [to_message(n, v) for n, v in zip(table.column("names").to_pylist(), table.column("values").to_pylist())]
+    print(f"Replaying {len(messages)} messages ({times[-1] if times else 0.0:.1f}s) x{args.loop} at speed {args.speed or 'max'}")
+
+    node = Node()
+
+    sent = 0
+    stop = False
+    t_start = time.perf_counter()
+    for _ in range(args.loop):
+        t0 = time.perf_counter()
+        for t, output, message in zip(times, outputs, messages):
+            if args.speed > 0:
+                # wait for the message's time while still listening to the dataflow
+                while True:
+                    delay = t / args.speed - (time.perf_counter() - t0)
+                    if delay <= 0:
+                        break
+                    event = node.next(timeout=delay)
+                    if event is not None and event["type"] == "STOP":
+                        stop = True
+                        break
+                if stop:
+                    break
+            node.send_output(output, message)
+            sent += 1
+        if stop:
+            break
+
+    elapsed = time.perf_counter() - t_start
+    print(f"Sent {sent} messages in {elapsed:.3f}s => {sent / max(elapsed, 1e-9):.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
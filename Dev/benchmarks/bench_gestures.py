@@ -0,0 +1,40 @@
+"""Gesture recognition per frame: pose embedding + nearest poses in the library + hysteresis."""
+
+import numpy as np
+
+from bench_tracker import synthetic_hands
+
+
+def synthetic_library(per_gesture=200, seed=0):
+    """A PoseLibrary with `per_gesture` jittered poses of every gesture, each gesture bending the fingers its own way."""
+    from gestures import GESTURES, PoseLibrary, pose_embedding
+
+    rng = np.random.default_rng(seed)
+    library = PoseLibrary()
+    bends = {}
+    for gesture in range(len(GESTURES)):
+        world, _, labels = synthetic_hands(per_gesture, seed + gesture)
+        bend = rng.normal(0.0, 0.03, (21, 3))
+        bend[0] = 0.0
+        bends[gesture] = bend
+        library.add(gesture, [pose_embedding(w + bend, l) for w, l in zip(world, labels)])
+    return library, bends
+
+
+def benchmarks():
+    from common import Benchmark
+    from gestures import HandGestures
+
+    library, bends = synthetic_library()
+    # the synthetic hands are jittered more than tracked hands, widen the distances accordingly
+    gestures = HandGestures(library, enter=2.0, exit=2.5)
+    world, _, labels = synthetic_hands(1000, seed=100)
+    # a gesture held for 30 frames, then the next one
+    frames = [{labels[i]: world[i] + bends[(i // 30) % len(bends)]} for i in range(len(world))]
+
+    def recognize():
+        for hands in frames:
+            gestures.update(hands)
+
+    yield Benchmark("gestures.recognize", recognize, number=2, items=len(frames), unit="frame")
+    yield Benchmark("gestures.library_query", lambda: library.query(library.embeddings[7]), number=2000, unit="query")
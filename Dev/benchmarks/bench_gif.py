@@ -0,0 +1,53 @@
+"""video_to_gif on a generated clip: frame sampling and whole conversions."""
+
+import atexit
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+
+def make_clip(path, frames=300, width=640, height=360, fps=30):
+    """Mostly static scene with sensor noise and one moving blob, like the demo footage."""
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[0:height, 0:width]
+    background = np.stack([xx * 255.0 / width, yy * 255.0 / height, np.full(xx.shape, 90.0)], -1)
+    cv2.rectangle(background, (width // 2, height // 8), (3 * width // 4, height // 2), (200, 40, 40), -1)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for i in range(frames):
+        frame = background.copy()
+        center = (width // 4 + int(width / 8 * np.sin(i / 15.0)), height // 2)
+        cv2.ellipse(frame, center, (width // 20, height // 6), i * 2, 0, 360, (180, 160, 140), -1)
+        frame += rng.normal(0.0, 2.0, frame.shape)
+        writer.write(np.clip(frame, 0, 255).astype(np.uint8))
+    writer.release()
+
+
+def benchmarks():
+    from common import Benchmark
+    import video_to_gif as v
+
+    # run.py collects the benchmarks before running them: the folder lives until exit
+    folder = tempfile.TemporaryDirectory(prefix="bench_gif_")
+    atexit.register(folder.cleanup)
+    folder = folder.name
+    clip = os.path.join(folder, "clip.mp4")
+    gif = os.path.join(folder, "clip.gif")
+    make_clip(clip)
+
+    for method in ["seek", "sequential"]:
+        def sample(method=method):
+            cap = cv2.VideoCapture(clip)
+            indices = v.sample_indices(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 60)
+            for _ in v.iter_sampled_frames(cap, indices, method):
+                pass
+            cap.release()
+
+        yield Benchmark(f"gif.sample_{method}", sample, number=1, items=60, unit="frame")
+
+    for palette, sampling in [("adaptive", "uniform"), ("global", "uniform"), ("global", "motion")]:
+        def convert(palette=palette, sampling=sampling):
+            v.video_to_gif(clip, gif, target_frames=60, max_width=320, duration=60, palette=palette, sampling=sampling)
+
+        yield Benchmark(f"gif.convert_{palette}_{sampling}", convert, number=1, items=60, unit="frame")
@@ -0,0 +1,77 @@
+"""Simulation client tick without viewer nor dataflow: targets -> IK -> motor angles."""
+
+import numpy as np
+import pyarrow as pa
+
+DT = 0.002  # the simulation tick is 500 Hz
+
+
+def make_client(mode, ik="full"):
+    from mj_mink_right import Client
+
+    client = Client(mode, ik, viewer=False)
+    client.reset()
+    return client
+
+
+def benchmarks():
+    from common import Benchmark
+    from mj_batch_ik import quat_mul
+
+    for mode, ik in [("pos", "full"), ("quat", "full"), ("pos", "finger"), ("quat", "finger")]:
+        client = make_client(mode, ik)
+        start_pos = client.data.mocap_pos.copy()
+        start_quat = client.data.mocap_quat.copy()
+        state = {"t": 0.0}
+
+        def tick(client=client, mode=mode, start_pos=start_pos, start_quat=start_quat, state=state):
+            # targets moving like a slow open/close, so every tick has work to do
+            state["t"] += DT
+            s = np.sin(2.0 * np.pi * state["t"])
+            if mode == "pos":
+                client.data.mocap_pos[:] = start_pos + 0.01 * s
+            else:
+                half = 0.5 * np.radians(20.0) * s  # rotation about y
+                quat_mul(client.data.mocap_quat, np.array([np.cos(half), 0.0, np.sin(half), 0.0]), start_quat)
+            client.ik_step(DT)
+            client.read_motors()
+
+        suffix = "" if ik == "full" else f"_{ik}"
+        yield Benchmark(f"ik.client_tick_{mode}{suffix}", tick, number=200, unit="tick")
+
+    client = make_client("angle")
+    hands = [pa.array([{f"r_tip{f + 1}": [a, 0.1 * a] for f in range(4)}]) for a in np.linspace(0.0, 1.5, 50)]
+    state = {"i": 0}
+
+    def angle_tick():
+        state["i"] = (state["i"] + 1) % len(hands)
+        client.write_joint_angle(hands[state["i"]])
+        client.read_motors()
+
+    yield Benchmark("ik.client_tick_angle", angle_tick, number=500, unit="tick")
+
+    from mj_batch_ik import BatchIK
+
+    batch = BatchIK(16, "right", "pos")
+    targets = batch.tip_positions()
+
+    def batch_step():
+        batch.set_targets(targets + 0.005)
+        batch.step()
+
+    yield Benchmark("ik.batch_step_16_hands", batch_step, number=50, items=16, unit="hand")
+
+    # one-shot retargeting distilled from the IK (retarget.py): hand_pos message -> motor angles
+    from retarget import Retargeter, collect_pairs, message_tips, motor_ranges, synthetic_tips, tips_message
+
+    teacher = make_client("pos", "finger")
+    tips, motors = collect_pairs(teacher, "r", synthetic_tips(teacher, "r", "right", 500))
+    messages = [tips_message(t, "r") for t in tips[:100]]
+    for kind in ("ridge", "mlp"):
+        model = Retargeter.fit(tips, motors, "right", *motor_ranges(teacher), kind=kind, epochs=500)
+
+        def retarget(model=model):
+            for message in messages:
+                model.predict(message_tips(message, "r"))
+
+        yield Benchmark(f"ik.retarget_{kind}", retarget, number=5, items=len(messages), unit="message")
@@ -0,0 +1,85 @@
+"""Gesture command throughput of FixedAction/Python/AmazingHand_Demo_Optimized against a fake servo bus."""
+
+import importlib
+import sys
+import types
+
+
+class FakeController:
+    """Stands for rustypot.Scs0009PyController, counts the writes instead of sending them."""
+
+    def __init__(self, serial_port=None, baudrate=None, timeout=None):
+        self.writes = 0
+        self.goal_position = {}
+
+    def write_torque_enable(self, motor_id, value):
+        self.writes += 1
+
+    def write_goal_speed(self, motor_id, speed):
+        self.writes += 1
+
+    def write_goal_position(self, motor_id, position):
+        self.writes += 1
+        self.goal_position[motor_id] = position
+
+
+def load_demo():
+    """Import the demo module with the fake controller, whether rustypot is installed or not."""
+    try:
+        importlib.import_module("rustypot")
+    except ImportError:
+        sys.modules["rustypot"] = types.SimpleNamespace(Scs0009PyController=FakeController)
+    demo = importlib.import_module("AmazingHand_Demo_Optimized")
+    demo.Scs0009PyController = FakeController
+    return demo
+
+
+GESTURES = ["OpenHand", "CloseHand", "SpreadHand", "ClenchHand", "Index_Pointing", "Perfect", "Victory", "Pinched"]
+
+
+def benchmarks():
+    from common import Benchmark
+
+    demo = load_demo()
+    hand = demo.AmazingHand(port="fake")
+
+    def cycle():
+        for gesture in GESTURES:
+            getattr(hand, gesture)()
+
+    # as deployed, including the pauses between the bus writes
+    yield Benchmark("servo.gesture_cycle", cycle, number=2, items=len(GESTURES), unit="gesture")
+
+    # python overhead only, the pauses are skipped
+    real_time = demo.time
+    fast_time = types.SimpleNamespace(sleep=lambda s: None, time=real_time.time)
+
+    def cycle_no_sleep():
+        demo.time = fast_time
+        try:
+            cycle()
+        finally:
+            demo.time = real_time
+
+    yield Benchmark("servo.gesture_cycle_no_sleep", cycle_no_sleep, number=200, items=len(GESTURES), unit="gesture")
+
+    # simulation joint messages -> servo goals, both hands of 2hands.toml, through the writer thread
+    import os
+
+    import numpy as np
+    from common import DEV_PATH
+    from hand_config import HandConfig
+    from servo_bridge import DryRunController, ServoBridge
+
+    config = HandConfig.load(os.path.join(DEV_PATH, "AHControl/config/2hands.toml"), "fake")
+    bridge = ServoBridge(config, {"fake": DryRunController()})
+    bridge.start(settle=0.0)
+    joints = np.linspace(-0.5, 0.5, 8)
+    metadata = [{f"{side}_finger{f + 1}": [2 * f, 2 * f + 1] for f in range(4)} for side in "rl"]
+
+    def bridge_messages():
+        for i in range(100):
+            bridge.handle(joints, metadata[i % 2])
+
+    yield Benchmark("servo.bridge_message", bridge_messages, number=20, items=100, unit="message")
+
@@ -0,0 +1,107 @@
+"""Tracker post-processing: landmarks -> fingertip positions in the hand frame -> arrow message."""
+
+import atexit
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pyarrow as pa
+
+from hand_frame import landmarks_to_array, tip_positions
+
+
+def synthetic_hands(n, seed=0):
+    """n random but plausible hands: (world (n, 21, 3), normalized (n, 21, 3), labels)."""
+    rng = np.random.default_rng(seed)
+    # an open hand template around the wrist, jittered
+    template = np.zeros((21, 3))
+    for finger in range(5):
+        angle = np.radians(-40 + 20 * finger)
+        for joint in range(4):
+            r = 0.03 + 0.025 * joint
+            template[1 + 4 * finger + joint] = [r * np.sin(angle), -r * np.cos(angle), 0.0]
+    world = template + rng.normal(0.0, 0.005, (n, 21, 3))
+    norm = 0.5 + 2.0 * template + rng.normal(0.0, 0.01, (n, 21, 3))
+    labels = rng.choice(["Right", "Left"], n)
+    return world, norm, labels
+
+
+def as_landmark_list(points):
+    """(21, 3) array -> object shaped like a MediaPipe landmark list."""
+    return SimpleNamespace(landmark=[SimpleNamespace(x=x, y=y, z=z) for x, y, z in points])
+
+
+def benchmarks():
+    from common import Benchmark
+
+    world, norm, labels = synthetic_hands(1000)
+    world_lm = [as_landmark_list(w) for w in world]
+    norm_lm = [as_landmark_list(n) for n in norm]
+    n = len(world)
+
+    def tips():
+        for i in range(n):
+            tip_positions(world[i], norm[i], labels[i])
+
+    def postprocess():
+        # what process_img does per detected hand, MediaPipe inference excluded
+        for i in range(n):
+            tip1, tip2, tip3, tip4 = tip_positions(landmarks_to_array(world_lm[i]), landmarks_to_array(norm_lm[i]), labels[i])
+            pa.array([{'r_tip1': tip1, 'r_tip2': tip2, 'r_tip3': tip3, 'r_tip4': tip4}])
+
+    yield Benchmark("tracker.tip_positions", tips, number=5, items=n, unit="hand")
+    yield Benchmark("tracker.postprocess", postprocess, number=2, items=n, unit="hand")
+
+    # passing a 640x480 camera frame to another node: arrow message (serialized, as dora
+    # copies it into its message) vs shared memory ring (only the sequence number is sent)
+    from frame_ring import FrameRing
+
+    frame = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    ring = FrameRing.create(f"bench_frames_{os.getpid()}", frame.shape)
+    atexit.register(ring.close)
+
+    def arrow_frame():
+        batch = pa.record_batch([pa.array(frame.ravel())], names=["frame"])
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        received = pa.ipc.open_stream(sink.getvalue()).read_next_batch()
+        received.column(0).to_numpy().reshape(frame.shape)
+
+    def ring_frame():
+        seq = pa.array([ring.write(frame)], type=pa.uint64())
+        ring.get(seq[0].as_py())
+
+    yield Benchmark("tracker.frame_arrow", arrow_frame, number=50, unit="frame")
+    yield Benchmark("tracker.frame_ring", ring_frame, number=50, unit="frame")
+    yield Benchmark("tracker.frame_ring_read", lambda: ring.get(ring.latest), number=1000, unit="frame")
+
+    # per-frame image path of the tracker node before MediaPipe: capture, selfie flip,
+    # RGB for the inference, BGR image to draw on; new arrays every frame vs FrameBuffers
+    import cv2
+    from frame_buffers import FrameBuffers
+
+    class Camera:
+        """cv2.VideoCapture.read() semantics: fills the given image, or allocates one."""
+
+        def read(self, image=None):
+            if image is None or image.shape != frame.shape:
+                return True, frame.copy()
+            np.copyto(image, frame)
+            return True, image
+
+    camera = Camera()
+    buffers = FrameBuffers()
+
+    def image_alloc():
+        _, image = camera.read()
+        image = cv2.flip(image, 1)
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+    def image_buffers():
+        _, image = buffers.read(camera)
+        buffers.rgb(buffers.flip(image))  # drawn in place
+
+    yield Benchmark("tracker.image_alloc", image_alloc, number=200, unit="frame")
+    yield Benchmark("tracker.image_buffers", image_buffers, number=200, unit="frame")
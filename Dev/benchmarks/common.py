@@ -0,0 +1,62 @@
+"""Timing helpers shared by the benchmark modules."""
+
+import os
+import statistics
+import sys
+import time
+
+try:
+    import resource  # page faults per call, not available on Windows
+except ImportError:
+    resource = None
+
+DEV_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the nodes are scripts, not packages: make their folders importable
+for folder in ["", "HandTracking/Src", "AHSimulation/Src", "AHSimulation/examples", "FixedAction/Python", "AHControl/python"]:
+    path = os.path.join(DEV_PATH, folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark group when an optional dependency is missing."""
+
+
+def minor_faults():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_minflt if resource is not None else 0
+
+
+class Benchmark:
+    """A function timed `number` times per repeat, `items` operations per call (for the throughput)."""
+
+    def __init__(self, name, fn, number=100, items=1, unit="op"):
+        self.name = name
+        self.fn = fn
+        self.number = number
+        self.items = items
+        self.unit = unit
+
+    def run(self, repeat=5, scale=1.0):
+        number = max(1, int(self.number * scale))
+        self.fn()  # warm up
+        times = []
+        faults = minor_faults()
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for _ in range(number):
+                self.fn()
+            times.append((time.perf_counter() - t0) / number)
+        faults = minor_faults() - faults
+        median = statistics.median(times)
+        return {
+            "median_s": median,
+            "min_s": min(times),
+            "stdev_s": statistics.stdev(times) if len(times) > 1 else 0.0,
+            "per_s": self.items / median,
+            "unit": self.unit,
+            "number": number,
+            "repeat": repeat,
+            # memory paged in again by large allocations freed back to the system, per call
+            "page_faults": faults / (number * repeat) if resource is not None else None,
+        }
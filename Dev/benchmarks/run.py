@@ -0,0 +1,130 @@
+"""Run the benchmarks, store the results as JSON and compare them with a baseline.
+
+    python benchmarks/run.py                                  # run all, write benchmarks/results/latest.json
+    python benchmarks/run.py -k ik gif                        # only the benchmarks whose name contains "ik" or "gif"
+    python benchmarks/run.py --save-baseline                  # also store the results as the baseline
+    python benchmarks/run.py --baseline benchmarks/results/baseline.json --tolerance 0.2
+
+A benchmark regresses when its median time exceeds the baseline median by more
+than the tolerance; the exit code is then 1. Baselines only make sense on the
+machine they were recorded on.
+"""
+
+import argparse
+import contextlib
+import datetime
+import importlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import traceback
+
+from common import DEV_PATH, SkipBenchmark
+
+BENCH_PATH = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = os.path.join(BENCH_PATH, "results")
+MODULES = ["bench_tracker", "bench_gestures", "bench_ik", "bench_servo", "bench_gif"]
+
+
+def machine_info():
+    import numpy as np
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=DEV_PATH,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run(keywords, repeat, scale):
+    results, skipped = {}, {}
+    for module_name in MODULES:
+        try:
+            module = importlib.import_module(module_name)
+            with contextlib.redirect_stdout(io.StringIO()):
+                group = list(module.benchmarks())
+            for bench in group:
+                if keywords and not any(k in bench.name for k in keywords):
+                    continue
+                # the code under test prints progress, keep the report readable
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = bench.run(repeat, scale)
+                results[bench.name] = result
+                faults = f"  {result['page_faults']:8.1f} faults/call" if result["page_faults"] is not None else ""
+                print(f"{bench.name:<36} {result['median_s'] * 1e3:10.3f} ms  {result['per_s']:12.1f} {bench.unit}/s{faults}")
+        except (SkipBenchmark, ImportError) as e:
+            skipped[module_name] = f"{type(e).__name__}: {e}"
+            print(f"{module_name:<36} skipped ({skipped[module_name]})")
+        except Exception:
+            skipped[module_name] = traceback.format_exc()
+            print(f"{module_name:<36} failed\n{skipped[module_name]}")
+    return results, skipped
+
+
+def compare(results, baseline, tolerance):
+    """Print the ratios to the baseline, return the names of the regressed benchmarks."""
+    regressions = []
+    print(f"\n{'benchmark':<36} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<36} {'-':>10} {result['median_s'] * 1e3:9.3f}m {'new':>7}")
+            continue
+        ratio = result["median_s"] / baseline[name]["median_s"]
+        flag = ""
+        if ratio > 1.0 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1.0 - tolerance:
+            flag = "  faster"
+        print(f"{name:<36} {baseline[name]['median_s'] * 1e3:9.3f}m {result['median_s'] * 1e3:9.3f}m {ratio:7.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AmazingHand benchmarks")
+    parser.add_argument("-k", "--keyword", nargs="*", default=None, help="run only benchmarks whose name contains one of these")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="number of timed repeats per benchmark")
+    parser.add_argument("-s", "--scale", type=float, default=1.0, help="scale the number of calls per repeat (e.g. 0.1 for a quick run)")
+    parser.add_argument("-o", "--output", default=os.path.join(RESULTS_PATH, "latest.json"))
+    parser.add_argument("-b", "--baseline", default=os.path.join(RESULTS_PATH, "baseline.json"))
+    parser.add_argument("-t", "--tolerance", type=float, default=0.25, help="allowed relative slowdown before a regression is reported")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args()
+
+    results, skipped = run(args.keyword, args.repeat, args.scale)
+    report = {"machine": machine_info(), "results": results, "skipped": skipped}
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"\nresults written to {args.output}")
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.tolerance:.0%}: {', '.join(regressions)}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,144 @@
 import cv2
+import numpy as np
 import os
+import sys
+import io
+import json
 import glob
+import hashlib
+import argparse
+import contextlib
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from PIL import Image
 import math
-import shutil  # 新增：用于清理文件夹
+import time
 
-def extract_frames_smart(video_path, output_folder, target_frames=150, max_width=480):
+def sample_indices(total_frames, target_frames):
+    """
+    计算要抽取的帧序号
+    
+    如果视频帧数少于目标帧数，则全取；否则按比例 (step = total/target) 跳过。
+    """
+    if total_frames <= target_frames:
+        step = 1
+    else:
+        step = total_frames / target_frames
+    indices = []
+    while int(len(indices) * step) < total_frames:
+        indices.append(int(len(indices) * step))
+    return indices
+
+
+def measure_seek_cost(cap, probes=3):
+    """
+    测量一次跳转 (set + read) 相当于多少次顺序 grab()
+    
+    H.264/HEVC 等编码跳转时需要从前一个关键帧开始解码，所以跳转的代价约为 GOP/2 次解码。
+    OpenCV 不提供 GOP 大小，这里直接在视频中间实测，测完后回到第 0 帧。
+    """
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    t0 = time.perf_counter()
+    grabbed = 0
+    for _ in range(8 * probes):
+        if not cap.grab():
+            break
+        grabbed += 1
+    t_grab = (time.perf_counter() - t0) / max(grabbed, 1)
+
+    t0 = time.perf_counter()
+    for k in range(probes):
+        # 避开刚好落在关键帧上的位置
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(total_frames * (k + 1) / (probes + 1)) + k * 7 + 3)
+        cap.read()
+    t_seek = (time.perf_counter() - t0) / probes
+
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    return t_seek / max(t_grab, 1e-9)
+
+
+def iter_sampled_frames(cap, indices, method="auto", gop=None):
+    """
+    按升序帧序号 indices 逐个返回 (序号, 图像)
+    
+    - "seek": 每帧先 set(CAP_PROP_POS_FRAMES) 再 read()，步长很大时更快
+    - "sequential": 顺序 grab() 所有帧，只对选中的帧 retrieve()（解码为图像），
+      避免了每次跳转都从关键帧重新解码
+    - "auto": 步长 (每两个抽取帧之间的帧数) 小于一次跳转的代价时顺序读取，否则跳转。
+      跳转代价按 gop/2 估计；未给出 gop 时用 measure_seek_cost 实测
     """
-    算法1：视频智能抽帧
+    if not indices:
+        return
+    if method == "auto":
+        stride = (indices[-1] - indices[0]) / max(len(indices) - 1, 1)
+        seek_cost = gop / 2.0 + 1.0 if gop else measure_seek_cost(cap)
+        method = "sequential" if stride <= seek_cost else "seek"
+
+    if method == "seek":
+        for index in indices:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield index, frame
+        return
+
+    if indices[0] > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    pos = 0
+    for index in indices:
+        while pos < index:
+            if not cap.grab():
+                return
+            pos += 1
+        if not cap.grab():
+            return
+        pos += 1
+        ret, frame = cap.retrieve()
+        if not ret:
+            return
+        yield index, frame
+
+
+def benchmark_sampling(video_path, target_frames=150):
+    """
+    对比两种抽帧方式在某个视频上的耗时，并给出 auto 的选择
+    
+    例: python video_to_gif.py demo.mp4 --benchmark
+    """
+    results = {}
+    for method in ("seek", "sequential"):
+        cap = cv2.VideoCapture(video_path)
+        indices = sample_indices(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), target_frames)
+        t0 = time.perf_counter()
+        count = sum(1 for _ in iter_sampled_frames(cap, indices, method))
+        results[method] = time.perf_counter() - t0
+        cap.release()
+        print(f"{method:>10}: {count} 帧, {results[method]:.2f} s")
+
+    cap = cv2.VideoCapture(video_path)
+    seek_cost = measure_seek_cost(cap)
+    cap.release()
+    stride = (indices[-1] - indices[0]) / max(len(indices) - 1, 1)
+    chosen = "sequential" if stride <= seek_cost else "seek"
+    print(f"步长 {stride:.1f} 帧, 一次跳转约等于 {seek_cost:.1f} 次 grab => auto 选择 {chosen}, "
+          f"顺序读取加速 {results['seek'] / results['sequential']:.2f}x")
+    return results
+
+
+def iter_video_frames(video_path, target_frames=150, max_width=480):
+    """
+    算法1：视频智能抽帧（流式）
     
     为了防止GIF间断性过大（跳跃感太强）同时控制文件大小：
     1. 根据视频总时长和想要生成的GIF总帧数（target_frames），动态计算抽取间隔。
     2. 在抽取过程中直接进行画面缩放（max_width），大幅减少内存占用和最终体积。
     
+    逐帧返回缩放后的 BGR 图像，不写入磁盘，内存中只保留当前帧。
+    
     参数:
     - video_path: 视频文件路径
-    - output_folder: 图片保存文件夹
     - target_frames: 期望GIF包含的总帧数（建议100-200之间，太高文件会很大）
     - max_width: 图片最大宽度（3D打印主要看轮廓，建议320-480px，越小体积越小）
     """
@@ -26,60 +149,316 @@ def extract_frames_smart(video_path, output_folder, target_frames=150, max_width
         print(f"无法打开视频: {video_path}")
         return
 
-    # 获取视频信息
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
+    try:
+        # 获取视频信息
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        
+        print(f"视频总帧数: {total_frames}, FPS: {fps}")
+
+        indices = sample_indices(total_frames, target_frames)
+        print(f"开始抽帧... 预计抽取 {len(indices)} 张图片")
+
+        for _, frame in iter_sampled_frames(cap, indices):
+            # 2. 图像缩放 (控制体积的关键)
+            yield resize_frame(frame, max_width)
+    finally:
+        cap.release()
+
+
+def resize_frame(frame, max_width):
+    """按 max_width 等比例缩放"""
+    h, w = frame.shape[:2]
+    scale = max_width / float(w)
+    new_h = int(h * scale)
     
-    print(f"视频总帧数: {total_frames}, FPS: {fps}")
+    # 使用插值算法进行缩放
+    return cv2.resize(frame, (max_width, new_h), interpolation=cv2.INTER_AREA)
 
-    # 2. 计算步长 (Step)
-    # 如果视频帧数少于目标帧数，则全取；否则按比例跳过
-    if total_frames <= target_frames:
-        step = 1
-    else:
-        step = total_frames / target_frames
 
+def select_motion_frames(video_path, target_frames=150, max_width=480, duration=100, oversample=8, time_weight=0.001,
+                         motion_threshold=4.0):
+    """
+    算法1b：按运动量自适应抽帧（单次顺序解码）
+    
+    均匀抽帧在长时间静止的片段上浪费帧数，手指快速运动时又会跳帧。这里：
+    1. 顺序解码，每隔 stride 帧取一个候选帧（候选数约为 oversample * target_frames），
+       运动量为缩小到 64 像素宽的灰度图中，与上一个候选帧相差超过 motion_threshold 的像素比例
+       （缩小后相机噪声基本被平均掉），再加上 time_weight，使静止片段也按时长分到少量帧；
+    2. 只保留 target_frames 个帧：超出时删掉"删去后合并片段运动量最小"的帧，
+       它覆盖的时长并入前一帧，因此内存中最多只有 target_frames + 1 张缩放后的图；
+    3. 每帧的停留时间与它覆盖的视频时长成正比，GIF 总时长与均匀抽帧时相同 (帧数 * duration)。
+    
+    返回 (frames, durations)：缩放后的 BGR 图像列表和每帧的停留时间(毫秒)。
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"无法打开视频: {video_path}")
+        return [], []
+
+    frames, weights, spans = [], [], []
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        print(f"视频总帧数: {total_frames}, FPS: {cap.get(cv2.CAP_PROP_FPS)}")
+        stride = max(1, total_frames // (target_frames * oversample))
+        print(f"开始按运动量抽帧... 每 {stride} 帧一个候选帧，保留 {target_frames} 张图片")
+
+        previous = None
+        for _, frame in iter_sampled_frames(cap, list(range(0, total_frames, stride)), "sequential"):
+            thumb = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (64, max(1, 64 * frame.shape[0] // frame.shape[1])),
+                               interpolation=cv2.INTER_AREA).astype(np.float32)
+            # weights[k]: 从前一个保留帧到第 k 帧的运动量
+            if previous is None:
+                weights.append(0.0)
+            else:
+                weights.append(float((np.abs(thumb - previous) > motion_threshold).mean()) + time_weight)
+            spans.append(stride)
+            frames.append(resize_frame(frame, max_width))
+            previous = thumb
+
+            # 第一帧和最新的一帧不删除，删去 k 后 (k-1, k+1) 之间的运动量为 weights[k] + weights[k+1]
+            if len(frames) > target_frames + 1:
+                merged = np.add(weights[1:-1], weights[2:])
+                k = int(merged.argmin()) + 1
+                weights[k + 1] += weights[k]
+                spans[k - 1] += spans[k]
+                del frames[k], weights[k], spans[k]
+    finally:
+        cap.release()
+
+    if len(frames) > target_frames:
+        # 最后一帧也可以删除
+        merged = np.add(weights[1:], weights[2:] + [0.0])
+        k = int(merged.argmin()) + 1
+        if k + 1 < len(weights):
+            weights[k + 1] += weights[k]
+        spans[k - 1] += spans[k]
+        del frames[k], weights[k], spans[k]
+
+    # 按覆盖的视频时长分配停留时间，GIF 的时间精度为 10ms，且很多播放器会把小于 20ms 的帧放慢
+    spans = np.array(spans, dtype=np.float64)
+    durations = spans / max(spans.sum(), 1.0) * duration * len(frames)
+    durations = np.maximum(np.round(durations / 10.0) * 10.0, 20).astype(int).tolist()
+    return frames, durations
+
+
+def dump_frames(frames, output_folder):
+    """
+    调试用：把经过的每一帧另存为 JPEG (00000.jpg, 00001.jpg, ...)，图像原样向后传递
+    """
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
-        
-    print(f"开始抽帧... 预计抽取 {int(total_frames/step)} 张图片")
+    for saved_count, frame in enumerate(frames):
+        # 文件名使用前导零填充，方便排序
+        cv2.imwrite(os.path.join(output_folder, f"{saved_count:05d}.jpg"), frame)
+        yield frame
 
-    count = 0
-    saved_count = 0
+
+def quantize_frames(frames):
+    """
+    BGR 图像 -> 256 色自适应调色板的 PIL 图像 (GIF 使用的 'P' 模式)
     
-    while True:
-        # 设置读取位置，避免逐帧读取的性能浪费
-        # 注意：set操作在某些编码格式下可能稍慢，但在长视频跳跃读取时效率更高
-        current_pos = int(count * step)
-        if current_pos >= total_frames:
-            break
-            
-        cap.set(cv2.CAP_PROP_POS_FRAMES, current_pos)
-        ret, frame = cap.read()
+    直接从解码后的图像量化，没有 JPEG 压缩伪影，调色板质量更好。
+    """
+    for frame in frames:
+        yield Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)).convert('P', palette=Image.ADAPTIVE, colors=256)
 
-        if not ret:
-            break
 
-        # 3. 图像缩放 (控制体积的关键)
-        h, w = frame.shape[:2]
-        scale = max_width / float(w)
-        new_h = int(h * scale)
-        
-        # 使用插值算法进行缩放
-        resized_frame = cv2.resize(frame, (max_width, new_h), interpolation=cv2.INTER_AREA)
+# 8x8 Bayer 矩阵，归一化到 [-0.5, 0.5)，用于有序抖动
+BAYER_8 = (np.array([
+    [0, 32, 8, 40, 2, 34, 10, 42],
+    [48, 16, 56, 24, 50, 18, 58, 26],
+    [12, 44, 4, 36, 14, 46, 6, 38],
+    [60, 28, 52, 20, 62, 30, 54, 22],
+    [3, 35, 11, 43, 1, 33, 9, 41],
+    [51, 19, 59, 27, 49, 17, 57, 25],
+    [15, 47, 7, 39, 13, 45, 5, 37],
+    [63, 31, 55, 23, 61, 29, 53, 21],
+], dtype=np.float32) + 0.5) / 64.0 - 0.5
 
-        # 保存图片，文件名使用前导零填充，方便排序 (0001.jpg, 0002.jpg)
-        filename = os.path.join(output_folder, f"{saved_count:05d}.jpg")
-        cv2.imwrite(filename, resized_frame)
-        
+# 全局调色板模式下保留给"与上一帧相同"像素的透明色索引
+TRANSPARENT_INDEX = 255
+
+
+def build_global_palette(frames, colors=255, sample_frames=16):
+    """
+    从部分帧中取样（隔帧、隔像素）生成一个所有帧共用的调色板
+    
+    返回 (colors, 3) 的 RGB 调色板；frames 为 BGR 图像列表。
+    """
+    step = max(1, len(frames) // sample_frames)
+    sample = np.concatenate([f[::2, ::2].reshape(-1, 3) for f in frames[::step]])
+    img = Image.fromarray(np.ascontiguousarray(sample[:, ::-1]).reshape(1, -1, 3))
+    palette = img.quantize(colors, method=Image.Quantize.MEDIANCUT).getpalette()[:3 * colors]
+    return np.array(palette, dtype=np.uint8).reshape(-1, 3)
+
+
+class PaletteMapper:
+    """
+    RGB 图像 -> 调色板索引，带有序抖动，完全向量化
+    
+    预先计算一个 64x64x64 的查找表（每个颜色通道取高 6 位）存放最近的调色板颜色，
+    每帧只需要一次加抖动噪声和一次查表。抖动幅度取调色板颜色之间的典型间距。
+    """
+
+    def __init__(self, palette, bits=6):
+        self.shift = 8 - bits
+        n = 1 << bits
+        centers = (np.arange(n, dtype=np.float32) + 0.5) * (1 << self.shift)
+        grid = np.stack(np.meshgrid(centers, centers, centers, indexing='ij'), -1).reshape(-1, 3)
+        pal = palette.astype(np.float32)
+
+        # |g - p|^2 = |g|^2 - 2 g.p + |p|^2，|g|^2 对 argmin 没有影响
+        pal_sq = (pal ** 2).sum(-1)
+        lut = np.empty(len(grid), dtype=np.uint8)
+        chunk = 1 << 15
+        for s in range(0, len(grid), chunk):
+            lut[s:s + chunk] = (pal_sq - 2.0 * grid[s:s + chunk] @ pal.T).argmin(1)
+        self.lut = lut.reshape(n, n, n)
+
+        dist = ((pal[:, None] - pal[None]) ** 2).sum(-1)
+        np.fill_diagonal(dist, np.inf)
+        self.spread = float(np.median(np.sqrt(dist.min(1))))
+        self._noise = None
+
+    def __call__(self, rgb):
+        h, w = rgb.shape[:2]
+        if self._noise is None or self._noise.shape[:2] != (h, w):
+            self._noise = (np.tile(BAYER_8, (h // 8 + 1, w // 8 + 1))[:h, :w] * self.spread)[..., None]
+        q = np.clip(rgb + self._noise, 0, 255).astype(np.uint8) >> self.shift
+        return self.lut[q[..., 0], q[..., 1], q[..., 2]]
+
+
+def global_palette_frames(frames, threshold=12.0, colors=255):
+    """
+    全局调色板 + 帧间差分：BGR 图像列表 -> PIL 'P' 图像
+    
+    1. 所有帧共用一个调色板（build_global_palette），不再逐帧生成调色板，也没有颜色闪烁；
+    2. 每帧用 PaletteMapper 做有序抖动；
+    3. 与上一次显示的内容相比变化不超过 threshold 的像素（相机噪声等）写为透明色，
+       GIF 编码器只保存变化区域的矩形，透明像素的压缩率也很高。
+    配合 save_gif(..., transparency=TRANSPARENT_INDEX, disposal=1) 使用。
+    """
+    if not frames:
+        return
+    palette = build_global_palette(frames, colors)
+    mapper = PaletteMapper(palette)
+    gif_palette = np.zeros((256, 3), dtype=np.uint8)
+    gif_palette[:len(palette)] = palette
+    gif_palette = gif_palette.tobytes()
+
+    shown = None  # 当前显示的每个像素对应的原始颜色
+    for frame in frames:
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB).astype(np.float32)
+        index = mapper(rgb)
+        if shown is None:
+            shown = rgb
+        else:
+            changed = np.abs(rgb - shown).max(-1) > threshold
+            shown[changed] = rgb[changed]
+            index[~changed] = TRANSPARENT_INDEX
+        img = Image.fromarray(index, 'P')
+        img.putpalette(gif_palette)
+        yield img
+
+
+def save_gif(images, output_gif_path, duration=100, loop=0, **options):
+    """
+    把 PIL 图像序列（可以是生成器）编码为 GIF
+    
+    options 直接传给 PIL，默认 optimize=True
+    
+    append_images 直接接收生成器，解码/缩放/量化与编码交替进行，
+    原始视频帧不会全部留在内存里（编码器只保留 1 字节/像素 的调色板帧）。
+    返回写入的帧数，没有图像时返回 0。
+    """
+    images = iter(images)
+    first = next(images, None)
+    if first is None:
+        return 0
+
+    count = 1
+
+    def rest():
+        nonlocal count
+        for img in images:
+            count += 1
+            yield img
+
+    # save_all=True: 保存所有帧
+    # append_images: 后续帧
+    # optimize=True: 尝试压缩调色板，减小体积
+    # duration: 每帧持续时间
+    # loop: 0为无限循环
+    first.save(
+        output_gif_path,
+        format='GIF',
+        save_all=True,
+        append_images=rest(),
+        duration=duration,
+        loop=loop,
+        **{"optimize": True, **options}
+    )
+    return count
+
+
+def encode_gif(frames, output_gif_path, duration=100, loop=0, palette="global", threshold=12.0):
+    """
+    把 BGR 图像序列编码为 GIF
+    
+    duration 为每帧停留时间(毫秒)，也可以是与帧一一对应的列表
+    
+    - palette="global": 全局调色板 + 抖动 + 帧间差分（见 global_palette_frames），需要先缓存所有帧
+      （数量受 target_frames 限制，都是缩放后的小图）
+    - palette="adaptive": 每帧单独的自适应调色板，完全流式
+    """
+    if palette == "global":
+        return save_gif(global_palette_frames(list(frames), threshold), output_gif_path, duration, loop,
+                        optimize=False, transparency=TRANSPARENT_INDEX, disposal=1)
+    return save_gif(quantize_frames(frames), output_gif_path, duration, loop)
+
+
+def video_to_gif(video_path, output_gif_path, target_frames=150, max_width=480, duration=100, loop=0, debug_folder=None,
+                 palette="global", threshold=12.0, sampling="uniform"):
+    """
+    管线：解码 -> 缩放 -> 量化 -> GIF 编码，全部在内存中完成
+    
+    参数:
+    - debug_folder: 可选，给出时额外把抽取的帧保存为 JPEG 以便检查（不影响生成的 GIF）
+    - palette, threshold: 见 encode_gif
+    - sampling: "uniform" 均匀抽帧 (iter_video_frames)，"motion" 按运动量抽帧并使用逐帧停留时间 (select_motion_frames)
+    """
+    if sampling == "motion":
+        frames, duration = select_motion_frames(video_path, target_frames, max_width, duration)
+    else:
+        frames = iter_video_frames(video_path, target_frames, max_width)
+    if debug_folder:
+        frames = dump_frames(frames, debug_folder)
+
+    count = encode_gif(frames, output_gif_path, duration, loop, palette, threshold)
+    if not count:
+        print(f"没有抽取到任何帧: {video_path}")
+        return 0
+
+    print(f"GIF生成成功！共 {count} 帧，保存为: {output_gif_path}")
+    print(f"文件大小: {os.path.getsize(output_gif_path) / 1024 / 1024:.2f} MB")
+    return count
+
+
+def extract_frames_smart(video_path, output_folder, target_frames=150, max_width=480):
+    """
+    抽帧并保存为图片文件夹 (0001.jpg, 0002.jpg)，可与 create_gif_from_folder 配合使用
+    
+    参数同 iter_video_frames，output_folder 为图片保存文件夹
+    """
+    saved_count = 0
+    for _ in dump_frames(iter_video_frames(video_path, target_frames, max_width), output_folder):
         saved_count += 1
-        count += 1
         
         # 简单的进度显示
         if saved_count % 20 == 0:
             print(f"已保存 {saved_count} 帧...")
 
-    cap.release()
     print(f"抽帧完成！共保存 {saved_count} 张图片至 '{output_folder}'")
 
 
@@ -147,68 +526,154 @@ def create_gif_from_folder(image_folder, output_gif_path, duration=100, loop=0):
     print(f"文件大小: {os.path.getsize(output_gif_path) / 1024 / 1024:.2f} MB")
 
 
-# --- 使用示例 ---
-if __name__ == "__main__":
-    # 配置区域
-    # 1. 输入和输出设置
-    INPUT_FOLDER = r"D:\AAA-personalData\project\AmazingHand\Docs\TestVlog"                 # 视频所在的文件夹 (默认为当前文件夹)
-    OUTPUT_FOLDER = r"D:\AAA-personalData\project\AmazingHand\Docs\TestVlog"      # GIF输出保存的文件夹
-    TEMP_FOLDER_BASE = r"D:\AAA-personalData\project\AmazingHand\Docs\TestVlog\temp_frames"   # 临时存放图片的文件夹
-    
-    # 支持的视频格式
-    VIDEO_EXTENSIONS = ['*.mp4', '*.mov', '*.avi', '*.mkv']
+# --- 批量处理 ---
+
+# 支持的视频格式
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
 
-    # 2. GIF参数设置
-    TARGET_FRAMES = 150   # 每个GIF的目标总帧数
-    WIDTH = 480           # 图片宽度
-    GIF_SPEED_MS = 60     # 帧间隔(ms)
+# 记录已生成GIF的源视频与参数，用于跳过未变化的文件
+MANIFEST_NAME = ".video_to_gif.json"
 
-    # 确保输出目录存在
-    if not os.path.exists(OUTPUT_FOLDER):
-        os.makedirs(OUTPUT_FOLDER)
 
-    # 扫描所有视频文件
+def find_videos(input_path):
+    """返回 input_path 下（递归）所有视频文件，input_path 也可以是单个视频"""
+    if os.path.isfile(input_path):
+        return [input_path]
     video_files = []
-    for ext in VIDEO_EXTENSIONS:
-        # 查找当前文件夹下的视频文件
-        video_files.extend(glob.glob(os.path.join(INPUT_FOLDER, ext)))
+    for root, dirs, files in os.walk(input_path):
+        dirs.sort()
+        video_files.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(VIDEO_EXTENSIONS))
+    return video_files
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """文件内容的 sha1，分块读取"""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def convert_job(video_file, output_gif, params, skip, previous, debug_folder=None, quiet=True):
+    """
+    进程池中的单个任务：必要时生成一个GIF
     
-    # 过滤掉已经生成的GIF文件（防止误读）
-    video_files = [f for f in video_files if f.lower().endswith(tuple(ext.replace('*', '') for ext in VIDEO_EXTENSIONS))]
+    所有异常都在这里捕获，一个视频出错不会影响其他任务。
+    返回 (状态 'ok'/'skipped'/'error', 新的清单记录, 帧数或错误信息, 耗时)
+    """
+    t0 = time.perf_counter()
+    try:
+        record = {"params": params}
+        if skip == "hash":
+            record["hash"] = file_hash(video_file)
+        up_to_date = previous is not None and previous.get("params") == params and os.path.exists(output_gif)
+        if up_to_date and skip == "mtime":
+            up_to_date = os.path.getmtime(output_gif) >= os.path.getmtime(video_file)
+        elif up_to_date and skip == "hash":
+            up_to_date = previous.get("hash") == record["hash"]
+        else:
+            up_to_date = False
+        if up_to_date:
+            return "skipped", previous, 0, time.perf_counter() - t0
 
-    print(f"=== 批量处理模式 ===")
-    print(f"在 '{INPUT_FOLDER}' 中找到 {len(video_files)} 个视频文件")
+        if os.path.dirname(output_gif):
+            os.makedirs(os.path.dirname(output_gif), exist_ok=True)
+        # 多进程时各任务的输出会交错，只由主进程打印进度
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            count = video_to_gif(video_file, output_gif, debug_folder=debug_folder, **params)
+        if not count:
+            return "error", None, f"无法读取视频: {video_file}", time.perf_counter() - t0
+        return "ok", record, count, time.perf_counter() - t0
+    except Exception:
+        return "error", None, traceback.format_exc(), time.perf_counter() - t0
 
+
+def init_worker():
+    # 并行的是视频，每个进程内 OpenCV 只用一个线程，避免线程数超过核心数
+    cv2.setNumThreads(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把视频（或目录树中的所有视频）转换为GIF")
+    parser.add_argument("input", help="视频文件或视频所在的文件夹（递归查找）")
+    parser.add_argument("-o", "--output", default=None, help="GIF输出文件夹，保持与输入相同的子目录结构（默认：与视频放在一起）")
+    parser.add_argument("-n", "--frames", type=int, default=150, help="每个GIF的目标总帧数")
+    parser.add_argument("-w", "--width", type=int, default=480, help="图片宽度")
+    parser.add_argument("-d", "--duration", type=int, default=60, help="帧间隔(ms)")
+    parser.add_argument("-s", "--sampling", choices=["uniform", "motion"], default="uniform",
+                        help="uniform: 均匀抽帧；motion: 把帧数分配给运动较多的片段，并按覆盖时长设置每帧停留时间")
+    parser.add_argument("--palette", choices=["global", "adaptive"], default="global",
+                        help="global: 全局调色板 + 抖动 + 帧间差分；adaptive: 每帧单独的自适应调色板（流式，旧行为）")
+    parser.add_argument("--threshold", type=float, default=12.0,
+                        help="global 调色板下，变化不超过该值的像素写为透明（帧间差分）")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="并行进程数（默认：CPU核心数）")
+    parser.add_argument("--skip", choices=["mtime", "hash", "none"], default="mtime",
+                        help="跳过已是最新的GIF：mtime 比较修改时间，hash 比较视频内容，none 全部重新生成")
+    parser.add_argument("--keep-frames", default=None, metavar="DIR", help="调试：把抽取的帧另存为JPEG到 DIR/<视频名>")
+    parser.add_argument("--benchmark", action="store_true", help="只对比两种抽帧方式的耗时，不生成GIF")
+    args = parser.parse_args()
+
+    video_files = find_videos(args.input)
+    input_root = args.input if os.path.isdir(args.input) else os.path.dirname(args.input)
+    output_root = args.output or input_root
+
+    print(f"=== 批量处理模式 ===")
+    print(f"在 '{args.input}' 中找到 {len(video_files)} 个视频文件")
     if not video_files:
         print("未找到视频文件，请检查路径或文件扩展名。")
-    
-    for i, video_file in enumerate(video_files):
-        print(f"\n[{i+1}/{len(video_files)}] 正在处理: {video_file}")
-        
-        # 获取文件名（不带后缀）
-        base_name = os.path.splitext(os.path.basename(video_file))[0]
-        
-        # 为每个视频创建一个独立的临时文件夹，防止混淆
-        current_temp_folder = os.path.join(TEMP_FOLDER_BASE, base_name)
-        
-        # 设置输出GIF路径
-        output_gif = os.path.join(OUTPUT_FOLDER, f"{base_name}.gif")
-        
-        try:
-            # 步骤 1: 抽帧
-            extract_frames_smart(video_file, current_temp_folder, target_frames=TARGET_FRAMES, max_width=WIDTH)
-            
-            # 步骤 2: 合成GIF
-            create_gif_from_folder(current_temp_folder, output_gif, duration=GIF_SPEED_MS)
-            
-            # 步骤 3: 清理临时文件 (处理完一个清理一个，节省空间)
-            if os.path.exists(current_temp_folder):
-                shutil.rmtree(current_temp_folder)
-                print(f"已清理临时文件夹: {current_temp_folder}")
-                
-        except Exception as e:
-            print(f"ERROR: 处理视频 {video_file} 时出错: {e}")
-            import traceback
-            traceback.print_exc()
-
-    print(f"\n=== 所有任务完成！ GIF已保存在文件夹 {OUTPUT_FOLDER} 中 ===")
+        return 0
+
+    if args.benchmark:
+        for video_file in video_files:
+            print(f"\n{video_file}")
+            benchmark_sampling(video_file, args.frames)
+        return 0
+
+    manifest_path = os.path.join(output_root, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    params = {"target_frames": args.frames, "max_width": args.width, "duration": args.duration,
+              "sampling": args.sampling, "palette": args.palette, "threshold": args.threshold}
+    jobs = max(1, min(args.jobs or 1, len(video_files)))
+    failed = 0
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker) as pool:
+        futures = {}
+        for video_file in video_files:
+            rel = os.path.relpath(video_file, input_root)
+            output_gif = os.path.join(output_root, os.path.splitext(rel)[0] + ".gif")
+            debug_folder = os.path.join(args.keep_frames, os.path.splitext(rel)[0]) if args.keep_frames else None
+            future = pool.submit(convert_job, video_file, output_gif, params,
+                                 args.skip, None if args.skip == "none" else manifest.get(rel), debug_folder, jobs > 1)
+            futures[future] = rel
+
+        for done, future in enumerate(as_completed(futures), 1):
+            rel = futures[future]
+            try:
+                status, record, info, elapsed = future.result()
+            except Exception as e:  # 子进程意外退出等
+                status, record, info, elapsed = "error", None, repr(e), 0.0
+            if record is not None:
+                manifest[rel] = record
+            if status == "error":
+                failed += 1
+                print(f"[{done}/{len(futures)}] ERROR {rel}\n{info}")
+            elif status == "ok":
+                print(f"[{done}/{len(futures)}] {rel} -> {info} 帧, {elapsed:.1f} s")
+            else:
+                print(f"[{done}/{len(futures)}] {rel} 已是最新，跳过")
+
+    os.makedirs(output_root, exist_ok=True)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+
+    print(f"\n=== 所有任务完成！({jobs} 个进程, {time.perf_counter() - t0:.1f} s, {failed} 个失败) GIF已保存在文件夹 {output_root} 中 ===")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())